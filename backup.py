@@ -0,0 +1,189 @@
+"""Online backups of shinyquest.db, and restoring one.
+
+    python backup.py create              # into backups/ next to the db, gzipped, keeping the newest BACKUP_KEEP
+    python backup.py list
+    python backup.py restore backups/shinyquest-20260101-120000-000-k3v9x2qa.db.gz
+
+A backup copies the live file with SQLite's backup API from a connection of its own, BACKUP_PAGES
+pages per step, so it runs on a background thread while the app keeps writing. That connection
+holds one read transaction for the whole copy: under WAL the app's commits carry on into the WAL and
+the copy is the db as it was when the backup started. Without the pinned snapshot every commit from
+another connection restarts the copy, and one racing the counter flushes may never finish.
+"""
+import datetime
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import database
+
+BACKUP_DIR = "backups"  # next to the db file
+BACKUP_PAGES = 256  # pages copied per backup step and progress report, 1 MB at the default page size
+BACKUP_KEEP = 5  # newest backups kept in the backup directory
+BACKUP_INTERVAL_SECONDS = 24 * 3600  # the app backs up on start when the newest backup is older than this
+GZIP_LEVEL = 1  # twice as fast as the default level 6, for files about 5% bigger
+COPY_BYTES = 1024 * 1024
+PREFIX = "shinyquest-"
+SUFFIXES = (".db", ".db.gz")
+
+
+def backup_dir(db_path=database.DB_PATH):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), BACKUP_DIR)
+
+
+def backups(directory):
+    """Paths of the backups in directory, newest first; the names sort by the time they were taken."""
+    if not os.path.isdir(directory):
+        return []
+    names = [name for name in os.listdir(directory) if name.startswith(PREFIX) and name.endswith(SUFFIXES)]
+    return [os.path.join(directory, name) for name in sorted(names, reverse=True)]
+
+
+def create_backup(db_path=database.DB_PATH, directory=None, compress=True, keep=BACKUP_KEEP, pages=BACKUP_PAGES,
+                  progress=None):
+    """Copy db_path into directory (default backup_dir) as shinyquest-<time>-<id>.db(.gz) and delete all but the
+    newest keep backups.
+
+    progress(copied, total) is called with page counts after each step. Returns {'path', 'bytes' (of
+    the db copied), 'size' (of the backup file), 'seconds', 'pruned'}.
+    """
+    directory = directory or backup_dir(db_path)
+    os.makedirs(directory, exist_ok=True)
+    # a name of its own, so a CLI backup and the app's never share one; never listed as a backup either
+    handle, part = tempfile.mkstemp(prefix=PREFIX, suffix=".part", dir=directory)
+    os.close(handle)
+    # the temp file's random part keeps two backups taken in the same millisecond apart
+    unique = os.path.basename(part)[len(PREFIX):-len(".part")]
+    name = (PREFIX + datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3] + "-" + unique
+            + (".db.gz" if compress else ".db"))
+    path = os.path.join(directory, name)
+    started = time.perf_counter()
+    try:
+        source = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            target = sqlite3.connect(part, isolation_level=None)
+            try:
+                source.execute("BEGIN")
+                source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()  # starts the read transaction
+                source.backup(target, pages=pages, progress=progress and (
+                    lambda status, remaining, total: progress(total - remaining, total)))
+                source.execute("COMMIT")
+                # a plain single file, without the -wal and -shm the copied header would ask for
+                target.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                target.close()
+        finally:
+            source.close()
+        copied = os.path.getsize(part)
+        if compress:
+            with open(part, "rb") as f, gzip.open(part + ".gz", "wb", compresslevel=GZIP_LEVEL) as out:
+                shutil.copyfileobj(f, out, COPY_BYTES)
+            os.remove(part)
+            part += ".gz"
+        os.replace(part, path)
+    except BaseException:
+        for leftover in (part, part + "-journal", part + ".gz"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    pruned = backups(directory)[keep:]
+    for old in pruned:
+        try:
+            os.remove(old)
+        except FileNotFoundError:
+            pass  # pruned by a backup running alongside
+    return {'path': path, 'bytes': copied, 'size': os.path.getsize(path), 'seconds': time.perf_counter() - started,
+            'pruned': pruned}
+
+
+def backup_if_due(db_path=database.DB_PATH, directory=None, interval=BACKUP_INTERVAL_SECONDS, **kwargs):
+    """create_backup when there is none yet or the newest is older than interval seconds; None otherwise."""
+    newest = backups(directory or backup_dir(db_path))[:1]
+    if newest and time.time() - os.path.getmtime(newest[0]) < interval:
+        return None
+    return create_backup(db_path, directory, **kwargs)
+
+
+def restore_backup(db, path):
+    """Replace the main db behind db's connection with the backup at path; returns the backup's schema version.
+
+    The backup is unpacked next to the live file and has to pass PRAGMA integrity_check, and be a
+    ShinyQuest db no newer than this app, before a page of the live db is touched. It is then copied
+    in through db's own connection in one write transaction, so other connections see either the old
+    or the restored db, and migrated. ValueError if the backup is unusable.
+    """
+    unpacked = db.path + ".restore"
+    try:
+        if path.lower().endswith(".gz"):
+            with gzip.open(path, "rb") as f, open(unpacked, "wb") as out:
+                shutil.copyfileobj(f, out, COPY_BYTES)
+        else:
+            shutil.copyfile(path, unpacked)
+        source = sqlite3.connect(unpacked, isolation_level=None)
+        try:
+            try:
+                problems = [row[0] for row in source.execute("PRAGMA integrity_check")]
+                version = source.execute("PRAGMA user_version").fetchone()[0]
+            except sqlite3.DatabaseError as e:
+                raise ValueError(f"{path} is damaged or not a ShinyQuest backup: {e}") from e
+            if problems != ["ok"]:
+                raise ValueError(f"{path} failed its integrity check: {problems[0]}")
+            if version == 0:
+                raise ValueError(f"{path} is not a ShinyQuest backup")
+            if version > len(database.MIGRATIONS):
+                raise ValueError(f"{path} is schema v{version}, newer than this app (v{len(database.MIGRATIONS)})")
+            with db.lock:
+                source.backup(db.conn)
+                db.lookup_ids.clear()
+        finally:
+            source.close()
+    finally:
+        for leftover in (unpacked, unpacked + "-journal", unpacked + "-wal", unpacked + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    db.migrate()
+    return version
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Back up or restore the ShinyQuest database")
+    parser.add_argument("--db", default=database.DB_PATH)
+    parser.add_argument("--dir", help=f"where the backups go (default: {BACKUP_DIR}/ next to the db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="back up the db while it is in use")
+    create.add_argument("--keep", type=int, default=BACKUP_KEEP)
+    create.add_argument("--no-compress", action="store_true")
+    commands.add_parser("list", help="the backups, newest first")
+    restore = commands.add_parser("restore", help="replace the db with a checked backup; close the app first")
+    restore.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        result = create_backup(args.db, args.dir, not args.no_compress, args.keep)
+        print(f"{result['path']}: {result['bytes'] / 1e6:.1f} MB in {result['seconds']:.2f} s, "
+              f"{result['size'] / 1e6:.1f} MB on disk")
+    elif args.command == "list":
+        for path in backups(args.dir or backup_dir(args.db)):
+            print(f"{path}  {os.path.getsize(path) / 1e6:.1f} MB")
+    else:
+        db = database.open_db(args.db)
+        try:
+            version = restore_backup(db, args.path)
+        except ValueError as e:
+            print(e)
+            return 1
+        finally:
+            database.close_db()
+        print(f"restored {args.path} (schema v{version}) into {args.db}")
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main())
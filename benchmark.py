@@ -0,0 +1,492 @@
+"""Synthetic-data benchmarks for every screen and data path.
+
+    python benchmark.py --users 50 --hunts 200 --report bench.json
+    python benchmark.py --baseline bench.json   # exit 1 if a scenario got slower than the threshold
+
+Builds a fresh db at the requested scale, times the data path behind each screen, then (when Kivy
+can be imported) drives the real screens headlessly and times each action until its result is on
+screen. Every scenario reports median and p95 milliseconds.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import backup
+import core
+import database
+import encounters
+import importer
+from counters import CounterBuffer
+from pokedex import GAMES, GEN1_POKEMON, METHODS, SpeciesIndex
+
+DEFAULT_THRESHOLD = 1.5  # a scenario regresses when its median grows past baseline x threshold
+NOISE_FLOOR_MS = 0.05  # differences below this are timer noise, never a regression
+IMPORT_ROWS = 5000
+BULK_HUNTS = 100  # hunts per bulk action, against the same number of one-row calls
+THROUGHPUT_SECONDS = 2.0  # how long the counter throughput scenario keeps tapping
+THROUGHPUT_FLUSH_SECONDS = 0.25  # its flush interval, shorter than the app's so one run sees several commits
+THROUGHPUT_HUNTS = 20
+SUGGESTIONS = 4  # suggestion buttons under the HuntScreen input
+LOGGED_ENCOUNTERS = 100000  # timed encounters on the first trainer's "Ditto" hunt, for the rate charts
+PASSWORD = "benchmark"
+
+
+def generate(path, users, hunts, guests, guest_hunts, seed=0):
+    """A fresh db at path with users x hunts synthetic hunts; returns the usernames.
+
+    The guests x guest_hunts guest rows go into the file the way versions before the in-memory
+    guest store left them, for purge_legacy_guests to clear. The first trainer also gets a hunt with
+    LOGGED_ENCOUNTERS timed encounters, appended a counter flush's worth at a time.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = random.Random(seed)
+    db = database.Database(path)
+    db.migrate()
+    password = core.hash_password(PASSWORD)
+    usernames = [f"trainer{i}" for i in range(users)]
+    with db.transaction() as c:
+        for username in usernames:
+            db.create_user(username, f"{username}@example.com", password)
+            db.insert_hunts(username, [_random_hunt(rng) for _ in range(hunts)])
+        for i in range(guests):
+            rows = [(f"guest_bench{i}",) + db.hunt_ids(pokemon, game, method) + (counter, success)
+                    for pokemon, game, method, counter, success in (_random_hunt(rng) for _ in range(guest_hunts))]
+            c.executemany("INSERT INTO main.guest_hunts (guest_id, species_id, game_id, method_id, counter, success) "
+                          "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            c.executemany("INSERT OR IGNORE INTO main.living_dex (user_id, species_id, game_id) VALUES (?, ?, ?)",
+                          [row[:3] for row in rows if row[5]])
+        if usernames:
+            hunt_id = db.insert_hunt(usernames[0], "Ditto", counter=LOGGED_ENCOUNTERS)
+            times = _encounter_times(rng, LOGGED_ENCOUNTERS)
+            for start in range(0, len(times), 20):
+                encounters.append(c, "hunts", usernames[0], hunt_id, times[start:start + 20])
+    db.conn.execute("ANALYZE")
+    db.close()
+    return usernames
+
+
+def _random_hunt(rng):
+    success = rng.random() < 0.3
+    return (rng.choice(GEN1_POKEMON), rng.choice(GAMES)[0], rng.choice(METHODS),
+            int(rng.expovariate(1 / 3000)), success)
+
+
+def _encounter_times(rng, count, started_ms=1_700_000_000_000):
+    # sessions of a few hundred to a few thousand resets ~9 s apart, hours to days between sessions
+    times, t = [], started_ms
+    while len(times) < count:
+        for _ in range(rng.randint(200, 3000)):
+            t += max(500, int(rng.gauss(9000, 2500)))
+            times.append(t)
+        t += int(rng.expovariate(1 / (12 * 3600 * 1000)))
+    return times[:count]
+
+
+def logged_hunt(db, username):
+    """The hunt generate() logged LOGGED_ENCOUNTERS encounters for; counter flushes log a few elsewhere."""
+    return db.fetchone("SELECT hunt_id FROM encounter_sessions WHERE user_id=? GROUP BY hunt_id "
+                       "ORDER BY SUM(encounters) DESC LIMIT 1", (username,))[0]
+
+
+def measure(fn, repeat):
+    times = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        times.append((time.perf_counter() - started) * 1000)
+    return summarize(times)
+
+
+def summarize(times):
+    times = sorted(times)
+    return {
+        'runs': len(times),
+        'median_ms': statistics.median(times),
+        'p95_ms': times[int(0.95 * (len(times) - 1))],
+    }
+
+
+def write_import_file(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(rows):
+            pokemon, game, method, counter, success = _random_hunt(rng)
+            f.write(json.dumps({"pokemon": pokemon, "game": game, "method": method,
+                                "counter": counter, "success": success}) + "\n")
+
+
+def data_scenarios(db, usernames, repeat, workdir):
+    """The db work behind each screen action, called directly."""
+    rng = random.Random(1)
+
+    def user(i):
+        return usernames[i % len(usernames)]
+
+    counters = CounterBuffer(db)
+
+    def flush(i):
+        hunt = db.open_hunt(user(i), "Pikachu")
+        hunt_id = hunt[0] if hunt else db.insert_hunt(user(i), "Pikachu")
+        for _ in range(100):
+            counters.increment(user(i), hunt_id)
+        counters.flush()
+
+    for i in range(repeat):
+        db.insert_hunt(user(i), "Mewtwo")  # open hunts for mark_successful to close
+
+    # open hunts of their own for each bulk action, BULK_HUNTS fresh ones per run
+    bulk_ids = {}
+    for name in ("delete", "delete_one_by_one", "mark"):
+        owner = f"bulk_{name}"
+        db.insert_hunts(owner, [(rng.choice(GEN1_POKEMON), rng.choice(GAMES)[0], rng.choice(METHODS),
+                                 rng.randrange(5000), False) for _ in range(repeat * BULK_HUNTS)])
+        bulk_ids[name] = [row[0] for row in db.fetchall("SELECT id FROM hunts WHERE user_id=? ORDER BY id", (owner,))]
+
+    def bulk(name, i):
+        return f"bulk_{name}", bulk_ids[name][i * BULK_HUNTS:(i + 1) * BULK_HUNTS]
+
+    def delete_one_by_one(i):
+        owner, hunt_ids = bulk("delete_one_by_one", i)
+        for hunt_id in hunt_ids:
+            db.delete_hunt(owner, hunt_id)
+
+    ditto = logged_hunt(db, usernames[0])
+    edit_ids = {user(i): [row[0] for row in db.fetchall("SELECT id FROM hunts WHERE user_id=? ORDER BY id LIMIT ?",
+                                                         (user(i), BULK_HUNTS))] for i in range(repeat)}
+
+    import_path = os.path.join(workdir, "import.ndjson")
+    write_import_file(import_path, IMPORT_ROWS)
+    scenarios = {
+        'login': lambda i: core.login(db, user(i), PASSWORD),
+        'save_hunt': lambda i: core.start_hunt(db, user(i), rng.choice(GEN1_POKEMON)),
+        'mark_successful': lambda i: core.mark_successful(db, user(i), "Mewtwo"),
+        'counter_flush_100': flush,
+        'delete_hunts_bulk': lambda i: core.delete_hunts(db, *bulk("delete", i)),
+        'delete_hunts_one_by_one': delete_one_by_one,
+        'mark_hunts_successful_bulk': lambda i: core.mark_hunts_successful(db, *bulk("mark", i)),
+        'edit_hunts_bulk': lambda i: core.edit_hunts(db, user(i), edit_ids[user(i)], "Blue" if i % 2 else "Red"),
+        'history_page': lambda i: core.history_page(db, user(i), None, 50),
+        'search_text': lambda i: core.search_history(db, user(i), {'text': "pika masuda"}, None, 50),
+        'search_filters': lambda i: core.search_history(
+            db, user(i), {'game': "Red", 'success': True, 'min_counter': 1000, 'sort': "most_encounters"}, None, 50),
+        'living_dex': lambda i: db.living_dex(user(i)),
+        'hunt_activity_100k': lambda i: core.hunt_activity(db, usernames[0], ditto),
+        'decode_events_100k': lambda i: encounters.events(db.conn, "hunts", ditto),
+        'leaderboard_top': lambda i: db.leaderboard_top("avg_attempts" if i % 2 else "shinies", None, 10),
+        'leaderboard_rank': lambda i: db.leaderboard_rank(user(i), "avg_attempts" if i % 2 else "shinies"),
+        'leaderboard_game_rank': lambda i: db.leaderboard_rank(user(i), "game", rng.choice(GAMES)[0]),
+        'profile': lambda i: core.profile(db, user(i)),
+        'repair_living_dex': lambda i: db.repair_living_dex(user(i)),
+        'import_guest_hunts': lambda i: importer.import_file(db, import_path, f"importer{i}"),
+        'guest_save_hunt': lambda i: core.start_hunt(db, "guest_bench", rng.choice(GEN1_POKEMON)),
+        'guest_history_page': lambda i: core.history_page(db, "guest_bench", None, 50),
+        'guest_living_dex': lambda i: db.living_dex("guest_bench"),
+    }
+    results = {}
+    for name, fn in scenarios.items():
+        runs = max(1, repeat // 10) if name == 'import_guest_hunts' else repeat
+        results[name] = measure(fn, runs)
+    results['import_guest_hunts']['rows'] = IMPORT_ROWS
+    results['hunt_activity_100k']['bytes_per_event'] = db.fetchone(
+        "SELECT TOTAL(LENGTH(data)) / TOTAL(events) FROM encounter_blocks WHERE hunt_id=?", (ditto,))[0]
+    db.end_guest_session("guest_bench")
+    # once per db: the legacy guest rows are gone afterwards
+    legacy_rows = db.fetchone("SELECT COUNT(*) FROM main.guest_hunts")[0]
+    results['purge_legacy_guests'] = measure(lambda i: db.purge_legacy_guests(), 1)
+    results['purge_legacy_guests']['rows'] = legacy_rows
+    results.update(species_index_scenarios(repeat))
+    results.update(backup_scenarios(db, usernames, repeat, workdir))
+    results['counter_throughput'] = counter_throughput(db)
+    return results
+
+
+def counter_throughput(db, seconds=THROUGHPUT_SECONDS):
+    """Increments as fast as one thread can tap over THROUGHPUT_HUNTS hunts, flushed every THROUGHPUT_FLUSH_SECONDS.
+
+    The timings are of one flush under that load; the rates come from CounterBuffer's own counts.
+    """
+    owner = "throughput"
+    hunt_ids = [db.insert_hunt(owner, pokemon) for pokemon in GEN1_POKEMON[:THROUGHPUT_HUNTS]]
+    counters = CounterBuffer(db)
+    stop, flushes = threading.Event(), []
+
+    def timed_flush():
+        started = time.perf_counter()
+        counters.flush()
+        flushes.append((time.perf_counter() - started) * 1000)
+
+    def flush_loop():
+        while not stop.wait(THROUGHPUT_FLUSH_SECONDS):
+            timed_flush()
+    thread = threading.Thread(target=flush_loop)
+    thread.start()
+    started, i = time.perf_counter(), 0
+    while time.perf_counter() - started < seconds:
+        for _ in range(1000):
+            counters.increment(owner, hunt_ids[i % len(hunt_ids)])
+            i += 1
+    stop.set()
+    thread.join()
+    timed_flush()  # what is left, as on_stop would
+    elapsed = time.perf_counter() - started
+    result = summarize(flushes)
+    result['increments_per_s'] = counters.increments / elapsed
+    result['commits_per_s'] = counters.commits / elapsed
+    result['lost'] = counters.increments - db.fetchone("SELECT TOTAL(counter) FROM hunts WHERE user_id=?", (owner,))[0]
+    return result
+
+
+def species_index_scenarios(repeat):
+    """Loading the shipped species.idx, and the suggest() behind each keystroke of typing every species in full."""
+    results = {'species_index_load': measure(lambda i: SpeciesIndex.load(), repeat)}
+    index = SpeciesIndex.load()
+    times = []
+    for name in index.names:
+        for end in range(1, len(name) + 1):
+            started = time.perf_counter()
+            index.suggest(name[:end], SUGGESTIONS)
+            times.append((time.perf_counter() - started) * 1000)
+    results['species_suggest'] = summarize(times)
+    results['species_suggest']['species'] = len(index.names)
+    return results
+
+
+def backup_scenarios(db, usernames, repeat, workdir):
+    """Backups of the live db, the counter flushes that run meanwhile, and restoring one."""
+    directory = os.path.join(workdir, "backups")
+    runs = max(1, repeat // 10)
+    results = {}
+    for name, compress in (('backup', False), ('backup_gz', True)):
+        made = []
+        results[name] = measure(lambda i: made.append(backup.create_backup(db.path, directory, compress)), runs)
+        results[name]['mb_per_s'] = made[-1]['bytes'] / 1e6 / (results[name]['median_ms'] / 1000)
+        results[name]['backup_mb'] = made[-1]['size'] / 1e6
+    counters = CounterBuffer(db)
+    hunt_id = db.insert_hunt(usernames[0], "Pikachu")
+
+    def flush(i):
+        for _ in range(100):
+            counters.increment(usernames[0], hunt_id)
+        counters.flush()
+
+    # flushes from the app's connection back to back for as long as another thread takes to back up runs times
+    thread = threading.Thread(target=lambda: [backup.create_backup(db.path, directory) for _ in range(runs)])
+    times = []
+    thread.start()
+    while thread.is_alive() or not times:
+        started = time.perf_counter()
+        flush(len(times))
+        times.append((time.perf_counter() - started) * 1000)
+    thread.join()
+    results['counter_flush_during_backup'] = summarize(times)
+    results['counter_flush_during_backup']['backups'] = runs
+    latest = backup.backups(directory)[0]
+    results['restore_gz'] = measure(lambda i: backup.restore_backup(db, latest), runs)
+    return results
+
+
+def screen_scenarios(usernames, repeat, workdir, timeout=30):
+    """Drive the real screens without showing a window; each timing ends when the result is on screen."""
+    os.environ.setdefault("KIVY_NO_ARGS", "1")
+    os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+    os.environ.setdefault("KIVY_NO_FILELOG", "1")
+    try:
+        from kivy.config import Config
+
+        Config.set('graphics', 'maxfps', '0')  # Clock.tick() must not sleep between frames
+        from kivy.app import App
+        from kivy.clock import Clock
+        from kivy.core.window import Window
+        from kivy.uix.modalview import ModalView
+        import main
+    except ImportError as e:
+        return {'skipped': f"Kivy not available: {e}"}
+
+    app = main.ShinyQuestApp()
+    App._running_app = app  # what App.run() would set; screens look the app up through it
+    app.root = app.build()
+    manager = app.root
+
+    def pump(done):
+        deadline = time.perf_counter() + timeout
+        while not done():
+            Clock.tick()
+            if time.perf_counter() > deadline:
+                raise TimeoutError("screen did not update in time")
+        for widget in list(Window.children):
+            if isinstance(widget, ModalView):  # close the result popups so they do not pile up
+                widget.dismiss(animation=False)
+
+    def called(screen, method):
+        """Flag set once screen.method runs; the screens look their callbacks up at call time."""
+        flag = []
+        original = getattr(type(screen), method)
+
+        def wrapper(*args, **kwargs):
+            result = original(screen, *args, **kwargs)
+            flag.append(True)
+            return result
+        setattr(screen, method, wrapper)
+        return lambda: bool(flag)
+
+    def action(screen, callback, start):
+        def run(i):
+            done = called(screen, callback)
+            start(i)
+            pump(done)
+        return run
+
+    def user(i):
+        return usernames[i % len(usernames)]
+
+    login = manager.get_screen('login')
+
+    def do_login(i):
+        login.username_input.text = user(i)
+        login.password_input.text = PASSWORD
+        login.login(None)
+
+    hunt = manager.get_screen('hunt')
+
+    def do_save(i):
+        hunt.pokemon_input.text = "Pikachu"
+        hunt.save_hunt(None)
+
+    def do_mark(i):
+        hunt.pokemon_input.text = "Pikachu"
+        hunt.mark_successful(None)
+
+    register = manager.get_screen('register')
+    import_path = os.path.join(workdir, "screen_import.ndjson")
+    write_import_file(import_path, IMPORT_ROWS // 5, seed=1)
+    history = manager.get_screen('history')
+    profile = manager.get_screen('profile')
+    dex = manager.get_screen('living_dex')
+
+    results = {'login': measure(action(login, 'on_login', do_login), repeat)}
+    app.set_user(usernames[0])
+    results['save_hunt'] = measure(action(hunt, 'on_hunt_saved', do_save), repeat)
+    results['mark_successful'] = measure(action(hunt, 'on_marked_successful', do_mark), repeat)
+    results['refresh_history'] = measure(action(history, 'on_page_loaded', lambda i: history.refresh_history()),
+                                         repeat)
+
+    def do_search(i):
+        history.search_input.text = "pika" if i % 2 else "red"
+        history.restart_history()  # skips the typing delay
+
+    results['search_history'] = measure(action(history, 'on_page_loaded', do_search), repeat)
+    ditto = logged_hunt(database.get_db(), usernames[0])
+    results['hunt_activity'] = measure(
+        action(history, 'on_activity_loaded', lambda i: history.show_activity(ditto, "Ditto")), repeat)
+    results['refresh_profile'] = measure(action(profile, 'show_profile', lambda i: profile.refresh_profile()),
+                                         repeat)
+    frames, longest = [], []  # with maxfps 0 every gap between two frames is main-thread time spent elsewhere
+
+    def do_backup(i):
+        if frames:
+            longest.append(max(frames))
+        frames.clear()
+        profile.backup_now(None)
+    frame_event = Clock.schedule_interval(lambda dt: frames.append(dt), 0)
+    results['backup'] = measure(action(profile, 'on_backup_done', do_backup), max(1, repeat // 10))
+    frame_event.cancel()
+    longest.append(max(frames))
+    # the first run also pays for building the popup's labels
+    results['backup']['longest_frame_ms'] = max(longest[1:] or longest) * 1000
+    leaderboard = manager.get_screen('leaderboard')
+    results['refresh_leaderboard'] = measure(
+        action(leaderboard, 'show_leaderboard', lambda i: leaderboard.refresh_leaderboard()), repeat)
+    results['refresh_dex'] = measure(action(dex, 'on_dex_loaded', lambda i: dex.refresh_dex()), repeat)
+    results['dex_sort'] = measure(lambda i: dex.set_sort("game" if i % 2 else "name"), repeat)
+    results['import_guest_hunts'] = measure(
+        action(register, 'on_import_done', lambda i: register.import_guest_hunts([import_path])),
+        max(1, repeat // 10))
+    app.sim_worker.stop(timeout=0)
+    app.backup_worker.stop()
+    app.db_worker.stop()
+    App._running_app = None
+    return results
+
+
+def regressions(report, baseline, threshold):
+    """(scenario, baseline ms, current ms) for every scenario whose median grew past baseline x threshold."""
+    found = []
+    for group in ("data", "screens"):
+        for name, current in report.get(group, {}).items():
+            before = baseline.get(group, {}).get(name)
+            if not isinstance(current, dict) or not isinstance(before, dict):
+                continue
+            old, new = before['median_ms'], current['median_ms']
+            if new > old * threshold and new - old > NOISE_FLOOR_MS:
+                found.append((f"{group}.{name}", old, new))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ShinyQuest synthetic-data benchmarks")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--hunts", type=int, default=200, help="hunts per user")
+    parser.add_argument("--guests", type=int, default=10)
+    parser.add_argument("--guest-hunts", type=int, default=100, help="hunts per guest session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=50, help="runs per scenario")
+    parser.add_argument("--db", help="where to build the synthetic db (default: a temp dir)")
+    parser.add_argument("--report", default="benchmark-report.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--no-screens", action="store_true", help="only the data paths, without Kivy")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = args.db or os.path.join(workdir, "shinyquest.db")
+        started = time.perf_counter()
+        usernames = generate(path, args.users, args.hunts, args.guests, args.guest_hunts, args.seed)
+        report = {
+            'meta': {
+                'users': args.users, 'hunts_per_user': args.hunts, 'guests': args.guests,
+                'hunts_per_guest': args.guest_hunts, 'seed': args.seed, 'repeat': args.repeat,
+                'generate_s': time.perf_counter() - started,
+                'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                'machine': platform.machine(), 'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+        }
+        db = database.open_db(path)
+        report['table_scans'] = db.table_scans()
+        report['data'] = data_scenarios(db, usernames, args.repeat, workdir)
+        if not args.no_screens:
+            report['screens'] = screen_scenarios(usernames, args.repeat, workdir)
+        database.close_db()
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for group in ("data", "screens"):
+        for name, result in report.get(group, {}).items():
+            if isinstance(result, dict):
+                print(f"{group:8} {name:20} median {result['median_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms")
+            else:
+                print(f"{group:8} {name:20} {result}")
+    status = 0
+    for sql, plan in report['table_scans'].items():
+        print(f"SCAN: {sql}\n    " + "\n    ".join(plan))
+        status = 1
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for name, old, new in regressions(report, baseline, args.threshold):
+            print(f"REGRESSION {name}: {old:.2f} ms -> {new:.2f} ms (threshold x{args.threshold})")
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""ShinyQuest's business logic without Kivy.
+
+The screens run these on the db worker and server.py runs them per request, so every function
+takes the Database to use as its first argument and never touches widgets or app state.
+"""
+import hashlib
+import uuid
+
+from encounters import HOUR_MS
+from pokedex import GEN1_POKEMON
+
+GUEST_PREFIX = "guest_"
+MAX_BATCH = 1000  # counter updates or hunt ids per batch call
+ACTIVITY_HOURS = 24  # bars in the encounters-per-hour charts
+ACTIVITY_SESSIONS = 10  # recent sessions listed and averaged for the encounter rate
+
+
+def _flag(value):
+    """A yes/no filter from JSON or a query string: a bool, 1/0 or "true"/"false"/"1"/"0"."""
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in ("true", "1"):
+            return True
+        if value in ("false", "0"):
+            return False
+    elif value in (True, False):
+        return bool(value)
+    raise ValueError(f"expected true or false, got {value!r}")
+
+
+# Database.search_hunts filters and how each is read from a request
+SEARCH_FILTERS = {
+    'text': str, 'species': str, 'game': str, 'method': str, 'success': _flag,
+    'min_counter': int, 'max_counter': int, 'sort': str,
+}
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def is_guest(user_id):
+    return user_id.startswith(GUEST_PREFIX)
+
+
+def new_guest_id():
+    return f"{GUEST_PREFIX}{uuid.uuid4().hex}"
+
+
+# Users
+
+def login(db, username, password):
+    return db.authenticate(username, hash_password(password))
+
+
+def register(db, username, email, password):
+    """Create the account; sqlite3.IntegrityError if the username or email is taken."""
+    if not username.strip() or not password:
+        raise ValueError("username and password are required")
+    if is_guest(username):
+        raise ValueError(f"usernames cannot start with {GUEST_PREFIX!r}")
+    db.create_user(username, email, hash_password(password))
+
+
+# Hunts
+
+def start_hunt(db, user_id, pokemon, game="Unknown", method="Unknown"):
+    if not pokemon.strip():
+        raise ValueError("Enter a Pokémon first!")
+    return db.insert_hunt(user_id, pokemon.strip(), game, method)
+
+
+def mark_successful(db, user_id, pokemon, counters=None):
+    """Close user_id's open hunts for pokemon, after writing any buffered encounters so none are lost."""
+    if not pokemon.strip():
+        raise ValueError("Enter a Pokémon first!")
+    if counters is not None:
+        counters.flush()
+    db.mark_successful(user_id, pokemon)
+
+
+def add_encounters(db, user_id, increments):
+    """Apply (hunt_id, amount) pairs to user_id's hunts in one transaction; returns how many hunts changed."""
+    increments = [(int(hunt_id), int(amount)) for hunt_id, amount in increments]
+    if len(increments) > MAX_BATCH:
+        raise ValueError(f"at most {MAX_BATCH} counter updates per batch")
+    if any(amount < 0 for _, amount in increments):
+        raise ValueError("encounter counts only go up")
+    return db.add_encounters(user_id, increments)
+
+
+def _batch_ids(hunt_ids):
+    hunt_ids = list(dict.fromkeys(int(hunt_id) for hunt_id in hunt_ids))
+    if len(hunt_ids) > MAX_BATCH:
+        raise ValueError(f"at most {MAX_BATCH} hunts per batch")
+    return hunt_ids
+
+
+def delete_hunts(db, user_id, hunt_ids):
+    """Delete the selected hunts in one transaction; returns how many were deleted."""
+    return db.delete_hunts(user_id, _batch_ids(hunt_ids))
+
+
+def mark_hunts_successful(db, user_id, hunt_ids, counters=None):
+    """Close the selected open hunts in one transaction; returns how many were closed."""
+    hunt_ids = _batch_ids(hunt_ids)
+    if counters is not None:
+        counters.flush()
+    return db.mark_hunts_successful(user_id, hunt_ids)
+
+
+def edit_hunts(db, user_id, hunt_ids, game=None, method=None):
+    """Move the selected hunts to game and/or method in one transaction; returns how many changed."""
+    hunt_ids = _batch_ids(hunt_ids)
+    game, method = (game or "").strip(), (method or "").strip()
+    if not game and not method:
+        raise ValueError("pick a game or a method")
+    return db.edit_hunts(user_id, hunt_ids, game, method)
+
+
+def history_page(db, user_id, after_id=None, limit=50):
+    """(hunts, odds) for the next page after after_id; odds is None for an empty page."""
+    return _with_odds(db.hunts_page(user_id, after_id, limit))
+
+
+def search_history(db, user_id, filters=None, after=None, limit=50):
+    """(hunts, odds) for the next page of user_id's hunts matching filters, see SEARCH_FILTERS.
+
+    after is (counter, id) of the previous page's last hunt; odds is None for an empty page.
+    """
+    filters = dict(filters or {})
+    unknown = filters.keys() - SEARCH_FILTERS.keys()
+    if unknown:
+        raise ValueError(f"unknown search filters: {', '.join(sorted(unknown))}")
+    filters = {name: SEARCH_FILTERS[name](value) for name, value in filters.items() if value is not None}
+    if after is not None:
+        counter, hunt_id = after
+        after = (int(counter), int(hunt_id))
+    return _with_odds(db.search_hunts(user_id, after=after, limit=limit, **filters))
+
+
+def _with_odds(hunts):
+    import odds  # numpy; kept out of the app's cold start
+
+    if not hunts:
+        return hunts, None
+    _, _, games, methods, counters, _ = zip(*hunts)
+    return hunts, odds.hunt_odds(games, methods, counters)
+
+
+def hunt_activity(db, user_id, hunt_id):
+    """Encounter rate and sessions of one hunt, see _activity."""
+    activity = db.hunt_activity(user_id, int(hunt_id), ACTIVITY_HOURS, ACTIVITY_SESSIONS)
+    if activity is None:
+        raise ValueError("no such hunt")
+    return _activity(activity)
+
+
+def _activity(activity):
+    """{'hours': encounters in each of the ACTIVITY_HOURS hours up to the last active one, oldest first,
+    'last_hour': when that hour started (epoch seconds), 'sessions': the recent ones newest first,
+    'per_hour': encounter rate over them}; a rate is None when there is nothing to time."""
+    counts = dict(activity['hours'])
+    last = max(counts, default=None)
+    hours = [] if last is None else [counts.get(hour, 0) for hour in range(last - ACTIVITY_HOURS + 1, last + 1)]
+    sessions = [{'started': started_ms / 1000, 'minutes': (ended_ms - started_ms) / 60000, 'encounters': count,
+                 'per_hour': _rate(count - 1, ended_ms - started_ms)}
+                for started_ms, ended_ms, count in activity['sessions']]
+    # n encounters in a session are n - 1 gaps over its length
+    gaps = sum(count - 1 for _, _, count in activity['sessions'])
+    spent = sum(ended_ms - started_ms for started_ms, ended_ms, _ in activity['sessions'])
+    return {'hours': hours, 'last_hour': None if last is None else last * HOUR_MS // 1000, 'sessions': sessions,
+            'per_hour': _rate(gaps, spent)}
+
+
+def _rate(gaps, ms):
+    return gaps * HOUR_MS / ms if ms > 0 else None
+
+
+def fetch_hunts(db, user_id, hunt_ids):
+    hunt_ids = [int(hunt_id) for hunt_id in hunt_ids]
+    if len(hunt_ids) > MAX_BATCH:
+        raise ValueError(f"at most {MAX_BATCH} hunts per batch")
+    return db.hunts_by_id(user_id, hunt_ids)
+
+
+# Profile and living dex
+
+def profile(db, user_id):
+    """(user row, stats dict, luck summary); the odds are computed for all hunts in one vectorized pass."""
+    import odds
+
+    user_info, stats = db.profile(user_id)
+    stats['activity'] = _activity(db.user_activity(user_id, ACTIVITY_HOURS, ACTIVITY_SESSIONS))
+    return user_info, stats, odds.summarize(db.hunt_odds_rows(user_id))
+
+
+def leaderboard(db, user_id, board, key=None, limit=10):
+    """{'top': [(rank, user, score)], 'me': (rank, score, ranked users) or None} for one board.
+
+    key is the game or method of the per-game and per-method boards.
+    """
+    if not 0 < int(limit) <= MAX_BATCH:
+        raise ValueError(f"limit must be between 1 and {MAX_BATCH}")
+    top = db.leaderboard_top(board, key, int(limit))
+    return {'top': top, 'me': None if is_guest(user_id) else db.leaderboard_rank(user_id, board, key)}
+
+
+def remove_from_dex(db, user_id, species):
+    """Remove the selected species from the living dex in one transaction; returns how many were removed."""
+    species = list(dict.fromkeys(str(pokemon) for pokemon in species))
+    if len(species) > MAX_BATCH:
+        raise ValueError(f"at most {MAX_BATCH} species per batch")
+    return db.delete_many_from_dex(user_id, species)
+
+
+def dex_snapshot(db, user_id):
+    caught = dict(db.living_dex(user_id))
+    missing = [pokemon for pokemon in GEN1_POKEMON if pokemon not in caught]
+    return {'caught': caught, 'missing': missing, 'complete': not missing}
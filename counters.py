@@ -0,0 +1,60 @@
+import threading
+import time
+
+import encounters
+from database import hunt_table
+
+
+class CounterBuffer:
+    """Encounter increments held in memory and written to the hunts tables in batched transactions.
+
+    Nothing touches the db on increment(); flush() is called on a timer, on pause and on exit, so a
+    crash loses at most one flush interval of counts. Each encounter's time is kept too and goes
+    into the encounter log (encounters.py) in the same transaction as the counts.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.Lock()
+        self.pending = {}  # (table, hunt_id) -> encounters not yet written
+        self.times = {}  # (table, hunt_id) -> (user_id, [ms of each of those encounters])
+        self.increments = 0
+        self.commits = 0
+
+    def increment(self, user_id, hunt_id, amount=1):
+        key = (hunt_table(user_id)[0], hunt_id)
+        now = int(time.time() * 1000)
+        with self.lock:
+            self.pending[key] = self.pending.get(key, 0) + amount
+            self.times.setdefault(key, (user_id, []))[1].extend([now] * amount)
+            self.increments += 1
+
+    def pending_for(self, user_id, hunt_id):
+        with self.lock:
+            return self.pending.get((hunt_table(user_id)[0], hunt_id), 0)
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            times, self.times = self.times, {}
+        if not pending:
+            return 0
+        by_table = {}
+        for (table, hunt_id), amount in pending.items():
+            by_table.setdefault(table, []).append((amount, hunt_id))
+        try:
+            with self.db.transaction() as c:
+                for table, rows in by_table.items():
+                    c.executemany(f"UPDATE {table} SET counter=counter+? WHERE id=?", rows)
+                for (table, hunt_id), (user_id, hunt_times) in times.items():
+                    encounters.append(c, table, user_id, hunt_id, hunt_times)
+        except Exception:
+            # keep the counts for the next flush rather than dropping them
+            with self.lock:
+                for key, amount in pending.items():
+                    self.pending[key] = self.pending.get(key, 0) + amount
+                for key, (user_id, hunt_times) in times.items():
+                    self.times.setdefault(key, (user_id, []))[1][:0] = hunt_times  # older, so in front
+            raise
+        self.commits += 1
+        return len(pending)
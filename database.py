@@ -0,0 +1,1233 @@
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import encounters
+import profiling
+from pokedex import GAMES, GEN1_POKEMON, METHODS, name_key
+
+DB_PATH = "shinyquest.db"
+
+PRAGMAS = (
+    "PRAGMA auto_vacuum=INCREMENTAL",  # takes effect on new files; older ones switch on `database.py vacuum`
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # WAL keeps the db consistent; only the last commits can be lost on power failure
+    "PRAGMA cache_size=-16000",  # 16 MB page cache
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",  # server.py runs several connections; a writer waits for another's commit
+)
+
+HUNT_TABLES = (("hunts", "user_id"), ("guest_hunts", "guest_id"))
+LOOKUP_TABLES = ("species", "games", "methods")
+LOOKUP_COLUMNS = {'species': "species_id", 'games': "game_id", 'methods': "method_id"}  # in hunts
+LOOKUP_KINDS = {'species': 1, 'games': 2, 'methods': 3}  # name_search rowid = lookup id * 4 + kind
+MAX_PARAMS = 900  # bound parameters per statement, under SQLite's default limit of 999 on old builds
+LEADERBOARD_MIN_SUCCESSES = 5  # shinies needed to be ranked by average attempts
+GUEST_TTL_SECONDS = 24 * 3600  # an idle guest session is dropped after this long
+GUEST_PURGE_BATCH = 2000  # legacy on-disk guest rows deleted per transaction
+VACUUM_PAGES = 512  # free pages handed back to the filesystem per incremental_vacuum step
+
+# How hunts, living_dex and the stats tables name the species, game and method of a row:
+# free text up to schema v6, ids into the lookup tables from v7 on.
+LEGACY_COLUMNS = {'species': "pokemon", 'game': "game", 'method': "method", 'type': "TEXT"}
+ID_COLUMNS = {'species': "species_id", 'game': "game_id", 'method': "method_id", 'type': "INTEGER"}
+
+
+def _migration_base_schema(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (id INTEGER PRIMARY KEY, username TEXT UNIQUE, email TEXT UNIQUE, password TEXT, bio TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS hunts
+                 (id INTEGER PRIMARY KEY, user_id TEXT, pokemon TEXT, game TEXT,
+                  method TEXT, counter INTEGER, success BOOLEAN)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS guest_hunts
+                 (id INTEGER PRIMARY KEY, guest_id TEXT, pokemon TEXT, game TEXT,
+                  method TEXT, counter INTEGER, success BOOLEAN)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS living_dex
+                 (id INTEGER PRIMARY KEY, user_id TEXT, pokemon TEXT, game TEXT, UNIQUE(user_id, pokemon))''')
+
+
+def _migration_hunt_indexes(c):
+    # mark_successful / caught_details look up one species of one owner
+    c.execute("CREATE INDEX IF NOT EXISTS idx_hunts_user_pokemon ON hunts (user_id, pokemon, success)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_guest_hunts_guest_pokemon ON guest_hunts (guest_id, pokemon, success)")
+    # covering indexes for the success=1 reads (living dex, unique species)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_hunts_user_success "
+              "ON hunts (user_id, success, pokemon, game, method, counter)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_guest_hunts_guest_success "
+              "ON guest_hunts (guest_id, success, pokemon, game, method, counter)")
+    # covering index for the per-method aggregate on the profile screen
+    c.execute("CREATE INDEX IF NOT EXISTS idx_hunts_user_method ON hunts (user_id, method, counter, success)")
+    c.execute("ANALYZE")
+
+
+def _create_living_dex_triggers(c, columns=ID_COLUMNS, tables=HUNT_TABLES, schema=""):
+    # living_dex follows hunts row by row instead of being rescanned on every screen visit
+    species, game = columns['species'], columns['game']
+    for table, owner in tables:
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {schema}{table}_dex_insert AFTER INSERT ON {table} WHEN NEW.success
+                      BEGIN
+                          INSERT OR IGNORE INTO living_dex (user_id, {species}, {game})
+                          VALUES (NEW.{owner}, NEW.{species}, NEW.{game});
+                      END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {schema}{table}_dex_update
+                      AFTER UPDATE OF success, {species} ON {table}
+                      BEGIN
+                          DELETE FROM living_dex WHERE OLD.success AND user_id=OLD.{owner} AND {species}=OLD.{species}
+                              AND NOT EXISTS (SELECT 1 FROM {table}
+                                              WHERE {owner}=OLD.{owner} AND {species}=OLD.{species} AND success=1);
+                          INSERT OR IGNORE INTO living_dex (user_id, {species}, {game})
+                          SELECT NEW.{owner}, NEW.{species}, NEW.{game} WHERE NEW.success;
+                      END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {schema}{table}_dex_delete AFTER DELETE ON {table} WHEN OLD.success
+                      BEGIN
+                          DELETE FROM living_dex WHERE user_id=OLD.{owner} AND {species}=OLD.{species}
+                              AND NOT EXISTS (SELECT 1 FROM {table}
+                                              WHERE {owner}=OLD.{owner} AND {species}=OLD.{species} AND success=1);
+                      END''')
+
+
+def _migration_living_dex_triggers(c):
+    _create_living_dex_triggers(c, LEGACY_COLUMNS)
+    for table, owner in HUNT_TABLES:
+        c.execute(f"INSERT OR IGNORE INTO living_dex (user_id, pokemon, game) "
+                  f"SELECT {owner}, pokemon, game FROM {table} WHERE success=1")
+
+
+def _migration_history_indexes(c):
+    # owner + id order for keyset pagination of the history list
+    c.execute("CREATE INDEX IF NOT EXISTS idx_hunts_user_id ON hunts (user_id, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_guest_hunts_guest_id ON guest_hunts (guest_id, id)")
+
+
+def _stats_delta(row, sign, columns=ID_COLUMNS):
+    """Statements adding (sign '+') or removing (sign '-') one hunts row's contribution to the stats tables."""
+    success = f"({row}.success<>0)"
+    species, game, method = columns['species'], columns['game'], columns['method']
+    return f'''
+        INSERT INTO user_stats (user_id) VALUES ({row}.user_id) ON CONFLICT(user_id) DO NOTHING;
+        UPDATE user_stats SET hunts=hunts{sign}1, attempts=attempts{sign}{row}.counter,
+                              successes=successes{sign}{success}
+        WHERE user_id={row}.user_id;
+        INSERT INTO user_method_stats (user_id, {method}, hunts, attempts, successes)
+        VALUES ({row}.user_id, {row}.{method}, {sign}1, {sign}{row}.counter, {sign}{success})
+        ON CONFLICT(user_id, {method}) DO UPDATE SET hunts=hunts+excluded.hunts, attempts=attempts+excluded.attempts,
+                                                     successes=successes+excluded.successes;
+        INSERT INTO user_game_stats (user_id, {game}, hunts, attempts, successes)
+        VALUES ({row}.user_id, {row}.{game}, {sign}1, {sign}{row}.counter, {sign}{success})
+        ON CONFLICT(user_id, {game}) DO UPDATE SET hunts=hunts+excluded.hunts, attempts=attempts+excluded.attempts,
+                                                   successes=successes+excluded.successes;
+        INSERT INTO user_species_stats (user_id, {species}, successes)
+        SELECT {row}.user_id, {row}.{species}, {sign}1 WHERE {row}.success
+        ON CONFLICT(user_id, {species}) DO UPDATE SET successes=successes+excluded.successes;
+    '''
+
+
+def _create_user_stats(c, columns=ID_COLUMNS):
+    # Profile totals kept up to date by triggers so the profile screen never aggregates over hunts.
+    species, game, method, kind = columns['species'], columns['game'], columns['method'], columns['type']
+    c.execute('''CREATE TABLE IF NOT EXISTS user_stats
+                 (user_id TEXT PRIMARY KEY, hunts INTEGER DEFAULT 0, attempts INTEGER DEFAULT 0,
+                  successes INTEGER DEFAULT 0, unique_species INTEGER DEFAULT 0)''')
+    c.execute(f'''CREATE TABLE IF NOT EXISTS user_method_stats
+                  (user_id TEXT, {method} {kind}, hunts INTEGER, attempts INTEGER, successes INTEGER,
+                   PRIMARY KEY (user_id, {method})) WITHOUT ROWID''')
+    c.execute(f'''CREATE TABLE IF NOT EXISTS user_game_stats
+                  (user_id TEXT, {game} {kind}, hunts INTEGER, attempts INTEGER, successes INTEGER,
+                   PRIMARY KEY (user_id, {game})) WITHOUT ROWID''')
+    c.execute(f'''CREATE TABLE IF NOT EXISTS user_species_stats
+                  (user_id TEXT, {species} {kind}, successes INTEGER,
+                   PRIMARY KEY (user_id, {species})) WITHOUT ROWID''')
+    # median and longest hunt walk this index instead of sorting the user's hunts
+    c.execute("CREATE INDEX IF NOT EXISTS idx_hunts_user_success_counter ON hunts (user_id, success, counter)")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS hunts_stats_insert AFTER INSERT ON hunts BEGIN "
+              f"{_stats_delta('NEW', '+', columns)} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS hunts_stats_delete AFTER DELETE ON hunts BEGIN "
+              f"{_stats_delta('OLD', '-', columns)} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS hunts_stats_update "
+              f"AFTER UPDATE OF user_id, {species}, {game}, {method}, counter, success ON hunts BEGIN "
+              f"{_stats_delta('OLD', '-', columns)} {_stats_delta('NEW', '+', columns)} END")
+    # a species counts towards unique_species while it has at least one successful hunt
+    c.execute('''CREATE TRIGGER IF NOT EXISTS user_species_stats_insert AFTER INSERT ON user_species_stats
+                 BEGIN
+                     UPDATE user_stats SET unique_species=unique_species+(NEW.successes>0) WHERE user_id=NEW.user_id;
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS user_species_stats_update AFTER UPDATE OF successes ON user_species_stats
+                 BEGIN
+                     UPDATE user_stats SET unique_species=unique_species+(NEW.successes>0)-(OLD.successes>0)
+                     WHERE user_id=NEW.user_id;
+                 END''')
+
+
+def _migration_user_stats(c):
+    # the tables are filled by _migration_normalized_hunts, which rebuilds them on lookup ids
+    _create_user_stats(c, LEGACY_COLUMNS)
+
+
+def _migration_import_progress(c):
+    # resume point of an interrupted streaming import, see importer.import_file
+    c.execute('''CREATE TABLE IF NOT EXISTS import_progress
+                 (user_id TEXT, path TEXT, size INTEGER, mtime REAL, rows_done INTEGER,
+                  PRIMARY KEY (user_id, path))''')
+
+
+def _lookup_id(c, table, name, create=True):
+    """Id of name in a lookup table (species, games, methods), matched by name_key; added if create."""
+    key = name_key(name)
+    if not key:
+        raise ValueError(f"missing {table} name")
+    row = c.execute(f"SELECT id FROM {table} WHERE key=?", (key,)).fetchone()
+    if row:
+        return row[0]
+    if create:
+        return c.execute(f"INSERT INTO {table} (name, key) VALUES (?, ?)", (name.strip(), key)).lastrowid
+    return None
+
+
+def _legacy_lookup(c, table, column, sources):
+    """Temp table mapping every free-text spelling in sources to its id in the lookup table."""
+    c.execute(f"CREATE TEMP TABLE legacy_{table} (name TEXT PRIMARY KEY, id INTEGER)")
+    names = set()
+    for source in sources:
+        names.update(row[0] or "" for row in c.execute(f"SELECT DISTINCT {column} FROM {source}"))
+    # sorted: "Pikachu" is seen before "pikachu" and becomes the display name
+    c.executemany(f"INSERT INTO legacy_{table} (name, id) VALUES (?, ?)",
+                  [(name, _lookup_id(c, table, name.strip() or "Unknown")) for name in sorted(names)])
+
+
+def _migration_normalized_hunts(c):
+    # Species, games and methods move into lookup tables; hunts, living_dex and the stats refer to
+    # them by integer id, so lookups are integer joins and "pikachu" and "Pikachu" are one species.
+    c.execute('''CREATE TABLE species
+                 (id INTEGER PRIMARY KEY, name TEXT NOT NULL, key TEXT NOT NULL UNIQUE,
+                  dex_number INTEGER, form TEXT)''')
+    c.execute('''CREATE TABLE games
+                 (id INTEGER PRIMARY KEY, name TEXT NOT NULL, key TEXT NOT NULL UNIQUE, generation INTEGER)''')
+    c.execute("CREATE TABLE methods (id INTEGER PRIMARY KEY, name TEXT NOT NULL, key TEXT NOT NULL UNIQUE)")
+    c.executemany("INSERT INTO species (name, key, dex_number) VALUES (?, ?, ?)",
+                  [(name, name_key(name), number) for number, name in enumerate(GEN1_POKEMON, start=1)])
+    c.executemany("INSERT INTO games (name, key, generation) VALUES (?, ?, ?)",
+                  [(name, name_key(name), generation) for name, generation in [("Unknown", None)] + GAMES])
+    c.executemany("INSERT INTO methods (name, key) VALUES (?, ?)",
+                  [(name, name_key(name)) for name in ["Unknown"] + METHODS])
+    hunt_tables = [table for table, _ in HUNT_TABLES]
+    _legacy_lookup(c, "species", "pokemon", hunt_tables + ["living_dex"])
+    _legacy_lookup(c, "games", "game", hunt_tables + ["living_dex"])
+    _legacy_lookup(c, "methods", "method", hunt_tables)
+
+    for table, owner in HUNT_TABLES:
+        c.execute(f'''CREATE TABLE {table}_v7
+                      (id INTEGER PRIMARY KEY, {owner} TEXT, species_id INTEGER NOT NULL REFERENCES species,
+                       game_id INTEGER NOT NULL REFERENCES games, method_id INTEGER NOT NULL REFERENCES methods,
+                       counter INTEGER NOT NULL DEFAULT 0, success BOOLEAN NOT NULL DEFAULT 0)''')
+        c.execute(f'''INSERT INTO {table}_v7 (id, {owner}, species_id, game_id, method_id, counter, success)
+                      SELECT h.id, h.{owner}, s.id, g.id, m.id, COALESCE(h.counter, 0), COALESCE(h.success, 0) <> 0
+                      FROM {table} h
+                      JOIN temp.legacy_species s ON s.name=COALESCE(h.pokemon, '')
+                      JOIN temp.legacy_games g ON g.name=COALESCE(h.game, '')
+                      JOIN temp.legacy_methods m ON m.name=COALESCE(h.method, '')''')
+        c.execute(f"DROP TABLE {table}")
+        c.execute(f"ALTER TABLE {table}_v7 RENAME TO {table}")
+
+    c.execute('''CREATE TABLE living_dex_v7
+                 (user_id TEXT, species_id INTEGER REFERENCES species, game_id INTEGER REFERENCES games,
+                  PRIMARY KEY (user_id, species_id)) WITHOUT ROWID''')
+    # rows removed with "Delete from Dex" stay removed; rows without a successful hunt behind them are dropped
+    c.execute('''INSERT OR IGNORE INTO living_dex_v7 (user_id, species_id, game_id)
+                 SELECT d.user_id, s.id, g.id FROM living_dex d
+                 JOIN temp.legacy_species s ON s.name=COALESCE(d.pokemon, '')
+                 JOIN temp.legacy_games g ON g.name=COALESCE(d.game, '')
+                 WHERE EXISTS (SELECT 1 FROM hunts WHERE user_id=d.user_id AND species_id=s.id AND success=1)
+                    OR EXISTS (SELECT 1 FROM guest_hunts WHERE guest_id=d.user_id AND species_id=s.id AND success=1)''')
+    c.execute("DROP TABLE living_dex")
+    c.execute("ALTER TABLE living_dex_v7 RENAME TO living_dex")
+    for table in LOOKUP_TABLES:
+        c.execute(f"DROP TABLE temp.legacy_{table}")
+
+    for table, owner in HUNT_TABLES:
+        # mark_successful / open_hunt / caught_details look up one species of one owner
+        c.execute(f"CREATE INDEX idx_{table}_{owner[:-3]}_species ON {table} ({owner}, species_id, success)")
+        # keyset pagination of the history list
+        c.execute(f"CREATE INDEX idx_{table}_{owner} ON {table} ({owner}, id)")
+    _create_living_dex_triggers(c)
+    for table in ("user_stats", "user_method_stats", "user_game_stats", "user_species_stats"):
+        c.execute(f"DROP TABLE IF EXISTS {table}")
+    _create_user_stats(c)
+    _rebuild_user_stats(c)
+    c.execute("ANALYZE")
+
+
+# the device whose changes are being written: this one, or a remote one while sync.py applies its changes
+SYNC_WRITER = "(SELECT value FROM sync_meta WHERE key='writer')"
+NOT_GUEST = "NOT LIKE 'guest\\_%' ESCAPE '\\'"
+
+
+def _migration_sync_log(c):
+    # Delta sync (see sync.py): every hunt gets a global uuid, each device's share of a counter is
+    # kept apart so counts from two devices merge as a grow-only counter, and triggers log every
+    # change to hunts and living_dex as one row per (entity, key, origin device) that moves to the
+    # end on each further change. Guests are session-only and never synced.
+    c.execute("CREATE TABLE sync_meta (key TEXT PRIMARY KEY, value) WITHOUT ROWID")
+    device = c.execute("SELECT lower(hex(randomblob(8)))").fetchone()[0]
+    c.executemany("INSERT INTO sync_meta (key, value) VALUES (?, ?)", [("device", device), ("writer", device)])
+    c.execute('''CREATE TABLE hunt_counts
+                 (hunt_uuid TEXT, device TEXT, count INTEGER NOT NULL,
+                  PRIMARY KEY (hunt_uuid, device)) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE changes
+                 (seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, entity TEXT NOT NULL,
+                  key TEXT NOT NULL, origin TEXT NOT NULL, UNIQUE (entity, key, origin))''')
+    c.execute("CREATE INDEX idx_changes_user_seq ON changes (user_id, seq)")
+    c.execute("ALTER TABLE hunts ADD COLUMN uuid TEXT")
+    c.execute("UPDATE hunts SET uuid=lower(hex(randomblob(16)))")
+    c.execute("CREATE UNIQUE INDEX idx_hunts_uuid ON hunts (uuid)")
+    # everything recorded so far counts as this device's and is pending for the first sync
+    c.execute("INSERT INTO hunt_counts (hunt_uuid, device, count) SELECT uuid, ?, counter FROM hunts WHERE counter>0",
+              (device,))
+    c.execute("INSERT INTO changes (user_id, entity, key, origin) "
+              "SELECT user_id, 'hunt', uuid, ? FROM hunts ORDER BY id", (device,))
+    c.execute(f"INSERT INTO changes (user_id, entity, key, origin) SELECT d.user_id, 'dex', s.key, ? FROM living_dex d "
+              f"CROSS JOIN species s ON s.id=d.species_id WHERE d.user_id {NOT_GUEST}", (device,))
+    log_change = "INSERT OR REPLACE INTO changes (user_id, entity, key, origin)"
+    c.execute(f'''CREATE TRIGGER hunts_sync_insert AFTER INSERT ON hunts
+                  BEGIN
+                      UPDATE hunts SET uuid=lower(hex(randomblob(16))) WHERE id=NEW.id AND uuid IS NULL;
+                      INSERT INTO hunt_counts (hunt_uuid, device, count)
+                      SELECT uuid, {SYNC_WRITER}, NEW.counter FROM hunts WHERE id=NEW.id AND NEW.counter>0;
+                      {log_change} SELECT NEW.user_id, 'hunt', uuid, {SYNC_WRITER} FROM hunts WHERE id=NEW.id;
+                  END''')
+    c.execute(f'''CREATE TRIGGER hunts_sync_update
+                  AFTER UPDATE OF species_id, game_id, method_id, counter, success ON hunts
+                  BEGIN
+                      INSERT INTO hunt_counts (hunt_uuid, device, count)
+                      SELECT NEW.uuid, {SYNC_WRITER}, NEW.counter-OLD.counter WHERE NEW.counter>OLD.counter
+                      ON CONFLICT (hunt_uuid, device) DO UPDATE SET count=count+excluded.count;
+                      {log_change} VALUES (NEW.user_id, 'hunt', NEW.uuid, {SYNC_WRITER});
+                  END''')
+    c.execute(f'''CREATE TRIGGER hunts_sync_delete AFTER DELETE ON hunts
+                  BEGIN
+                      DELETE FROM hunt_counts WHERE hunt_uuid=OLD.uuid;
+                      {log_change} VALUES (OLD.user_id, 'hunt', OLD.uuid, {SYNC_WRITER});
+                  END''')
+    for name, event, row in (("insert", "INSERT", "NEW"), ("update", "UPDATE OF game_id", "NEW"),
+                             ("delete", "DELETE", "OLD")):
+        c.execute(f'''CREATE TRIGGER living_dex_sync_{name} AFTER {event} ON living_dex WHEN {row}.user_id {NOT_GUEST}
+                      BEGIN
+                          {log_change} SELECT {row}.user_id, 'dex', key, {SYNC_WRITER} FROM species
+                          WHERE id={row}.species_id;
+                      END''')
+
+
+def _migration_guest_store(c):
+    # Guests moved to the in-memory store (_attach_guest_store). main.guest_hunts only holds rows
+    # abandoned by older versions until Database.purge_legacy_guests deletes them; without its
+    # triggers those deletes do not touch living_dex row by row.
+    for name in ("insert", "update", "delete"):
+        c.execute(f"DROP TRIGGER IF EXISTS main.guest_hunts_dex_{name}")
+
+
+def _attach_guest_store(c):
+    # Guest sessions live in an in-memory db attached to every connection, with the same tables as
+    # the file so the Database methods only swap the table name (see hunt_table and dex_table).
+    # Nothing a guest does reaches the file; a session goes when it ends, idles out or the app closes.
+    c.execute("ATTACH DATABASE ':memory:' AS guest")
+    c.execute('''CREATE TABLE guest.guest_hunts
+                 (id INTEGER PRIMARY KEY, guest_id TEXT NOT NULL, species_id INTEGER NOT NULL,
+                  game_id INTEGER NOT NULL, method_id INTEGER NOT NULL,
+                  counter INTEGER NOT NULL DEFAULT 0, success BOOLEAN NOT NULL DEFAULT 0)''')
+    c.execute("CREATE INDEX guest.idx_guest_hunts_guest_species ON guest_hunts (guest_id, species_id, success)")
+    c.execute("CREATE INDEX guest.idx_guest_hunts_guest_id ON guest_hunts (guest_id, id)")
+    c.execute("CREATE INDEX guest.idx_guest_hunts_guest_counter ON guest_hunts (guest_id, counter)")
+    c.execute('''CREATE TABLE guest.living_dex
+                 (user_id TEXT, species_id INTEGER, game_id INTEGER,
+                  PRIMARY KEY (user_id, species_id)) WITHOUT ROWID''')
+    c.execute("CREATE TABLE guest.sessions (guest_id TEXT PRIMARY KEY, last_seen INTEGER NOT NULL) WITHOUT ROWID")
+    _create_living_dex_triggers(c, tables=(("guest_hunts", "guest_id"),), schema="guest.")
+    _create_encounter_tables(c, "guest_hunts", "guest.")
+    # any write counts as activity for the TTL
+    for name, event in (("insert", "INSERT"), ("update", "UPDATE OF counter, success")):
+        c.execute(f'''CREATE TRIGGER guest.guest_hunts_seen_{name} AFTER {event} ON guest_hunts
+                      BEGIN
+                          INSERT INTO sessions (guest_id, last_seen)
+                          VALUES (NEW.guest_id, CAST(strftime('%s', 'now') AS INTEGER))
+                          ON CONFLICT (guest_id) DO UPDATE SET last_seen=excluded.last_seen;
+                      END''')
+
+
+def _migration_history_search(c):
+    # History search matches words of species, game and method names. hunts only hold ids, so the
+    # FTS5 index covers the few hundred lookup names instead of every hunt; the matching ids then
+    # filter hunts through the owner indexes. key (see pokedex.name_key) is indexed next to the name
+    # so "lets" finds "Let's Go" and "mrmime" finds "Mr. Mime". SQLite builds without FTS5 get no
+    # name_search and Database.name_matches falls back to LIKE over the lookup keys.
+    c.execute("CREATE INDEX idx_hunts_user_counter ON hunts (user_id, counter)")  # sort and range by encounters
+    try:
+        c.execute("CREATE VIRTUAL TABLE name_search USING fts5(name, key, tokenize='unicode61 remove_diacritics 2')")
+    except sqlite3.OperationalError:
+        return
+    for table, kind in LOOKUP_KINDS.items():
+        c.execute(f"INSERT INTO name_search (rowid, name, key) SELECT id*4+{kind}, name, key FROM {table}")
+        # lookup rows are never deleted, so inserts and renames are all there is to follow
+        c.execute(f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} "
+                  f"BEGIN INSERT INTO name_search (rowid, name, key) VALUES (NEW.id*4+{kind}, NEW.name, NEW.key); END")
+        c.execute(f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF name, key ON {table} "
+                  f"BEGIN UPDATE name_search SET name=NEW.name, key=NEW.key WHERE rowid=NEW.id*4+{kind}; END")
+    c.execute("ANALYZE")
+
+
+# Leaderboards rank the rows of the trigger-maintained stats tables:
+# name -> (stats table, per-game/method key column or None, score, "DESC" if higher is better, who is ranked).
+# {row} is "NEW.", "OLD." or "" in front of every column. Average attempts are ranked to whole encounters.
+# Top-K walks a partial index holding only the ranked rows in score order, so it reads K index entries.
+LEADERBOARDS = {
+    'shinies': ("user_stats", None, "{row}successes", "DESC", "{row}successes>0"),
+    'species': ("user_stats", None, "{row}unique_species", "DESC", "{row}unique_species>0"),
+    'avg_attempts': ("user_stats", None, "({row}attempts+{row}successes/2)/{row}successes", "ASC",
+                     f"{{row}}successes>={LEADERBOARD_MIN_SUCCESSES}"),
+    'game': ("user_game_stats", "game_id", "{row}successes", "DESC", "{row}successes>0"),
+    'method': ("user_method_stats", "method_id", "{row}successes", "DESC", "{row}successes>0"),
+}
+
+
+def _migration_leaderboards(c):
+    # Each board keeps a histogram, users per score, updated by triggers whenever a stats row's
+    # score changes, so "my rank" is 1 + the users on better scores: a sum over the board's
+    # distinct scores instead of a count over every user. Top-K reads a partial index on the score.
+    c.execute('''CREATE TABLE leaderboard_scores
+                 (board TEXT, key INTEGER, score INTEGER, users INTEGER NOT NULL,
+                  PRIMARY KEY (board, key, score)) WITHOUT ROWID''')
+    for name, (table, key, score, order, ranked) in LEADERBOARDS.items():
+        columns = ([key] if key else []) + [f"{score.format(row='')} {order}", "user_id"]
+        c.execute(f"CREATE INDEX idx_{table}_board_{name} ON {table} ({', '.join(columns)}) "
+                  f"WHERE {ranked.format(row='')}")
+        add, remove = (
+            f"INSERT INTO leaderboard_scores (board, key, score, users) "
+            f"SELECT '{name}', {f'NEW.{key}' if key else 0}, {score.format(row='NEW.')}, 1 "
+            f"WHERE {ranked.format(row='NEW.')} ON CONFLICT (board, key, score) DO UPDATE SET users=users+1;",
+            f"UPDATE leaderboard_scores SET users=users-1 WHERE {ranked.format(row='OLD.')} AND board='{name}' "
+            f"AND key={f'OLD.{key}' if key else 0} AND score={score.format(row='OLD.')};")
+        changed = " OR ".join(f"({expression.format(row='OLD.')}) IS NOT ({expression.format(row='NEW.')})"
+                              for expression in (score, ranked))
+        c.execute(f"CREATE TRIGGER {table}_board_{name}_insert AFTER INSERT ON {table} BEGIN {add} END")
+        c.execute(f"CREATE TRIGGER {table}_board_{name}_delete AFTER DELETE ON {table} BEGIN {remove} END")
+        c.execute(f"CREATE TRIGGER {table}_board_{name}_update AFTER UPDATE ON {table} WHEN {changed} "
+                  f"BEGIN {remove} {add} END")
+    _rebuild_leaderboards(c)
+    c.execute("ANALYZE")
+
+
+def _migration_leaderboard_prune(c):
+    # a score nobody holds any more is dropped, or the buckets a board has ever seen pile up and
+    # every rank query sums over all of them
+    c.execute('''CREATE TRIGGER leaderboard_scores_prune AFTER UPDATE OF users ON leaderboard_scores
+                 WHEN NEW.users=0
+                 BEGIN
+                     DELETE FROM leaderboard_scores WHERE board=NEW.board AND key=NEW.key AND score=NEW.score;
+                 END''')
+    c.execute("DELETE FROM leaderboard_scores WHERE users=0")
+
+
+def _create_encounter_tables(c, hunts="hunts", schema=""):
+    # Per-encounter times in compact blocks and their session and hourly rollups, see encounters.py.
+    # user_id is copied into the rollups so the profile reads them without going through hunts.
+    c.execute(f'''CREATE TABLE {schema}encounter_blocks
+                  (id INTEGER PRIMARY KEY, hunt_id INTEGER NOT NULL, first_ms INTEGER NOT NULL,
+                   last_ms INTEGER NOT NULL, events INTEGER NOT NULL, compressed BOOLEAN NOT NULL DEFAULT 0,
+                   data BLOB NOT NULL)''')
+    c.execute(f"CREATE INDEX {schema}idx_encounter_blocks_hunt ON encounter_blocks (hunt_id, id)")
+    c.execute(f'''CREATE TABLE {schema}encounter_sessions
+                  (hunt_id INTEGER, started_ms INTEGER, user_id TEXT NOT NULL, ended_ms INTEGER NOT NULL,
+                   encounters INTEGER NOT NULL, PRIMARY KEY (hunt_id, started_ms)) WITHOUT ROWID''')
+    c.execute(f"CREATE INDEX {schema}idx_encounter_sessions_user ON encounter_sessions (user_id, started_ms)")
+    c.execute(f'''CREATE TABLE {schema}encounter_hours
+                  (hunt_id INTEGER, hour INTEGER, user_id TEXT NOT NULL, encounters INTEGER NOT NULL,
+                   PRIMARY KEY (hunt_id, hour)) WITHOUT ROWID''')
+    c.execute(f"CREATE INDEX {schema}idx_encounter_hours_user ON encounter_hours (user_id, hour)")
+    c.execute(f'''CREATE TRIGGER {schema}{hunts}_encounters_delete AFTER DELETE ON {hunts}
+                  BEGIN
+                      DELETE FROM encounter_blocks WHERE hunt_id=OLD.id;
+                      DELETE FROM encounter_sessions WHERE hunt_id=OLD.id;
+                      DELETE FROM encounter_hours WHERE hunt_id=OLD.id;
+                  END''')
+
+
+def _migration_encounter_log(c):
+    _create_encounter_tables(c)
+
+
+def _leaderboard_histogram(c, name):
+    table, key, score, _, ranked = LEADERBOARDS[name]
+    return c.execute(f"SELECT {key or 0}, {score.format(row='')}, COUNT(*) FROM {table} "
+                     f"WHERE {ranked.format(row='')} GROUP BY 1, 2").fetchall()
+
+
+def _rebuild_leaderboards(c):
+    c.execute("DELETE FROM leaderboard_scores")
+    for name in LEADERBOARDS:
+        c.executemany("INSERT INTO leaderboard_scores (board, key, score, users) VALUES (?, ?, ?, ?)",
+                      [(name,) + row for row in _leaderboard_histogram(c, name)])
+
+
+# (table, key columns, value columns, the same values computed straight from hunts)
+STATS_TABLES = [
+    ("user_stats", ("user_id",), ("hunts", "attempts", "successes", "unique_species"),
+     "SELECT user_id, COUNT(*), SUM(counter), SUM(success<>0), COUNT(DISTINCT CASE WHEN success THEN species_id END) "
+     "FROM hunts {where} GROUP BY user_id"),
+    ("user_method_stats", ("user_id", "method_id"), ("hunts", "attempts", "successes"),
+     "SELECT user_id, method_id, COUNT(*), SUM(counter), SUM(success<>0) FROM hunts {where} "
+     "GROUP BY user_id, method_id"),
+    ("user_game_stats", ("user_id", "game_id"), ("hunts", "attempts", "successes"),
+     "SELECT user_id, game_id, COUNT(*), SUM(counter), SUM(success<>0) FROM hunts {where} GROUP BY user_id, game_id"),
+    ("user_species_stats", ("user_id", "species_id"), ("successes",),
+     "SELECT user_id, species_id, SUM(success<>0) FROM hunts {where} "
+     "GROUP BY user_id, species_id HAVING SUM(success<>0)>0"),
+]
+
+
+def _stats_from_hunts(c, query, user_id=None):
+    if user_id:
+        return c.execute(query.format(where="WHERE user_id=?"), (user_id,)).fetchall()
+    return c.execute(query.format(where="")).fetchall()
+
+
+def _rebuild_user_stats(c, user_id=None):
+    where, params = (" WHERE user_id=?", (user_id,)) if user_id else ("", ())
+    for table, keys, values, query in STATS_TABLES:
+        c.execute(f"DELETE FROM {table}{where}", params)
+        columns = keys + values
+        c.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                      _stats_from_hunts(c, query, user_id))
+    # the user_species_stats insert triggers have added to unique_species again; reset it
+    c.execute(f"UPDATE user_stats SET unique_species=(SELECT COUNT(*) FROM user_species_stats s "
+              f"WHERE s.user_id=user_stats.user_id AND s.successes>0){where}", params)
+
+
+def _repair_living_dex(c, user_id=None):
+    # accounts from hunts into the file's living_dex, live guests within the attached store; main.guest_hunts
+    # only holds legacy rows waiting for Database.purge_legacy_guests and is left alone
+    if user_id:
+        pairs = [(hunt_table(user_id), dex_table(user_id))]
+    else:
+        pairs = [(("hunts", "user_id"), "living_dex"), (("guest.guest_hunts", "guest_id"), "guest.living_dex")]
+    params = (user_id,) if user_id else ()
+    for (table, owner), dex in pairs:
+        c.execute(f"INSERT OR IGNORE INTO {dex} (user_id, species_id, game_id) "
+                  f"SELECT {owner}, species_id, game_id FROM {table} "
+                  f"WHERE {f'{owner}=? AND ' if user_id else ''}success=1", params)
+        # legacy guest rows in the file's living_dex go with the purge as well
+        accounts = "" if dex.startswith("guest.") else "user_id NOT LIKE 'guest\\_%' ESCAPE '\\' AND "
+        c.execute(f"DELETE FROM {dex} WHERE {'user_id=? AND ' if user_id else ''}{accounts}"
+                  f"NOT EXISTS (SELECT 1 FROM {table} WHERE {owner}=living_dex.user_id "
+                  f"AND species_id=living_dex.species_id AND success=1)", params)
+
+
+# Applied in order; PRAGMA user_version holds how many have run. Only ever append.
+MIGRATIONS = [
+    _migration_base_schema,
+    _migration_hunt_indexes,
+    _migration_living_dex_triggers,
+    _migration_history_indexes,
+    _migration_user_stats,
+    _migration_import_progress,
+    _migration_normalized_hunts,
+    _migration_sync_log,
+    _migration_guest_store,
+    _migration_history_search,
+    _migration_leaderboards,
+    _migration_leaderboard_prune,
+    _migration_encounter_log,
+]
+
+# hunts rows with their species, game and method names; {table} is hunts or guest.guest_hunts.
+# CROSS JOIN fixes the join order: the owner's rows drive, names come from primary-key lookups,
+# however few rows the lookup tables have.
+HUNT_SELECT = ("SELECT h.id, s.name, g.name, m.name, h.counter, h.success FROM {table} h "
+               "CROSS JOIN species s ON s.id=h.species_id CROSS JOIN games g ON g.id=h.game_id "
+               "CROSS JOIN methods m ON m.id=h.method_id")
+
+# History search orders: name -> (ORDER BY, keyset condition on the previous page's last (counter, id))
+SEARCH_SORTS = {
+    'oldest': ("h.id", "h.id>?"),
+    'newest': ("h.id DESC", "h.id<?"),
+    'most_encounters': ("h.counter DESC, h.id DESC", "(h.counter, h.id)<(?, ?)"),
+    'fewest_encounters': ("h.counter, h.id", "(h.counter, h.id)>(?, ?)"),
+}
+
+# Queries run on every screen visit; none of them may fall back to a table scan.
+HOT_QUERIES = [
+    "SELECT 1 FROM users WHERE username=? AND password=?",
+    "SELECT id FROM species WHERE key=?",
+    "SELECT hunts, attempts, successes, unique_species FROM user_stats WHERE user_id=?",
+    "SELECT m.name FROM user_method_stats u CROSS JOIN methods m ON m.id=u.method_id "
+    "WHERE u.user_id=? AND u.hunts>0 ORDER BY u.hunts DESC LIMIT 1",
+    "SELECT g.name, u.hunts, u.attempts, u.successes FROM user_game_stats u CROSS JOIN games g ON g.id=u.game_id "
+    "WHERE u.user_id=? AND u.hunts>0",
+    "SELECT MAX(counter) FROM hunts WHERE user_id=? AND success=1",
+    "SELECT g.name, m.name, h.counter, h.success FROM hunts h CROSS JOIN games g ON g.id=h.game_id "
+    "CROSS JOIN methods m ON m.id=h.method_id WHERE h.user_id=?",
+    "SELECT counter FROM hunts WHERE user_id=? AND success=1 ORDER BY counter LIMIT 2 OFFSET ?",
+    "UPDATE hunts SET success=1, counter=counter+1 WHERE user_id=? AND species_id=? AND success=0",
+    "UPDATE guest.guest_hunts SET success=1, counter=counter+1 WHERE guest_id=? AND species_id=? AND success=0",
+    HUNT_SELECT.format(table="hunts") + " WHERE h.user_id=? AND h.id>? ORDER BY h.id LIMIT ?",
+    HUNT_SELECT.format(table="guest.guest_hunts") + " WHERE h.guest_id=? AND h.id>? ORDER BY h.id LIMIT ?",
+    "SELECT id, counter FROM hunts WHERE user_id=? AND species_id=? AND success=0 ORDER BY id DESC LIMIT 1",
+    "SELECT g.name, m.name, h.counter FROM hunts h CROSS JOIN games g ON g.id=h.game_id CROSS JOIN methods m ON m.id=h.method_id "
+    "WHERE h.user_id=? AND h.species_id=? AND h.success=1 LIMIT 1",
+    "SELECT s.name, g.name FROM living_dex d CROSS JOIN species s ON s.id=d.species_id CROSS JOIN games g ON g.id=d.game_id "
+    "WHERE d.user_id=?",
+    "DELETE FROM living_dex WHERE user_id=? AND species_id=?",
+    "UPDATE hunts SET counter=counter+? WHERE id=? AND user_id=?",
+    HUNT_SELECT.format(table="hunts") + " WHERE h.id IN (?, ?) AND h.user_id=?",
+    "SELECT s.name, g.name FROM guest.living_dex d CROSS JOIN species s ON s.id=d.species_id "
+    "CROSS JOIN games g ON g.id=d.game_id WHERE d.user_id=?",
+    "DELETE FROM guest.guest_hunts WHERE guest_id=?",
+    "SELECT user_id, successes FROM user_stats WHERE successes>0 ORDER BY successes DESC, user_id LIMIT ?",
+    "SELECT user_id, successes FROM user_game_stats WHERE game_id=? AND successes>0 "
+    "ORDER BY successes DESC, user_id LIMIT ?",
+    "SELECT TOTAL(CASE WHEN score>? THEN users END), TOTAL(users) FROM leaderboard_scores WHERE board=? AND key=?",
+    HUNT_SELECT.format(table="hunts") + " WHERE h.user_id=? AND (h.species_id IN (1, 2) OR h.game_id IN (3)) "
+    "AND h.success=? AND h.id<? ORDER BY h.id DESC LIMIT ?",
+    HUNT_SELECT.format(table="hunts") + " WHERE h.user_id=? AND h.game_id=? AND h.counter>=? "
+    "AND (h.counter, h.id)<(?, ?) ORDER BY h.counter DESC, h.id DESC LIMIT ?",
+    "SELECT started_ms, ended_ms, encounters FROM encounter_sessions WHERE user_id=? ORDER BY started_ms DESC LIMIT ?",
+    "SELECT hour, SUM(encounters) FROM encounter_hours WHERE user_id=? AND hour>? GROUP BY hour ORDER BY hour",
+    "SELECT id, last_ms, events, compressed FROM encounter_blocks WHERE hunt_id=? ORDER BY id DESC LIMIT 1",
+]
+
+
+def hunt_table(user_id):
+    if user_id.startswith("guest_"):
+        return "guest.guest_hunts", "guest_id"
+    return "hunts", "user_id"
+
+
+def dex_table(user_id):
+    return "guest.living_dex" if user_id.startswith("guest_") else "living_dex"
+
+
+class Database:
+    """One long-lived connection shared by every screen instead of a connect() per button press."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.lock = threading.RLock()
+        # isolation_level=None: we issue BEGIN/COMMIT ourselves in transaction()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=256,
+                                    factory=profiling.connection_factory())
+        for pragma in PRAGMAS:
+            self.conn.execute(pragma)
+        _attach_guest_store(self.conn)
+        self.lookup_ids = {}  # (lookup table, name_key) -> id; lookup rows are never deleted
+
+    def close(self):
+        with self.lock:
+            self.conn.execute("PRAGMA optimize")
+            self.conn.close()
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            if self.conn.in_transaction:
+                yield self.conn
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                self.lookup_ids.clear()  # may hold ids of rows that were just rolled back
+                raise
+            self.conn.execute("COMMIT")
+
+    def fetchone(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    @property
+    def schema_version(self):
+        return self.fetchone("PRAGMA user_version")[0]
+
+    def migrate(self):
+        version = self.schema_version
+        if version > len(MIGRATIONS):
+            raise RuntimeError(f"shinyquest.db schema v{version} is newer than this app (v{len(MIGRATIONS)})")
+        for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+            with self.transaction() as c:
+                step(c)
+                c.execute(f"PRAGMA user_version={number}")
+
+    def query_plan(self, sql):
+        params = (None,) * sql.count("?")
+        return [row[3] for row in self.fetchall(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+    def table_scans(self):
+        """Hot queries whose plan contains a full SCAN, as {sql: plan}."""
+        scans = {}
+        for sql in HOT_QUERIES:
+            plan = self.query_plan(sql)
+            if any(step.startswith("SCAN") for step in plan):
+                scans[sql] = plan
+        return scans
+
+    # Users
+
+    def authenticate(self, username, password_hash):
+        return self.fetchone("SELECT 1 FROM users WHERE username=? AND password=?", (username, password_hash)) is not None
+
+    def create_user(self, username, email, password_hash):
+        with self.transaction() as c:
+            c.execute("INSERT INTO users (username, email, password, bio) VALUES (?, ?, ?, ?)",
+                      (username, email, password_hash, ""))
+
+    def get_user(self, username):
+        return self.fetchone("SELECT username, email, bio FROM users WHERE username=?", (username,))
+
+    def update_bio(self, username, bio):
+        with self.transaction() as c:
+            c.execute("UPDATE users SET bio=? WHERE username=?", (bio, username))
+
+    # Lookups
+
+    def lookup_id(self, table, name, create=False):
+        """Id of name in species, games or methods, or None if it is not there and create is false."""
+        cache_key = (table, name_key(name))
+        if cache_key in self.lookup_ids:
+            return self.lookup_ids[cache_key]
+        if create:
+            with self.transaction() as c:
+                row_id = _lookup_id(c, table, name)
+        else:
+            with self.lock:
+                row_id = _lookup_id(self.conn, table, name, create=False)
+        if row_id is not None:
+            self.lookup_ids[cache_key] = row_id
+        return row_id
+
+    def hunt_ids(self, pokemon, game, method):
+        """(species_id, game_id, method_id) for a new hunt, adding names the lookup tables do not have yet."""
+        return (self.lookup_id("species", pokemon, create=True),
+                self.lookup_id("games", game.strip() or "Unknown", create=True),
+                self.lookup_id("methods", method.strip() or "Unknown", create=True))
+
+    def species_names(self):
+        return [row[0] for row in self.fetchall("SELECT name FROM species ORDER BY id")]
+
+    # Hunts
+
+    def insert_hunt(self, user_id, pokemon, game="Unknown", method="Unknown", counter=0, success=False):
+        table, owner = hunt_table(user_id)
+        with self.transaction() as c:
+            cur = c.execute(f"INSERT INTO {table} ({owner}, species_id, game_id, method_id, counter, success) "
+                            f"VALUES (?, ?, ?, ?, ?, ?)",
+                            (user_id,) + self.hunt_ids(pokemon, game, method) + (counter, success))
+            return cur.lastrowid
+
+    def insert_hunts(self, user_id, hunts):
+        """Insert (pokemon, game, method, counter, success) rows in one transaction."""
+        table, owner = hunt_table(user_id)
+        with self.transaction() as c:
+            c.executemany(f"INSERT INTO {table} ({owner}, species_id, game_id, method_id, counter, success) "
+                          f"VALUES (?, ?, ?, ?, ?, ?)",
+                          [(user_id,) + self.hunt_ids(pokemon, game, method) + (counter, success)
+                           for pokemon, game, method, counter, success in hunts])
+
+    def mark_successful(self, user_id, pokemon):
+        table, owner = hunt_table(user_id)
+        species_id = self.lookup_id("species", pokemon)
+        if species_id is None:
+            return
+        with self.transaction() as c:
+            c.execute(f"UPDATE {table} SET success=1, counter=counter+1 WHERE {owner}=? AND species_id=? AND success=0",
+                      (user_id, species_id))
+
+    def open_hunt(self, user_id, pokemon):
+        """(id, counter) of the newest unfinished hunt for pokemon, or None."""
+        table, owner = hunt_table(user_id)
+        species_id = self.lookup_id("species", pokemon)
+        if species_id is None:
+            return None
+        return self.fetchone(f"SELECT id, counter FROM {table} WHERE {owner}=? AND species_id=? AND success=0 "
+                             f"ORDER BY id DESC LIMIT 1", (user_id, species_id))
+
+    def hunts_page(self, user_id, after_id=None, limit=50):
+        """Keyset pagination: the next `limit` hunts with id > after_id, oldest first."""
+        table, owner = hunt_table(user_id)
+        return self.fetchall(HUNT_SELECT.format(table=table) + f" WHERE h.{owner}=? AND h.id>? ORDER BY h.id LIMIT ?",
+                             (user_id, after_id or 0, limit))
+
+    def hunts_by_id(self, user_id, hunt_ids):
+        """user_id's hunts among hunt_ids, in id order; ids of other users' hunts are skipped."""
+        table, owner = hunt_table(user_id)
+        hunts = []
+        with self.lock:
+            for start in range(0, len(hunt_ids), MAX_PARAMS):
+                ids = hunt_ids[start:start + MAX_PARAMS]
+                sql = HUNT_SELECT.format(table=table) + f" WHERE h.id IN ({', '.join('?' * len(ids))}) AND h.{owner}=?"
+                hunts += self.conn.execute(sql, ids + [user_id]).fetchall()
+        return sorted(hunts)
+
+    def name_matches(self, word):
+        """{lookup table: ids} of the species, game and method names with a word starting with word."""
+        matches = {}
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name='name_search'").fetchone():
+                query = '"' + word.replace('"', '""') + '"*'
+                for (rowid,) in self.conn.execute("SELECT rowid FROM name_search WHERE name_search MATCH ?", (query,)):
+                    kind = next(table for table, kind in LOOKUP_KINDS.items() if kind == rowid % 4)
+                    matches.setdefault(kind, []).append(rowid // 4)
+            else:
+                for table in LOOKUP_TABLES:
+                    ids = [row[0] for row in self.conn.execute(f"SELECT id FROM {table} WHERE key LIKE ?",
+                                                               (f"%{name_key(word)}%",))]
+                    if ids:
+                        matches[table] = ids
+        return matches
+
+    def search_hunts(self, user_id, text="", species=None, game=None, method=None, success=None,
+                     min_counter=None, max_counter=None, sort="oldest", after=None, limit=50):
+        """One page of user_id's hunts matching every given filter, sorted and keyset-paginated in SQL.
+
+        Every word of text has to start a word of the hunt's species, game or method name. after is
+        (counter, id) of the last hunt of the previous page.
+        """
+        if sort not in SEARCH_SORTS:
+            raise ValueError(f"sort must be one of {', '.join(SEARCH_SORTS)}")
+        table, owner = hunt_table(user_id)
+        where, params = [f"h.{owner}=?"], [user_id]
+        for lookup, name in (("species", species), ("games", game), ("methods", method)):
+            if name:
+                row_id = self.lookup_id(lookup, name)
+                if row_id is None:
+                    return []
+                where.append(f"h.{LOOKUP_COLUMNS[lookup]}=?")
+                params.append(row_id)
+        for word in re.findall(r"\w+", text):
+            matches = self.name_matches(word)
+            if not matches:
+                return []
+            # ids come from the db, so they go into the SQL as literals instead of hundreds of parameters
+            where.append("(" + " OR ".join(f"h.{LOOKUP_COLUMNS[lookup]} IN ({', '.join(map(str, ids))})"
+                                           for lookup, ids in matches.items()) + ")")
+        if success is not None:
+            where.append("h.success=?")
+            params.append(int(bool(success)))
+        if min_counter is not None:
+            where.append("h.counter>=?")
+            params.append(min_counter)
+        if max_counter is not None:
+            where.append("h.counter<=?")
+            params.append(max_counter)
+        order, keyset = SEARCH_SORTS[sort]
+        if after is not None:
+            where.append(keyset)
+            params += list(after) if "counter" in order else [after[1]]
+        return self.fetchall(HUNT_SELECT.format(table=table) + f" WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?",
+                             params + [limit])
+
+    def add_encounters(self, user_id, increments):
+        """Add (hunt_id, amount) pairs to user_id's hunts in one transaction; returns the rows updated."""
+        table, owner = hunt_table(user_id)
+        with self.transaction() as c:
+            cur = c.executemany(f"UPDATE {table} SET counter=counter+? WHERE id=? AND {owner}=?",
+                                [(amount, hunt_id, user_id) for hunt_id, amount in increments])
+            return cur.rowcount
+
+    def delete_hunt(self, user_id, hunt_id):
+        table, owner = hunt_table(user_id)
+        with self.transaction() as c:
+            c.execute(f"DELETE FROM {table} WHERE id=? AND {owner}=?", (hunt_id, user_id))
+
+    # Batches: one transaction and one commit for the whole selection; the triggers keep living_dex,
+    # the stats and the leaderboards current row by row inside it.
+
+    def delete_hunts(self, user_id, hunt_ids):
+        """Delete user_id's hunts among hunt_ids; returns the rows deleted."""
+        table, owner = hunt_table(user_id)
+        with self.transaction() as c:
+            cur = c.executemany(f"DELETE FROM {table} WHERE id=? AND {owner}=?",
+                                [(hunt_id, user_id) for hunt_id in hunt_ids])
+            return cur.rowcount
+
+    def mark_hunts_successful(self, user_id, hunt_ids):
+        """Close user_id's open hunts among hunt_ids, counting the encounter that found the shiny like
+        mark_successful does; returns the rows updated."""
+        table, owner = hunt_table(user_id)
+        with self.transaction() as c:
+            cur = c.executemany(f"UPDATE {table} SET success=1, counter=counter+1 "
+                                f"WHERE id=? AND {owner}=? AND success=0",
+                                [(hunt_id, user_id) for hunt_id in hunt_ids])
+            return cur.rowcount
+
+    def edit_hunts(self, user_id, hunt_ids, game=None, method=None):
+        """Move user_id's hunts among hunt_ids to game and/or method; returns the rows updated.
+
+        A living dex entry recorded from one of the hunts follows it to the new game, unless another
+        caught hunt of the species is still in the old one.
+        """
+        table, owner = hunt_table(user_id)
+        changes = {}
+        if game:
+            changes['game_id'] = self.lookup_id("games", game, create=True)
+        if method:
+            changes['method_id'] = self.lookup_id("methods", method, create=True)
+        if not changes:
+            return 0
+        assignments = ", ".join(f"{column}=?" for column in changes)
+        with self.transaction() as c:
+            caught = []
+            if 'game_id' in changes:
+                for start in range(0, len(hunt_ids), MAX_PARAMS):
+                    ids = hunt_ids[start:start + MAX_PARAMS]
+                    caught += c.execute(f"SELECT species_id, game_id FROM {table} "
+                                        f"WHERE id IN ({', '.join('?' * len(ids))}) AND {owner}=? AND success=1 "
+                                        f"AND game_id<>?",
+                                        ids + [user_id, changes['game_id']]).fetchall()
+            cur = c.executemany(f"UPDATE {table} SET {assignments} WHERE id=? AND {owner}=?",
+                                [tuple(changes.values()) + (hunt_id, user_id) for hunt_id in hunt_ids])
+            updated = cur.rowcount
+            c.executemany(f"UPDATE {dex_table(user_id)} SET game_id=? WHERE user_id=? AND species_id=? AND game_id=? "
+                          f"AND NOT EXISTS (SELECT 1 FROM {table} WHERE {owner}=? AND species_id=? AND game_id=? "
+                          f"AND success=1)",
+                          [(changes['game_id'], user_id, species_id, game_id, user_id, species_id, game_id)
+                           for species_id, game_id in set(caught)])
+            return updated
+
+    # Stats
+
+    def user_stats(self, user_id):
+        """Profile numbers from the trigger-maintained stats tables; nothing here aggregates over hunts.
+
+        Guest sessions have no stats tables, so their few session-only hunts are aggregated directly.
+        """
+        table, owner = hunt_table(user_id)
+        if owner == "guest_id":
+            row = self.fetchone("SELECT COUNT(*), IFNULL(SUM(counter), 0), IFNULL(SUM(success<>0), 0), "
+                                "COUNT(DISTINCT CASE WHEN success THEN species_id END) FROM guest.guest_hunts "
+                                "WHERE guest_id=?", (user_id,))
+            favorite = self.fetchone("SELECT m.name FROM guest.guest_hunts h CROSS JOIN methods m ON m.id=h.method_id "
+                                     "WHERE h.guest_id=? GROUP BY h.method_id ORDER BY COUNT(*) DESC LIMIT 1",
+                                     (user_id,))
+            games = self.fetchall("SELECT g.name, COUNT(*), SUM(h.counter), SUM(h.success<>0) FROM guest.guest_hunts h "
+                                  "CROSS JOIN games g ON g.id=h.game_id WHERE h.guest_id=? GROUP BY h.game_id",
+                                  (user_id,))
+        else:
+            row = self.fetchone("SELECT hunts, attempts, successes, unique_species FROM user_stats WHERE user_id=?",
+                                (user_id,))
+            favorite = self.fetchone("SELECT m.name FROM user_method_stats u CROSS JOIN methods m ON m.id=u.method_id "
+                                     "WHERE u.user_id=? AND u.hunts>0 ORDER BY u.hunts DESC LIMIT 1", (user_id,))
+            games = self.fetchall("SELECT g.name, u.hunts, u.attempts, u.successes FROM user_game_stats u "
+                                  "CROSS JOIN games g ON g.id=u.game_id WHERE u.user_id=? AND u.hunts>0", (user_id,))
+        hunts, attempts, successes, unique_species = row or (0, 0, 0, 0)
+        longest = self.fetchone(f"SELECT MAX(counter) FROM {table} WHERE {owner}=? AND success=1", (user_id,))[0]
+        return {
+            'hunts': hunts,
+            'attempts': attempts,
+            'successes': successes,
+            'unique_species': unique_species,
+            'avg_attempts': attempts / successes if successes else 0,
+            'favorite_method': favorite[0] if favorite else "None",
+            'games': games,
+            'longest_hunt': longest or 0,
+            'median_attempts': self.median_attempts(user_id, successes),
+        }
+
+    def median_attempts(self, user_id, successes):
+        if not successes:
+            return 0
+        table, owner = hunt_table(user_id)
+        middle = [row[0] for row in self.fetchall(
+            f"SELECT counter FROM {table} WHERE {owner}=? AND success=1 ORDER BY counter LIMIT 2 OFFSET ?",
+            (user_id, (successes - 1) // 2))]
+        return middle[0] if successes % 2 else sum(middle) / 2
+
+    def check_user_stats(self, user_id=None):
+        """Recompute the stats tables from hunts and return the rows that disagree, as (table, key, stored, actual)."""
+        diffs = []
+        with self.lock:
+            for table, keys, values, query in STATS_TABLES:
+                actual = {row[:len(keys)]: row[len(keys):] for row in _stats_from_hunts(self.conn, query, user_id)}
+                where, params = (" WHERE user_id=?", (user_id,)) if user_id else ("", ())
+                stored = {row[:len(keys)]: row[len(keys):] for row in self.conn.execute(
+                    f"SELECT {', '.join(keys + values)} FROM {table}{where}", params)}
+                for key in actual.keys() | stored.keys():
+                    stored_row, actual_row = stored.get(key), actual.get(key)
+                    if stored_row and not any(stored_row) and actual_row is None:
+                        continue  # emptied rows (all zero) are left behind by deletes
+                    if stored_row != actual_row:
+                        diffs.append((table, key, stored_row, actual_row))
+        return diffs
+
+    def rebuild_user_stats(self, user_id=None):
+        with self.transaction() as c:
+            _rebuild_user_stats(c, user_id)
+            if not user_id:
+                _rebuild_leaderboards(c)
+
+    def check_leaderboards(self):
+        """Recount the leaderboard histograms; returns the disagreeing scores as (board, key, score, stored, actual)."""
+        diffs = []
+        with self.lock:
+            for name in LEADERBOARDS:
+                actual = {(key, score): users for key, score, users in _leaderboard_histogram(self.conn, name)}
+                stored = {(key, score): users for key, score, users in self.conn.execute(
+                    "SELECT key, score, users FROM leaderboard_scores WHERE board=?", (name,))}
+                for key, score in actual.keys() | stored.keys():
+                    if stored.get((key, score)) != actual.get((key, score)):
+                        diffs.append((name, key, score, stored.get((key, score)), actual.get((key, score))))
+        return diffs
+
+    def hunt_odds_rows(self, user_id):
+        """(game, method, counter, success) of every hunt of user_id, the input of odds.summarize."""
+        table, owner = hunt_table(user_id)
+        return self.fetchall(f"SELECT g.name, m.name, h.counter, h.success FROM {table} h "
+                             f"CROSS JOIN games g ON g.id=h.game_id CROSS JOIN methods m ON m.id=h.method_id "
+                             f"WHERE h.{owner}=?", (user_id,))
+
+    def profile(self, username):
+        """(user row, stats dict) for the profile screen."""
+        return self.get_user(username), self.user_stats(username)
+
+    # Encounter activity: read from the rollups encounters.py keeps, never from the events
+
+    def hunt_activity(self, user_id, hunt_id, hours, sessions):
+        """{'sessions': newest (started_ms, ended_ms, encounters) first, 'hours': (hour, encounters) of the
+        hours up to the hunt's last active one} for one of user_id's hunts, or None if it is not theirs."""
+        table, owner = hunt_table(user_id)
+        prefix = encounters.schema(table)
+        with self.lock:
+            if not self.conn.execute(f"SELECT 1 FROM {table} WHERE id=? AND {owner}=?", (hunt_id, user_id)).fetchone():
+                return None
+            recent = self.conn.execute(f"SELECT started_ms, ended_ms, encounters FROM {prefix}encounter_sessions "
+                                       f"WHERE hunt_id=? ORDER BY started_ms DESC LIMIT ?",
+                                       (hunt_id, sessions)).fetchall()
+            last = self.conn.execute(f"SELECT MAX(hour) FROM {prefix}encounter_hours WHERE hunt_id=?",
+                                     (hunt_id,)).fetchone()[0]
+            by_hour = [] if last is None else self.conn.execute(
+                f"SELECT hour, encounters FROM {prefix}encounter_hours WHERE hunt_id=? AND hour>? ORDER BY hour",
+                (hunt_id, last - hours)).fetchall()
+        return {'sessions': recent, 'hours': by_hour}
+
+    def user_activity(self, user_id, hours, sessions):
+        """hunt_activity across all of user_id's hunts."""
+        prefix = encounters.schema(hunt_table(user_id)[0])
+        with self.lock:
+            recent = self.conn.execute(f"SELECT started_ms, ended_ms, encounters FROM {prefix}encounter_sessions "
+                                       f"WHERE user_id=? ORDER BY started_ms DESC LIMIT ?",
+                                       (user_id, sessions)).fetchall()
+            last = self.conn.execute(f"SELECT MAX(hour) FROM {prefix}encounter_hours WHERE user_id=?",
+                                     (user_id,)).fetchone()[0]
+            by_hour = [] if last is None else self.conn.execute(
+                f"SELECT hour, SUM(encounters) FROM {prefix}encounter_hours WHERE user_id=? AND hour>? "
+                f"GROUP BY hour ORDER BY hour", (user_id, last - hours)).fetchall()
+        return {'sessions': recent, 'hours': by_hour}
+
+    # Leaderboards
+
+    def _board(self, board, key):
+        """(stats table, key column, score, order, ranked, key id) of a board; key id None for unknown names."""
+        if board not in LEADERBOARDS:
+            raise ValueError(f"board must be one of {', '.join(LEADERBOARDS)}")
+        table, key_column, score, order, ranked = LEADERBOARDS[board]
+        if not key_column:
+            return table, key_column, score, order, ranked, 0
+        if not key:
+            raise ValueError(f"the {board} board needs a {board} name")
+        lookup = next(lookup for lookup, column in LOOKUP_COLUMNS.items() if column == key_column)
+        return table, key_column, score, order, ranked, self.lookup_id(lookup, key)
+
+    def leaderboard_top(self, board, key=None, limit=10):
+        """[(rank, user_id, score)] of the best limit users on board; key names the game or method of those boards."""
+        table, key_column, score, order, ranked, key_id = self._board(board, key)
+        if key_id is None:
+            return []
+        where, params = ranked.format(row=''), [limit]
+        if key_column:
+            where, params = f"{key_column}=? AND {where}", [key_id] + params
+        rows = self.fetchall(f"SELECT user_id, {score.format(row='')} FROM {table} WHERE {where} "
+                             f"ORDER BY {score.format(row='')} {order}, user_id LIMIT ?", params)
+        top = []
+        for position, (user_id, value) in enumerate(rows, start=1):
+            top.append((top[-1][0] if top and top[-1][2] == value else position, user_id, value))  # ties share a rank
+        return top
+
+    def leaderboard_rank(self, user_id, board, key=None):
+        """(rank, score, ranked users) of user_id on board, or None while user_id is not ranked there."""
+        table, key_column, score, order, ranked, key_id = self._board(board, key)
+        if key_id is None:
+            return None
+        where, params = f"user_id=? AND {ranked.format(row='')}", [user_id]
+        if key_column:
+            where, params = f"{key_column}=? AND {where}", [key_id] + params
+        with self.lock:
+            row = self.conn.execute(f"SELECT {score.format(row='')} FROM {table} WHERE {where}", params).fetchone()
+            if row is None:
+                return None
+            ahead, users = self.conn.execute(
+                f"SELECT TOTAL(CASE WHEN score{'>' if order == 'DESC' else '<'}? THEN users END), TOTAL(users) "
+                f"FROM leaderboard_scores WHERE board=? AND key=?", (row[0], board, key_id)).fetchone()
+        return int(ahead) + 1, row[0], int(users)
+
+    # Living dex
+
+    def repair_living_dex(self, user_id=None):
+        """Full rebuild from hunts; the triggers keep living_dex current, this is only for repairs."""
+        with self.transaction() as c:
+            _repair_living_dex(c, user_id)
+
+    def caught_details(self, user_id, pokemon):
+        table, owner = hunt_table(user_id)
+        return self.fetchone(f"SELECT g.name, m.name, h.counter FROM {table} h CROSS JOIN games g ON g.id=h.game_id "
+                             f"CROSS JOIN methods m ON m.id=h.method_id WHERE h.{owner}=? AND h.species_id=? AND h.success=1 "
+                             f"LIMIT 1", (user_id, self.lookup_id("species", pokemon)))
+
+    def delete_from_dex(self, user_id, pokemon):
+        with self.transaction() as c:
+            c.execute(f"DELETE FROM {dex_table(user_id)} WHERE user_id=? AND species_id=?",
+                      (user_id, self.lookup_id("species", pokemon)))
+
+    def delete_many_from_dex(self, user_id, species):
+        """Remove every pokemon in species from user_id's living dex in one transaction; returns the rows removed."""
+        with self.transaction() as c:
+            cur = c.executemany(f"DELETE FROM {dex_table(user_id)} WHERE user_id=? AND species_id=?",
+                                [(user_id, self.lookup_id("species", pokemon)) for pokemon in species])
+            return cur.rowcount
+
+    def living_dex(self, user_id):
+        """(species name, game name) of every caught species."""
+        return self.fetchall(f"SELECT s.name, g.name FROM {dex_table(user_id)} d "
+                             f"CROSS JOIN species s ON s.id=d.species_id CROSS JOIN games g ON g.id=d.game_id "
+                             f"WHERE d.user_id=?", (user_id,))
+
+    # Guest sessions and upkeep
+
+    def end_guest_session(self, guest_id):
+        """Drop everything guest_id recorded; the in-memory store only ever holds live sessions."""
+        with self.transaction() as c:
+            c.execute("DELETE FROM guest.guest_hunts WHERE guest_id=?", (guest_id,))
+            c.execute("DELETE FROM guest.living_dex WHERE user_id=?", (guest_id,))
+            c.execute("DELETE FROM guest.sessions WHERE guest_id=?", (guest_id,))
+
+    def expire_guest_sessions(self, ttl=GUEST_TTL_SECONDS, keep=None):
+        """End the sessions with no write for ttl seconds, except keep (the signed-in guest); returns their ids."""
+        expired = [row[0] for row in self.fetchall(
+            "SELECT guest_id FROM guest.sessions WHERE last_seen<CAST(strftime('%s', 'now') AS INTEGER)-?", (ttl,))]
+        for guest_id in expired:
+            if guest_id != keep:
+                self.end_guest_session(guest_id)
+        return [guest_id for guest_id in expired if guest_id != keep]
+
+    def purge_legacy_guests(self, batch=GUEST_PURGE_BATCH, pages=VACUUM_PAGES):
+        """Delete the guest rows older versions left in the file, batch rows per transaction; returns how many.
+
+        Each batch is followed by an incremental_vacuum step. In a file created before auto_vacuum was
+        switched on those steps do nothing and the freed pages are reused; `python database.py vacuum`
+        converts such a file.
+        """
+        statements = (
+            "DELETE FROM main.guest_hunts WHERE id IN (SELECT id FROM main.guest_hunts LIMIT ?)",
+            # guest ids sort between 'guest_' and 'guest`', a range on the primary key
+            "DELETE FROM main.living_dex WHERE (user_id, species_id) IN "
+            "(SELECT user_id, species_id FROM main.living_dex WHERE user_id>='guest_' AND user_id<'guest`' LIMIT ?)",
+        )
+        purged = 0
+        for sql in statements:
+            deleted = batch
+            while deleted >= batch:
+                with self.transaction() as c:
+                    deleted = c.execute(sql, (batch,)).rowcount
+                purged += deleted
+                self.compact(pages)
+        return purged
+
+    def compact(self, pages=VACUUM_PAGES):
+        """Return up to pages free pages to the filesystem; a no-op until the file uses auto_vacuum=INCREMENTAL."""
+        with self.lock:
+            # execute() steps a statement once, which frees one page; executescript runs it to the end
+            self.conn.executescript(f"PRAGMA main.incremental_vacuum({int(pages)})")
+
+    def vacuum(self):
+        """Rewrite the whole file, which also switches one created before auto_vacuum to INCREMENTAL.
+
+        As slow as copying the file and holds the lock throughout, so it is a maintenance command and
+        never run by the app.
+        """
+        with self.lock:
+            self.conn.execute("VACUUM main")
+
+
+_db = None
+
+
+def get_db():
+    global _db
+    if _db is None:
+        _db = Database()
+    return _db
+
+
+def open_db(path=DB_PATH):
+    """Point the shared connection at path, e.g. a benchmark's synthetic db."""
+    global _db
+    close_db()
+    _db = Database(path)
+    return _db
+
+
+def close_db():
+    global _db
+    if _db is not None:
+        _db.close()
+        _db = None
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ShinyQuest database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    # for CI: migrate a scratch db and fail if a hot query regressed to a table scan
+    commands.add_parser("check-plans")
+    repair = commands.add_parser("repair-dex", help="rebuild living_dex from hunts")
+    repair.add_argument("user", nargs="?")
+    check_stats = commands.add_parser("check-stats", help="diff the stats tables and leaderboards against hunts")
+    check_stats.add_argument("user", nargs="?")
+    rebuild_stats = commands.add_parser("rebuild-stats", help="recompute the stats tables and leaderboards from hunts")
+    rebuild_stats.add_argument("user", nargs="?")
+    commands.add_parser("vacuum", help="rewrite the file once so purges can hand free pages back; close the app first")
+    args = parser.parse_args(argv)
+
+    if args.command == "check-plans":
+        db = Database(":memory:")
+        db.migrate()
+        scans = db.table_scans()
+        for sql, plan in scans.items():
+            print(f"SCAN: {sql}\n    " + "\n    ".join(plan))
+        return 1 if scans else 0
+    db = get_db()
+    db.migrate()
+    status = 0
+    if args.command == "repair-dex":
+        db.repair_living_dex(args.user)
+    elif args.command == "check-stats":
+        for table, key, stored, actual in db.check_user_stats(args.user):
+            print(f"{table} {key}: stored {stored}, actual {actual}")
+            status = 1
+        for board, key, score, stored, actual in db.check_leaderboards():
+            print(f"leaderboard {board} {key} score {score}: stored {stored} users, actual {actual}")
+            status = 1
+    elif args.command == "rebuild-stats":
+        db.rebuild_user_stats(args.user)
+    elif args.command == "vacuum":
+        db.vacuum()
+    close_db()
+    return status
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main())
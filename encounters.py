@@ -0,0 +1,118 @@
+"""Per-encounter timestamps, stored compactly, and the rollups the rate charts read.
+
+Timestamps are integer milliseconds. Each hunt's events go into blocks of up to BLOCK_EVENTS: a
+block keeps its first and last timestamp, and its data is the gaps between consecutive events as
+LEB128 varints, so an encounter every few seconds costs two or three bytes. The open block is
+appended to in SQL on every counter flush (|| makes TEXT, hence the CAST back to BLOB); once full
+it is zlib-compressed and the next event starts a new one.
+
+Sessions (runs of encounters less than SESSION_GAP_MS apart) and per-hour counts are updated in
+the same transaction as the events, so the charts read a few rollup rows, never the events.
+"""
+import collections
+import zlib
+
+BLOCK_EVENTS = 4096
+SESSION_GAP_MS = 30 * 60 * 1000  # a longer break between encounters starts a new session
+HOUR_MS = 3600 * 1000
+
+
+def schema(hunt_table):
+    """The "guest." or "" in front of the event tables that go with hunt_table."""
+    name, _, _ = hunt_table.rpartition(".")
+    return f"{name}." if name else ""
+
+
+def encode_gaps(times, previous):
+    """Varints of the gaps from previous to times[0] and between consecutive times."""
+    out = bytearray()
+    for t in times:
+        gap, previous = t - previous, t
+        while gap >= 0x80:
+            out.append(gap & 0x7F | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return bytes(out)
+
+
+def decode_gaps(data, previous):
+    times, gap, shift = [], 0, 0
+    for byte in data:
+        gap |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += gap
+        times.append(previous)
+        gap, shift = 0, 0
+    return times
+
+
+def append(c, hunt_table, user_id, hunt_id, times):
+    """Record times (ms, oldest first) as encounters of hunt_id and update its rollups; call inside a transaction.
+
+    Events for a hunt that no longer exists are dropped. A time before an earlier encounter (the
+    clock went back) is stored as that encounter's time.
+    """
+    prefix = schema(hunt_table)
+    if not times or c.execute(f"SELECT 1 FROM {hunt_table} WHERE id=?", (hunt_id,)).fetchone() is None:
+        return
+    block = c.execute(f"SELECT id, last_ms, events, compressed FROM {prefix}encounter_blocks WHERE hunt_id=? "
+                      f"ORDER BY id DESC LIMIT 1", (hunt_id,)).fetchone()
+    floor, ordered = block[1] if block else 0, []
+    for t in times:
+        floor = max(floor, t)
+        ordered.append(floor)
+    _append_blocks(c, prefix, hunt_id, block, ordered)
+    _update_sessions(c, prefix, user_id, hunt_id, ordered)
+    hours = collections.Counter(t // HOUR_MS for t in ordered)
+    c.executemany(f"INSERT INTO {prefix}encounter_hours (hunt_id, hour, user_id, encounters) VALUES (?, ?, ?, ?) "
+                  f"ON CONFLICT (hunt_id, hour) DO UPDATE SET encounters=encounters+excluded.encounters",
+                  [(hunt_id, hour, user_id, count) for hour, count in hours.items()])
+
+
+def _append_blocks(c, prefix, hunt_id, block, times):
+    # block is (id, last_ms, events, compressed) of the hunt's newest block, or None
+    while times:
+        if block is None or block[3]:
+            block_id = c.execute(f"INSERT INTO {prefix}encounter_blocks (hunt_id, first_ms, last_ms, events, data) "
+                                 f"VALUES (?, ?, ?, 0, x'')", (hunt_id, times[0], times[0])).lastrowid
+            block = (block_id, times[0], 0, 0)
+        block_id, last_ms, events, _ = block
+        chunk, times = times[:BLOCK_EVENTS - events], times[BLOCK_EVENTS - events:]
+        c.execute(f"UPDATE {prefix}encounter_blocks SET data=CAST(data||? AS BLOB), last_ms=?, events=events+? "
+                  f"WHERE id=?",
+                  (encode_gaps(chunk, last_ms), chunk[-1], len(chunk), block_id))
+        block = (block_id, chunk[-1], events + len(chunk), 0)
+        if block[2] >= BLOCK_EVENTS:
+            # full: compressed once, so the open block keeps growing with a cheap concatenation
+            data = c.execute(f"SELECT data FROM {prefix}encounter_blocks WHERE id=?", (block_id,)).fetchone()[0]
+            c.execute(f"UPDATE {prefix}encounter_blocks SET data=?, compressed=1 WHERE id=?",
+                      (zlib.compress(data, 9), block_id))
+            block = None
+
+
+def _update_sessions(c, prefix, user_id, hunt_id, times):
+    last = c.execute(f"SELECT started_ms, ended_ms, encounters FROM {prefix}encounter_sessions WHERE hunt_id=? "
+                     f"ORDER BY started_ms DESC LIMIT 1", (hunt_id,)).fetchone()
+    sessions = [list(last)] if last else []
+    for t in times:
+        if sessions and t - sessions[-1][1] <= SESSION_GAP_MS:
+            sessions[-1][1] = t
+            sessions[-1][2] += 1
+        else:
+            sessions.append([t, t, 1])
+    c.executemany(f"INSERT INTO {prefix}encounter_sessions (hunt_id, started_ms, user_id, ended_ms, encounters) "
+                  f"VALUES (?, ?, ?, ?, ?) ON CONFLICT (hunt_id, started_ms) "
+                  f"DO UPDATE SET ended_ms=excluded.ended_ms, encounters=excluded.encounters",
+                  [(hunt_id, started, user_id, ended, count) for started, ended, count in sessions])
+
+
+def events(c, hunt_table, hunt_id):
+    """Every recorded encounter time of hunt_id, oldest first; the charts never need this."""
+    times = []
+    for first_ms, data, compressed in c.execute(f"SELECT first_ms, data, compressed FROM "
+                                                f"{schema(hunt_table)}encounter_blocks WHERE hunt_id=? ORDER BY id",
+                                                (hunt_id,)):
+        times += decode_gaps(zlib.decompress(data) if compressed else data, first_ms)
+    return times
@@ -0,0 +1,70 @@
+import csv
+import json
+
+from database import HUNT_SELECT, hunt_table
+from importer import open_text
+
+BATCH_ROWS = 1000
+FIELDS = ("pokemon", "game", "method", "counter", "success")
+FORMATS = ("json", "ndjson", "csv")
+
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def format_for(path):
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    for file_format in FORMATS:
+        if name.endswith("." + file_format):
+            return file_format
+    if name.endswith(".jsonl"):
+        return "ndjson"
+    return None
+
+
+def iter_hunt_batches(db, user_id, batch_rows=BATCH_ROWS):
+    """The user's hunts in id order, batch_rows at a time, straight off one cursor."""
+    table, owner = hunt_table(user_id)
+    with db.lock:
+        cursor = db.conn.execute(HUNT_SELECT.format(table=table) + f" WHERE h.{owner}=? ORDER BY h.id", (user_id,))
+    while True:
+        with db.lock:
+            rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            return
+        yield rows
+
+
+def export_hunts(db, user_id, path, file_format=None, progress=None):
+    """Write user_id's hunts to path as JSON, NDJSON or CSV (gzip if path ends in .gz).
+
+    Rows are written as they are fetched, so memory stays at one batch whatever the hunt count.
+    The output is the record layout importer.import_file reads. progress(rows) is called per batch.
+    """
+    file_format = file_format or format_for(path) or "json"
+    if file_format not in FORMATS:
+        raise ValueError(f"unknown export format {file_format!r}")
+    rows_written = 0
+    with open_text(path, "w") as f:
+        if file_format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+        elif file_format == "json":
+            f.write("[")
+        for rows in iter_hunt_batches(db, user_id):
+            if file_format == "csv":
+                writer.writerows((pokemon, game, method, counter, "true" if success else "false")
+                                 for _, pokemon, game, method, counter, success in rows)
+            else:
+                records = [_encode(dict(zip(FIELDS, row[1:5] + (bool(row[5]),)))) for row in rows]
+                if file_format == "ndjson":
+                    f.write("\n".join(records) + "\n")
+                else:
+                    f.write(("\n" if rows_written == 0 else ",\n") + ",\n".join(records))
+            rows_written += len(rows)
+            if progress:
+                progress(rows_written)
+        if file_format == "json":
+            f.write("\n]\n")
+    return rows_written
@@ -0,0 +1,225 @@
+import csv
+import gzip
+import json
+import os
+import time
+
+READ_SIZE = 64 * 1024
+CHUNK_ROWS = 1000
+MAX_REJECTS = 1000  # reasons kept for the report; the rest are only counted
+MAX_RECORD_CHARS = 1024 * 1024
+
+
+class _CountingReader:
+    def __init__(self, f):
+        self.f = f
+        self.chars = 0
+
+    def read(self, size):
+        data = self.f.read(size)
+        self.chars += len(data)
+        return data
+
+    def __iter__(self):
+        for line in self.f:
+            self.chars += len(line)
+            yield line
+
+
+def _read_more(f, buf, pos):
+    if len(buf) - pos > MAX_RECORD_CHARS:
+        raise ValueError("record too large or not valid JSON")
+    chunk = f.read(READ_SIZE)
+    return buf[pos:] + chunk, 0, not chunk
+
+
+def _element_end(buf, pos):
+    """Index of the , or ] ending the array element that starts at pos, or None if buf ends first."""
+    depth, in_string, escaped = 0, False, False
+    for i in range(pos, len(buf)):
+        char = buf[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            if depth == 0:
+                return i  # the array's own ]
+            depth -= 1
+        elif char == "," and depth == 0:
+            return i
+    return None
+
+
+def iter_json_array(f):
+    """Yield the elements of a top-level JSON array one at a time, holding about one read buffer in memory.
+
+    A malformed element is yielded as a ValueError, as iter_ndjson does for a bad line, and parsing
+    carries on after the next top-level , or ].
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof, started = "", 0, False, False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError("unexpected end of file")
+            buf, pos, eof = _read_more(f, buf, pos)
+            continue
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("expected a JSON array of hunts")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            # the element may only be cut off by the buffer; it is malformed once its end is in sight
+            boundary = _element_end(buf, pos)
+            if boundary is None:
+                if eof:
+                    raise ValueError(f"invalid JSON: {e.msg}") from None
+                buf, pos, eof = _read_more(f, buf, pos)
+                continue
+            yield ValueError(f"invalid JSON: {e.msg}")
+            pos = boundary
+            continue
+        if end == len(buf) and not eof:
+            # a value ending exactly at the buffer edge may continue in the next read
+            buf, pos, eof = _read_more(f, buf, pos)
+            continue
+        yield value
+        pos = end
+
+
+def iter_ndjson(f):
+    for line in f:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield ValueError(f"invalid JSON: {e.msg}")
+
+
+def iter_csv(f):
+    return csv.DictReader(f)
+
+
+def open_text(path, mode):
+    """Text handle on path, gzip-compressed when the name ends in .gz."""
+    if path.lower().endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def detect_format(path):
+    name = path.lower()
+    extension = os.path.splitext(name[:-3] if name.endswith(".gz") else name)[1]
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson"
+    if extension == ".csv":
+        return "csv"
+    with open_text(path, "r") as f:
+        head = f.read(READ_SIZE).lstrip()
+    return "json" if head.startswith("[") else "ndjson"
+
+
+def validate_hunt(hunt):
+    """(pokemon, game, method, counter, success) for one imported record, or ValueError saying why not."""
+    if isinstance(hunt, Exception):
+        raise hunt
+    if not isinstance(hunt, dict):
+        raise ValueError("not an object")
+    pokemon = hunt.get("pokemon")
+    if not isinstance(pokemon, str) or not pokemon.strip():
+        raise ValueError("missing pokemon")
+    game = hunt.get("game") or "Unknown"
+    method = hunt.get("method") or "Unknown"
+    counter = hunt.get("counter", 0)
+    if isinstance(counter, bool) or not isinstance(counter, (int, str)):
+        raise ValueError(f"bad counter {counter!r}")
+    try:
+        counter = int(counter)
+    except ValueError:
+        raise ValueError(f"bad counter {counter!r}") from None
+    if counter < 0:
+        raise ValueError(f"negative counter {counter}")
+    success = hunt.get("success", False)
+    if isinstance(success, str):
+        if success.strip().lower() not in ("true", "false", "1", "0", ""):
+            raise ValueError(f"bad success flag {success!r}")
+        success = success.strip().lower() in ("true", "1")
+    elif success not in (True, False, 0, 1, None):
+        raise ValueError(f"bad success flag {success!r}")
+    return pokemon.strip(), str(game), str(method), counter, bool(success)
+
+
+def import_file(db, path, user_id, progress=None, chunk_rows=CHUNK_ROWS):
+    """Stream hunts from a JSON array, NDJSON or CSV file (optionally .gz) into user_id's hunts.
+
+    Rows are validated one by one and inserted chunk_rows at a time, each chunk in its own
+    transaction together with the resume point, so an interrupted import continues where it
+    stopped when the same, unchanged file is imported again. progress(records, chars, total_chars)
+    is called after every chunk; total_chars is None for compressed files.
+    """
+    started = time.perf_counter()
+    stat = os.stat(path)
+    resume = db.fetchone("SELECT rows_done FROM import_progress WHERE user_id=? AND path=? AND size=? AND mtime=?",
+                         (user_id, path, stat.st_size, stat.st_mtime))
+    skip = resume[0] if resume else 0
+    records = imported = rejected = 0
+    rejects = []
+    chunk = []
+
+    def commit():
+        with db.transaction() as c:
+            db.insert_hunts(user_id, chunk)
+            c.execute("INSERT OR REPLACE INTO import_progress (user_id, path, size, mtime, rows_done) "
+                      "VALUES (?, ?, ?, ?, ?)", (user_id, path, stat.st_size, stat.st_mtime, records))
+        chunk.clear()
+        if progress:
+            progress(records, reader.chars, None if path.lower().endswith(".gz") else stat.st_size)
+
+    file_format = detect_format(path)
+    with open_text(path, "r") as f:
+        reader = _CountingReader(f)
+        parse = {"json": iter_json_array, "ndjson": iter_ndjson, "csv": iter_csv}[file_format]
+        for record in parse(reader):
+            records += 1
+            if records <= skip:
+                continue
+            try:
+                chunk.append(validate_hunt(record))
+            except ValueError as e:
+                rejected += 1
+                if len(rejects) < MAX_REJECTS:
+                    rejects.append((records, str(e)))
+                continue
+            imported += 1
+            if len(chunk) >= chunk_rows:
+                commit()
+        commit()
+    with db.transaction() as c:
+        c.execute("DELETE FROM import_progress WHERE user_id=? AND path=?", (user_id, path))
+    seconds = time.perf_counter() - started
+    return {
+        'format': file_format,
+        'records': records,
+        'imported': imported,
+        'rejected': rejected,
+        'rejects': rejects,
+        'resumed_from': skip,
+        'seconds': seconds,
+        'rows_per_second': imported / seconds if seconds else 0,
+    }
@@ -0,0 +1,177 @@
+"""Load test for server.py: requests/sec and tail latency per endpoint.
+
+    python loadtest.py --spawn --users 50 --clients 32 --duration 10
+    python loadtest.py --url http://127.0.0.1:8080 --users 50   # a server on a benchmark.py-style db
+
+--spawn builds a synthetic db with benchmark.generate and starts server.py on it in a child
+process. Each client logs in as one of the synthetic trainers and then loops over a request mix
+on one keep-alive connection, mostly batched counter updates like the app's flush.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import benchmark
+
+# endpoint -> share of the requests
+MIX = {
+    'counters': 0.5,
+    'hunts_page': 0.2,
+    'hunts_fetch': 0.15,
+    'dex': 0.1,
+    'stats': 0.05,
+}
+COUNTER_BATCH = 10
+FETCH_BATCH = 50
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.token = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        headers = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(payload)}\r\n"
+        if self.token:
+            headers += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write((headers + "\r\n").encode("latin-1") + payload)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        self.writer.close()
+
+
+async def run_client(host, port, username, deadline, seed, latencies, errors):
+    rng = random.Random(seed)
+    client = Client(host, port)
+    await client.connect()
+    try:
+        status, result = await client.request("POST", "/login", {'username': username, 'password': benchmark.PASSWORD})
+        if status != 200:
+            raise RuntimeError(f"login as {username} failed: {result}")
+        client.token = result['token']
+        _, page = await client.request("GET", "/hunts?limit=500")
+        hunt_ids = [hunt['id'] for hunt in page['hunts']] or [0]
+        requests = {
+            'counters': lambda: ("POST", "/counters", {'increments': [
+                [rng.choice(hunt_ids), rng.randint(1, 20)] for _ in range(COUNTER_BATCH)]}),
+            'hunts_page': lambda: ("GET", f"/hunts?after={rng.choice(hunt_ids)}&limit=50", None),
+            'hunts_fetch': lambda: ("POST", "/hunts/fetch",
+                                    {'ids': rng.sample(hunt_ids, min(FETCH_BATCH, len(hunt_ids)))}),
+            'dex': lambda: ("GET", "/dex", None),
+            'stats': lambda: ("GET", "/stats", None),
+        }
+        names, weights = list(MIX), list(MIX.values())
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            status, _ = await client.request(*requests[name]())
+            latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+    finally:
+        client.close()
+
+
+async def load(host, port, usernames, clients, duration, seed=0):
+    latencies, errors = {}, {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(run_client(host, port, usernames[i % len(usernames)], deadline, seed + i, latencies, errors)
+                           for i in range(clients)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(latencies, errors, seconds):
+    everything = sorted(ms for samples in latencies.values() for ms in samples)
+    report = {'requests': len(everything), 'seconds': seconds, 'requests_per_second': len(everything) / seconds,
+              'errors': errors, 'endpoints': {}}
+    for name, samples in sorted(latencies.items()) + [("all", everything)]:
+        samples = sorted(samples)
+        report['endpoints'][name] = {
+            'count': len(samples),
+            'p50_ms': samples[len(samples) // 2],
+            'p95_ms': samples[int(0.95 * (len(samples) - 1))],
+            'p99_ms': samples[int(0.99 * (len(samples) - 1))],
+            'max_ms': samples[-1],
+        }
+    return report
+
+
+def spawn_server(path, pool, concurrency):
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"),
+                               "--db", path, "--port", "0", "--pool", str(pool), "--concurrency", str(concurrency)],
+                              stdout=subprocess.PIPE, text=True)
+    url = urlsplit(server.stdout.readline().split()[-1])  # "listening on http://host:port"
+    return server, url.hostname, url.port
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the ShinyQuest HTTP service")
+    parser.add_argument("--url", help="server to test (default: --spawn one)")
+    parser.add_argument("--spawn", action="store_true", help="start server.py on a synthetic db")
+    parser.add_argument("--users", type=int, default=50, help="synthetic trainers (trainer0..N-1)")
+    parser.add_argument("--hunts", type=int, default=200, help="hunts per trainer for --spawn")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--pool", type=int, default=4, help="server db connections for --spawn")
+    parser.add_argument("--concurrency", type=int, default=64, help="server request limit for --spawn")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", help="also write the report here as JSON")
+    args = parser.parse_args(argv)
+    if not args.url and not args.spawn:
+        parser.error("give --url or --spawn")
+
+    usernames = [f"trainer{i}" for i in range(args.users)]
+    with tempfile.TemporaryDirectory() as workdir:
+        server = None
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port
+        else:
+            path = os.path.join(workdir, "shinyquest.db")
+            usernames = benchmark.generate(path, args.users, args.hunts, 0, 0, args.seed)
+            server, host, port = spawn_server(path, args.pool, args.concurrency)
+        try:
+            report = summarize(*asyncio.run(load(host, port, usernames, args.clients, args.duration, args.seed)))
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    report['clients'] = args.clients
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(f"{report['requests']} requests in {report['seconds']:.1f} s: {report['requests_per_second']:.0f} req/s, "
+          f"{args.clients} clients, errors {report['errors'] or 'none'}")
+    for name, result in report['endpoints'].items():
+        print(f"{name:12} {result['count']:7}  p50 {result['p50_ms']:7.2f}  p95 {result['p95_ms']:7.2f}  "
+              f"p99 {result['p99_ms']:7.2f}  max {result['max_ms']:7.2f} ms")
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,86 +1,165 @@
-import hashlib
-import json
+import time
+
+STARTUP = {'start': time.perf_counter()}  # taken before the kivy imports, which dominate cold start
+
+import os
 import sqlite3
-import uuid
 import webbrowser  # Added for opening donation links
 
 from kivy.app import App
+from kivy.base import EventLoop
+from kivy.clock import Clock
+from kivy.graphics import Color, Rectangle
+from kivy.logger import Logger
+from kivy.properties import BooleanProperty, ListProperty, NumericProperty, ObjectProperty, StringProperty
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
-from kivy.uix.gridlayout import GridLayout
+from kivy.uix.checkbox import CheckBox
 from kivy.uix.label import Label
 from kivy.uix.popup import Popup
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recyclegridlayout import RecycleGridLayout
+from kivy.uix.recycleview import RecycleView
 from kivy.uix.screenmanager import ScreenManager, Screen
-from kivy.uix.scrollview import ScrollView
+from kivy.uix.spinner import Spinner
 from kivy.uix.textinput import TextInput
+from kivy.uix.widget import Widget
 from kivy.utils import platform
 from plyer import filechooser
 
-is_android = platform == 'android'
+import backup
+import core
+import exporter
+import importer
+import profiling
+from counters import CounterBuffer
+from database import GUEST_TTL_SECONDS, LEADERBOARD_MIN_SUCCESSES, close_db, get_db
+from pokedex import GAMES, GEN1_POKEMON, METHODS, name_key, species_index
+from worker import DBWorker
 
-GEN1_POKEMON = [
-    "Bulbasaur", "Ivysaur", "Venusaur", "Charmander", "Charmeleon", "Charizard",
-    "Squirtle", "Wartortle", "Blastoise", "Caterpie", "Metapod", "Butterfree",
-    "Weedle", "Kakuna", "Beedrill", "Pidgey", "Pidgeotto", "Pidgeot",
-    "Rattata", "Raticate", "Spearow", "Fearow", "Ekans", "Arbok",
-    "Pikachu", "Raichu", "Sandshrew", "Sandslash", "Nidoran♀", "Nidorina",
-    "Nidoqueen", "Nidoran♂", "Nidorino", "Nidoking", "Clefairy", "Clefable",
-    "Vulpix", "Ninetales", "Jigglypuff", "Wigglytuff", "Zubat", "Golbat",
-    "Oddish", "Gloom", "Vileplume", "Paras", "Parasect", "Venonat", "Venomoth",
-    "Diglett", "Dugtrio", "Meowth", "Persian", "Psyduck", "Golduck",
-    "Mankey", "Primeape", "Growlithe", "Arcanine", "Poliwag", "Poliwhirl",
-    "Poliwrath", "Abra", "Kadabra", "Alakazam", "Machop", "Machoke", "Machamp",
-    "Bellsprout", "Weepinbell", "Victreebel", "Tentacool", "Tentacruel",
-    "Geodude", "Graveler", "Golem", "Ponyta", "Rapidash", "Slowpoke", "Slowbro",
-    "Magnemite", "Magneton", "Farfetch'd", "Doduo", "Dodrio", "Seel", "Dewgong",
-    "Grimer", "Muk", "Shellder", "Cloyster", "Gastly", "Haunter", "Gengar",
-    "Onix", "Drowzee", "Hypno", "Krabby", "Kingler", "Voltorb", "Electrode",
-    "Exeggcute", "Exeggutor", "Cubone", "Marowak", "Hitmonlee", "Hitmonchan",
-    "Lickitung", "Koffing", "Weezing", "Rhyhorn", "Rhydon", "Chansey",
-    "Tangela", "Kangaskhan", "Horsea", "Seadra", "Goldeen", "Seaking",
-    "Staryu", "Starmie", "Mr. Mime", "Scyther", "Jynx", "Electabuzz",
-    "Magmar", "Pinsir", "Tauros", "Magikarp", "Gyarados", "Lapras", "Ditto",
-    "Eevee", "Vaporeon", "Jolteon", "Flareon", "Porygon", "Omanyte", "Omastar",
-    "Kabuto", "Kabutops", "Aerodactyl", "Snorlax", "Articuno", "Zapdos",
-    "Moltres", "Dratini", "Dragonair", "Dragonite", "Mewtwo", "Mew"
-]
+STARTUP['imported'] = time.perf_counter()
+
+is_android = platform == 'android'
+STARTUP_BUDGET_MS = 1500  # import + build + first frame on a low-end Android device
+
+HISTORY_PAGE_SIZE = 50
+SEARCH_DELAY_SECONDS = 0.3  # typing pause before the history search runs
+ANY_GAME, ANY_METHOD = "Any game", "Any method"
+KEEP_GAME, KEEP_METHOD = "Keep game", "Keep method"
+HISTORY_STATUSES = [(None, "All hunts"), (True, "Caught"), (False, "Still hunting")]
+LEADERBOARD_SIZE = 10
+LEADERBOARD_BOARDS = [("shinies", "Most shinies"), ("species", "Most species"),
+                      ("avg_attempts", "Fewest attempts per shiny"), ("game", "Shinies per game"),
+                      ("method", "Shinies per method")]
+HISTORY_SORTS = [("oldest", "Oldest first"), ("newest", "Newest first"),
+                 ("most_encounters", "Most encounters"), ("fewest_encounters", "Fewest encounters")]
+COUNTER_FLUSH_SECONDS = 2.0  # most encounter counts a crash can lose
+GUEST_SWEEP_SECONDS = 3600  # how often idle guest sessions are looked for
+SUGGESTION_COUNT = 4
+SESSION_LINES = 3  # recent sessions spelled out under the activity charts
 
 
 def init_db():
-    conn = sqlite3.connect("shinyquest.db")
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users 
-                 (id INTEGER PRIMARY KEY, username TEXT UNIQUE, email TEXT UNIQUE, password TEXT, bio TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS hunts 
-                 (id INTEGER PRIMARY KEY, user_id TEXT, pokemon TEXT, game TEXT, 
-                  method TEXT, counter INTEGER, success BOOLEAN)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS guest_hunts 
-                 (id INTEGER PRIMARY KEY, guest_id TEXT, pokemon TEXT, game TEXT, 
-                  method TEXT, counter INTEGER, success BOOLEAN)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS living_dex 
-                 (id INTEGER PRIMARY KEY, user_id TEXT, pokemon TEXT, game TEXT, UNIQUE(user_id, pokemon))''')
-    conn.commit()
-    conn.close()
-
-
-def update_living_dex(user_id):
-    conn = sqlite3.connect("shinyquest.db")
-    c = conn.cursor()
-    table = "guest_hunts" if user_id.startswith("guest_") else "hunts"
-    c.execute(f"SELECT DISTINCT pokemon, game FROM {table} WHERE user_id=? AND success=1", (user_id,))
-    successful_hunts = c.fetchall()
-    for pokemon, game in successful_hunts:
-        try:
-            c.execute("INSERT OR IGNORE INTO living_dex (user_id, pokemon, game) VALUES (?, ?, ?)",
-                      (user_id, pokemon, game))
-        except sqlite3.IntegrityError:
-            pass
-    conn.commit()
-    conn.close()
-
-
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    get_db().migrate()
+
+
+def run_db(fn, *args, on_done=None, on_error=None):
+    """Queue fn(*args) on the app's db worker; on_done(result) / on_error(exc) run on the Kivy main thread."""
+    return run_on(App.get_running_app().db_worker, fn, *args, on_done=on_done, on_error=on_error)
+
+
+def run_on(worker, fn, *args, on_done=None, on_error=None):
+    future = worker.submit(fn, *args)
+
+    def deliver(dt):
+        error = future.exception()
+        if error is None:
+            if on_done:
+                on_done(future.result())
+        elif on_error:
+            on_error(error)
+        else:
+            Logger.error(f"ShinyQuest: {getattr(fn, '__name__', fn)} failed", exc_info=error)
+
+    future.add_done_callback(lambda f: Clock.schedule_once(deliver))
+    return future
+
+
+def simulate_plan(species, game, method, progress):
+    # runs on the simulation worker, which keeps numpy out of the cold start and long runs off the db worker
+    import simulator
+
+    return simulator.simulate(simulator.Plan(species, game, method), progress)
+
+
+def backup_db(progress=None):
+    # runs on the backup worker with a connection of its own, so the db worker keeps serving the screens
+    return backup.create_backup(get_db().path, progress=progress)
+
+
+class LazyScreenManager(ScreenManager):
+    """Builds each screen the first time it is shown instead of all of them at startup."""
+
+    def __init__(self, factories, **kwargs):
+        super().__init__(**kwargs)
+        self.factories = factories
+
+    def get_screen(self, name):
+        if not self.has_screen(name) and name in self.factories:
+            self.add_widget(self.factories[name](name=name))
+        return super().get_screen(name)
+
+    def mark_dirty(self, *names):
+        for name in names:
+            if self.has_screen(name):
+                self.get_screen(name).dirty = True
+
+
+class DataScreen(Screen):
+    """A screen backed by the database: it reloads when shown, and only if marked dirty since."""
+    dirty = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.current_user = App.get_running_app().current_user or "Unknown"
+
+    def on_pre_enter(self, *args):
+        if self.dirty:
+            self.dirty = False
+            self.refresh()
+
+    def refresh(self):
+        pass
+
+    def update_user(self):
+        self.current_user = App.get_running_app().current_user or "Unknown"
+        self.dirty = True
+
+    def project(self, title, species):
+        """Simulate how long `species` more shinies take with the user's usual game and method."""
+        run_db(get_db().user_stats, self.current_user,
+               on_done=lambda stats: self.show_projection(title, species, stats))
+
+    def show_projection(self, title, species, stats):
+        game = max(stats['games'], key=lambda row: row[1])[0] if stats['games'] else "Unknown"
+        method = stats['favorite_method']
+        label = Label(text=f"Simulating {game} / {method}...")
+        popup = Popup(title=title, content=label, size_hint=(0.8, 0.4))
+        popup.open()
+
+        def show(result, final=False):
+            lines = [f"{game} / {method}, ~{result['encounters_per_hour']} encounters per hour",
+                     f"{'Result' if final else 'Estimate'} after {result['trials']} runs:"]
+            for percentile in (50, 90, 99):
+                lines.append(f"{percentile}% chance within {result['encounters'][percentile]:,.0f} encounters "
+                             f"(~{result['hours'][percentile]:,.0f} h)")
+            label.text = "\n".join(lines)
+
+        # estimates arrive on the simulation worker as the runs converge
+        run_on(App.get_running_app().sim_worker, simulate_plan, species, game, method,
+               lambda estimate: Clock.schedule_once(lambda dt: show(estimate)),
+               on_done=lambda result: show(result, final=True),
+               on_error=lambda error: setattr(label, 'text', f"Simulation failed: {error}"))
 
 
 class MainMenuScreen(Screen):
@@ -109,7 +188,7 @@ class MainMenuScreen(Screen):
         self.manager.current = 'register'
 
     def guest_mode(self, instance):
-        App.get_running_app().current_user = f"guest_{uuid.uuid4().hex}"
+        App.get_running_app().set_user(core.new_guest_id())
         self.manager.current = 'hunt'
 
     def go_to_credits(self, instance):
@@ -138,19 +217,12 @@ class LoginScreen(Screen):
 
     def login(self, instance):
         username = self.username_input.text
-        password = hash_password(self.password_input.text)
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-        user = c.fetchone()
-        conn.close()
-        if user:
-            App.get_running_app().current_user = username
-            update_living_dex(username)  # Update living dex on login
-            self.manager.get_screen('hunt').update_user()
-            self.manager.get_screen('profile').update_user()
-            self.manager.get_screen('history').update_user()
-            self.manager.get_screen('living_dex').update_user()
+        run_db(core.login, get_db(), username, self.password_input.text,
+               on_done=lambda authenticated: self.on_login(username, authenticated))
+
+    def on_login(self, username, authenticated):
+        if authenticated:
+            App.get_running_app().set_user(username)
             self.manager.current = 'hunt'
         else:
             popup = Popup(title='Error', content=Label(text='Invalid credentials'), size_hint=(0.8, 0.3))
@@ -185,25 +257,20 @@ class RegisterScreen(Screen):
     def register(self, instance):
         username = self.username_input.text
         email = self.email_input.text
-        password = hash_password(self.password_input.text)
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        try:
-            c.execute("INSERT INTO users (username, email, password, bio) VALUES (?, ?, ?, ?)",
-                      (username, email, password, ""))
-            conn.commit()
-            App.get_running_app().current_user = username
-            update_living_dex(username)  # Update living dex on register
-            self.manager.get_screen('hunt').update_user()
-            self.manager.get_screen('profile').update_user()
-            self.manager.get_screen('history').update_user()
-            self.manager.get_screen('living_dex').update_user()
-            self.manager.current = 'hunt'
-        except sqlite3.IntegrityError:
-            popup = Popup(title='Error', content=Label(text='Username or email already exists'), size_hint=(0.8, 0.3))
-            popup.open()
-        finally:
-            conn.close()
+        run_db(core.register, get_db(), username, email, self.password_input.text,
+               on_done=lambda result: self.on_registered(username), on_error=self.on_register_failed)
+
+    def on_registered(self, username):
+        App.get_running_app().set_user(username)
+        self.manager.current = 'hunt'
+
+    def on_register_failed(self, error):
+        if isinstance(error, sqlite3.IntegrityError):
+            message = 'Username or email already exists'
+        else:
+            message = f'Registration failed: {error}'
+        popup = Popup(title='Error', content=Label(text=message), size_hint=(0.8, 0.3))
+        popup.open()
 
     def import_guest_hunts_prompt(self, instance):
         filechooser.open_file(on_selection=self.import_guest_hunts)
@@ -212,46 +279,96 @@ class RegisterScreen(Screen):
         if not selection:
             return
         filepath = selection[0]
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        try:
-            with open(filepath, 'r') as f:
-                guest_hunts = json.load(f)
-                username = App.get_running_app().current_user
-                if username.startswith("guest_"):
-                    popup = Popup(title='Error', content=Label(text='Register first to import hunts'),
-                                  size_hint=(0.8, 0.3))
-                    popup.open()
-                    return
-                for hunt in guest_hunts:
-                    c.execute(
-                        "INSERT INTO hunts (user_id, pokemon, game, method, counter, success) VALUES (?, ?, ?, ?, ?, ?)",
-                        (username, hunt['pokemon'], hunt['game'], hunt['method'], hunt['counter'], hunt['success']))
-                conn.commit()
-                popup = Popup(title='Success', content=Label(text='Guest hunts imported!'), size_hint=(0.8, 0.3))
-                popup.open()
-        except Exception as e:
-            popup = Popup(title='Error', content=Label(text=f'Import failed: {str(e)}'), size_hint=(0.8, 0.3))
+        username = App.get_running_app().current_user
+        if not username or core.is_guest(username):  # nobody is logged in yet on this screen
+            popup = Popup(title='Error', content=Label(text='Register first to import hunts'),
+                          size_hint=(0.8, 0.3))
             popup.open()
-        finally:
-            conn.close()
+            return
+        self.import_label = Label(text='Importing...')
+        self.import_popup = Popup(title='Importing Hunts', content=self.import_label, size_hint=(0.8, 0.3),
+                                  auto_dismiss=False)
+        self.import_popup.open()
+        run_db(importer.import_file, get_db(), filepath, username, self.on_import_progress,
+               on_done=self.on_import_done, on_error=self.on_import_failed)
+
+    def on_import_progress(self, records, chars, total_chars):
+        # runs on the db worker thread
+        text = f"Read {records} hunts"
+        if total_chars:
+            text += f" ({min(100, 100 * chars / total_chars):.0f}%)"
+        Clock.schedule_once(lambda dt: setattr(self.import_label, 'text', text))
+
+    def on_import_done(self, result):
+        self.import_popup.dismiss()
+        self.manager.mark_dirty('profile', 'history', 'living_dex')
+        text = f"Imported {result['imported']} hunts!"
+        if result['rejected']:
+            text += f"\nSkipped {result['rejected']} invalid rows:\n"
+            text += "\n".join(f"Row {row}: {reason}" for row, reason in result['rejects'][:5])
+        popup = Popup(title='Success', content=Label(text=text), size_hint=(0.8, 0.5))
+        popup.open()
+
+    def on_import_failed(self, error):
+        self.import_popup.dismiss()
+        popup = Popup(title='Error', content=Label(text=f'Import failed: {str(error)}'), size_hint=(0.8, 0.3))
+        popup.open()
 
 
-class ProfileScreen(Screen):
+class BarChart(Widget):
+    """Bars for a list of numbers, drawn straight on the canvas and redrawn when they or the size change."""
+    values = ListProperty([])
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.current_user = App.get_running_app().current_user or "Unknown"
+        self.bind(pos=self.redraw, size=self.redraw, values=self.redraw)
+
+    def redraw(self, *args):
+        self.canvas.clear()
+        if not self.values:
+            return
+        top = max(self.values) or 1
+        step = self.width / len(self.values)
+        with self.canvas:
+            Color(0.3, 0.7, 1, 1)
+            for i, value in enumerate(self.values):
+                Rectangle(pos=(self.x + i * step + 1, self.y), size=(max(step - 2, 1), self.height * value / top))
+
+
+def activity_text(activity):
+    """Summary lines for core's activity dict: the encounter rate and the last few sessions."""
+    if not activity['sessions']:
+        return "No timed encounters yet"
+    lines = []
+    if activity['per_hour'] is not None:
+        lines.append(f"{activity['per_hour']:.0f} encounters/hour over the last {len(activity['sessions'])} sessions")
+    for session in activity['sessions'][:SESSION_LINES]:
+        line = (f"{time.strftime('%b %d %H:%M', time.localtime(session['started']))}: "
+                f"{session['encounters']} encounters in {session['minutes']:.0f} min")
+        if session['per_hour'] is not None:
+            line += f", {session['per_hour']:.0f}/h"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class ProfileScreen(DataScreen):
+    def refresh(self):
         self.refresh_profile()
 
+    @profiling.timed("screen.refresh_profile")
     def refresh_profile(self):
+        user = self.current_user
+        run_db(core.profile, get_db(), user, on_done=lambda profile: self.show_profile(user, profile))
+
+    @profiling.timed("screen.show_profile")
+    def show_profile(self, user, profile):
+        if user != self.current_user:
+            return  # the user changed while this was loading
+        user_info, stats, luck = profile
         layout = BoxLayout(orientation='vertical', padding=20, spacing=10)
         self.user_label = Label(text=f"Profile: {self.current_user}", font_size=20)
         layout.add_widget(self.user_label)
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        c.execute("SELECT username, email, bio FROM users WHERE username=?", (self.current_user,))
-        user_info = c.fetchone()
-        if user_info and not self.current_user.startswith("guest_"):
+        if user_info and not core.is_guest(self.current_user):
             username, email, bio = user_info
             layout.add_widget(Label(text=f"Username: {username}", font_size=16))
             layout.add_widget(Label(text=f"Email: {email}", font_size=16))
@@ -260,24 +377,41 @@ class ProfileScreen(Screen):
             save_bio_btn = Button(text="Save Bio")
             save_bio_btn.bind(on_press=self.save_bio)
             layout.add_widget(save_bio_btn)
-            c.execute(
-                "SELECT COUNT(*), SUM(counter), SUM(CASE WHEN success THEN 1 ELSE 0 END), method FROM hunts WHERE user_id=? GROUP BY method",
-                (self.current_user,))
-            hunt_data = c.fetchall()
-            total_hunts = sum(row[0] for row in hunt_data) or 0
-            total_attempts = sum(row[1] for row in hunt_data) or 0
-            successful_hunts = sum(row[2] for row in hunt_data) or 0
-            c.execute("SELECT COUNT(DISTINCT pokemon) FROM hunts WHERE user_id=? AND success=1", (self.current_user,))
-            unique_pokemon = c.fetchone()[0] or 0
-            favorite_method = max(hunt_data, key=lambda x: x[0], default=(0, 0, 0, "None"))[3]
-            avg_attempts = total_attempts / successful_hunts if successful_hunts > 0 else 0
-            layout.add_widget(Label(text=f"Total Hunts: {total_hunts}", font_size=16))
-            layout.add_widget(Label(text=f"Total Attempts: {total_attempts}", font_size=16))
-            layout.add_widget(Label(text=f"Successful Hunts: {successful_hunts}", font_size=16))
-            layout.add_widget(Label(text=f"Unique Pokémon Caught: {unique_pokemon}", font_size=16))
-            layout.add_widget(Label(text=f"Avg Attempts per Success: {avg_attempts:.2f}", font_size=16))
-            layout.add_widget(Label(text=f"Favorite Method: {favorite_method}", font_size=16))
-        conn.close()
+        if user_info or core.is_guest(self.current_user):
+            layout.add_widget(Label(text=f"Total Hunts: {stats['hunts']}", font_size=16))
+            layout.add_widget(Label(text=f"Total Attempts: {stats['attempts']}", font_size=16))
+            layout.add_widget(Label(text=f"Successful Hunts: {stats['successes']}", font_size=16))
+            layout.add_widget(Label(text=f"Unique Pokémon Caught: {stats['unique_species']}", font_size=16))
+            layout.add_widget(Label(text=f"Avg Attempts per Success: {stats['avg_attempts']:.2f}", font_size=16))
+            layout.add_widget(Label(text=f"Median Attempts per Success: {stats['median_attempts']}", font_size=16))
+            layout.add_widget(Label(text=f"Longest Successful Hunt: {stats['longest_hunt']}", font_size=16))
+            layout.add_widget(Label(text=f"Favorite Method: {stats['favorite_method']}", font_size=16))
+            if luck['luck'] is not None:
+                layout.add_widget(Label(text=f"Luck: shinies found at {luck['luck']:.0%} of the odds on average "
+                                             f"(50% is typical)", font_size=16))
+            if luck['active_hunts']:
+                layout.add_widget(Label(text=f"Active Hunts: {luck['active_hunts']}, "
+                                             f"{luck['active_found_by_now']:.0%} of the odds used on average",
+                                        font_size=16))
+            for game, hunts, attempts, successes in stats['games']:
+                layout.add_widget(Label(text=f"{game}: {hunts} hunts, {attempts} attempts, {successes} shinies",
+                                        font_size=14))
+            # encounter rate from the session and hourly rollups; the event log itself is never read here
+            layout.add_widget(Label(text=activity_text(stats['activity']), font_size=14))
+            if stats['activity']['hours']:
+                layout.add_widget(Label(text=f"Encounters per hour, last {len(stats['activity']['hours'])} hours "
+                                             f"of activity", font_size=12))
+                layout.add_widget(BarChart(values=stats['activity']['hours']))
+        if user_info and not core.is_guest(self.current_user):
+            # a backup holds every account on the device, and none of the session-only guest hunts
+            backup_box = BoxLayout(orientation='horizontal', spacing=10)
+            backup_btn = Button(text="Back Up Now")
+            backup_btn.bind(on_press=self.backup_now)
+            backup_box.add_widget(backup_btn)
+            restore_btn = Button(text="Restore Backup")
+            restore_btn.bind(on_press=self.restore_prompt)
+            backup_box.add_widget(restore_btn)
+            layout.add_widget(backup_box)
         back_btn = Button(text="Back")
         back_btn.bind(on_press=self.go_back)
         layout.add_widget(back_btn)
@@ -286,57 +420,154 @@ class ProfileScreen(Screen):
 
     def save_bio(self, instance):
         new_bio = self.bio_input.text
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        c.execute("UPDATE users SET bio=? WHERE username=?", (new_bio, self.current_user))
-        conn.commit()
-        conn.close()
+        run_db(get_db().update_bio, self.current_user, new_bio, on_done=self.on_bio_saved)
+
+    def on_bio_saved(self, result):
         popup = Popup(title='Success', content=Label(text='Bio updated!'), size_hint=(0.8, 0.3))
         popup.open()
 
+    def backup_now(self, instance):
+        self.backup_label = Label(text="Backing up...")
+        self.backup_popup = Popup(title='Backup', content=self.backup_label, size_hint=(0.8, 0.3), auto_dismiss=False)
+        self.backup_popup.open()
+        app = App.get_running_app()
+        # flush first so the encounters still in the counter buffer are in the copy
+        run_db(app.counters.flush,
+               on_done=lambda result: run_on(app.backup_worker, backup_db, self.on_backup_progress,
+                                             on_done=self.on_backup_done, on_error=self.on_backup_failed),
+               on_error=self.on_backup_failed)
+
+    def on_backup_progress(self, copied, total):
+        # runs on the backup worker thread
+        text = f"Backing up... {100 * copied / total:.0f}%" if total else "Backing up..."
+        Clock.schedule_once(lambda dt: setattr(self.backup_label, 'text', text))
+
+    def on_backup_done(self, result):
+        self.backup_popup.dismiss()
+        popup = Popup(title='Success', content=Label(text=f"Backed up {result['bytes'] / 1e6:.1f} MB to\n"
+                                                          f"{result['path']}"), size_hint=(0.8, 0.3))
+        popup.open()
+
+    def on_backup_failed(self, error):
+        self.backup_popup.dismiss()
+        popup = Popup(title='Error', content=Label(text=f'Backup failed: {error}'), size_hint=(0.8, 0.3))
+        popup.open()
+
+    def restore_prompt(self, instance):
+        filechooser.open_file(path=backup.backup_dir(get_db().path), on_selection=self.confirm_restore,
+                              filters=[["Backups", "*.db", "*.db.gz"]])
+
+    def confirm_restore(self, selection):
+        if not selection:
+            return
+        path = selection[0]
+        confirm_layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
+        confirm_layout.add_widget(Label(text=f"Replace all data with\n{os.path.basename(path)}?"))
+        btn_box = BoxLayout(orientation='horizontal', spacing=10)
+        yes_btn = Button(text="Yes")
+        btn_box.add_widget(yes_btn)
+        no_btn = Button(text="No")
+        btn_box.add_widget(no_btn)
+        confirm_layout.add_widget(btn_box)
+        popup = Popup(title="Confirm Restore", content=confirm_layout, size_hint=(0.8, 0.3))
+
+        def restore(instance):
+            popup.dismiss()
+            self.restore_backup(path)
+        yes_btn.bind(on_press=restore)
+        no_btn.bind(on_press=popup.dismiss)
+        popup.open()
+
+    def restore_backup(self, path):
+        self.backup_popup = Popup(title='Restore', content=Label(text="Checking and restoring..."),
+                                  size_hint=(0.8, 0.3), auto_dismiss=False)
+        self.backup_popup.open()
+        # the buffer holds hunt ids of the db being replaced, so it is emptied into it first
+        run_db(App.get_running_app().counters.flush)
+        run_db(backup.restore_backup, get_db(), path, on_done=self.on_restored, on_error=self.on_restore_failed)
+
+    def on_restored(self, version):
+        self.backup_popup.dismiss()
+        app = App.get_running_app()
+        app.set_user(app.current_user)  # every data screen reloads, the hunt screen drops its active hunt
+        self.manager.mark_dirty('leaderboard')
+        popup = Popup(title='Success', content=Label(text="Backup restored!"), size_hint=(0.8, 0.3))
+        popup.open()
+
+    def on_restore_failed(self, error):
+        self.backup_popup.dismiss()
+        popup = Popup(title='Error', content=Label(text=f'Restore failed: {error}'), size_hint=(0.8, 0.3))
+        popup.open()
+
     def go_back(self, instance):
         self.manager.current = 'hunt'  # Changed from 'main' to 'hunt'
 
-    def update_user(self):
-        self.current_user = App.get_running_app().current_user or "Unknown"
-        self.refresh_profile()
-
 
-class HuntScreen(Screen):
+class HuntScreen(DataScreen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.current_user = App.get_running_app().current_user or "Unknown"
+        self.active_hunt_id = None
+        self.active_pokemon = None
+        self.encounters = 0
         self.refresh_layout()
+        self.dirty = False
 
+    def refresh(self):
+        self.refresh_layout()
+
+    @profiling.timed("screen.refresh_layout")
     def refresh_layout(self):
         layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
         self.user_label = Label(text=f"New Shiny Hunt (User: {self.current_user})")
         layout.add_widget(self.user_label)
-        if self.current_user.startswith("guest_"):
+        if core.is_guest(self.current_user):
             warning = Label(text="Guest Mode: Hunts are session-only. Export to save them!", color=(1, 0, 0, 1),
                             font_size=16)
             layout.add_widget(warning)
         self.pokemon_input = TextInput(hint_text="Pokémon (e.g., Pikachu)")
+        self.pokemon_input.bind(text=self.on_pokemon_text)
         layout.add_widget(self.pokemon_input)
+        # a fixed row of buttons relabelled on every keystroke
+        self.suggestion_box = BoxLayout(orientation='horizontal', spacing=5)
+        self.suggestion_btns = []
+        for _ in range(SUGGESTION_COUNT):
+            suggestion_btn = Button(text="", opacity=0, disabled=True)
+            suggestion_btn.bind(on_press=self.pick_suggestion)
+            self.suggestion_box.add_widget(suggestion_btn)
+            self.suggestion_btns.append(suggestion_btn)
+        layout.add_widget(self.suggestion_box)
+        counter_box = BoxLayout(orientation='horizontal', spacing=10)
+        self.counter_label = Label(text=f"Encounters: {self.encounters}")
+        counter_box.add_widget(self.counter_label)
+        encounter_btn = Button(text="+1 Encounter")
+        encounter_btn.bind(on_press=self.add_encounter)
+        counter_box.add_widget(encounter_btn)
+        layout.add_widget(counter_box)
         save_btn = Button(text="Save Hunt")
         save_btn.bind(on_press=self.save_hunt)
         layout.add_widget(save_btn)
         success_btn = Button(text="Mark as Successful")
         success_btn.bind(on_press=self.mark_successful)
         layout.add_widget(success_btn)
+        project_btn = Button(text="Project Hunt")
+        project_btn.bind(on_press=lambda x: self.project("Hunt Projection", 1))
+        layout.add_widget(project_btn)
         history_btn = Button(text="View Hunt History")
         history_btn.bind(on_press=self.go_to_history)
         layout.add_widget(history_btn)
         dex_btn = Button(text="View Living Dex")
         dex_btn.bind(on_press=self.go_to_living_dex)
         layout.add_widget(dex_btn)
-        if self.current_user.startswith("guest_"):
+        if core.is_guest(self.current_user):
             export_btn = Button(text="Export Hunts")
             export_btn.bind(on_press=self.export_hunts_prompt)
             layout.add_widget(export_btn)
         profile_btn = Button(text="View Profile")
         profile_btn.bind(on_press=self.go_to_profile)
         layout.add_widget(profile_btn)
+        leaderboard_btn = Button(text="Leaderboards")
+        leaderboard_btn.bind(on_press=self.go_to_leaderboard)
+        layout.add_widget(leaderboard_btn)
         back_btn = Button(text="Back")
         back_btn.bind(on_press=self.go_back)
         layout.add_widget(back_btn)
@@ -344,21 +575,67 @@ class HuntScreen(Screen):
         self.add_widget(layout)
 
     def update_user(self):
-        self.current_user = App.get_running_app().current_user or "Unknown"
-        self.refresh_layout()
+        super().update_user()
+        self.set_active_hunt(None, None, 0)
+
+    def on_pokemon_text(self, instance, text):
+        suggestions = species_index().suggest(text, SUGGESTION_COUNT)
+        if suggestions == [text]:
+            suggestions = []  # already picked
+        for i, suggestion_btn in enumerate(self.suggestion_btns):
+            suggestion_btn.text = suggestions[i] if i < len(suggestions) else ""
+            suggestion_btn.opacity = 1 if i < len(suggestions) else 0
+            suggestion_btn.disabled = i >= len(suggestions)
+
+    def pick_suggestion(self, instance):
+        self.pokemon_input.text = instance.text
+
+    def set_active_hunt(self, hunt_id, pokemon, encounters):
+        self.active_hunt_id = hunt_id
+        self.active_pokemon = pokemon
+        self.encounters = encounters
+        self.counter_label.text = f"Encounters: {encounters}"
+
+    def add_encounter(self, instance):
+        pokemon = self.pokemon_input.text
+        if self.active_pokemon and name_key(pokemon) == name_key(self.active_pokemon):
+            self.count_encounter()
+        elif pokemon:
+            run_db(get_db().open_hunt, self.current_user, pokemon,
+                   on_done=lambda hunt: self.on_open_hunt(pokemon, hunt))
+        else:
+            self.on_open_hunt(pokemon, None)
+
+    def on_open_hunt(self, pokemon, hunt):
+        if hunt is None:
+            popup = Popup(title='Error', content=Label(text='Save a hunt first!'), size_hint=(0.8, 0.3))
+            popup.open()
+            return
+        hunt_id, counter = hunt
+        if hunt_id != self.active_hunt_id:
+            counters = App.get_running_app().counters
+            self.set_active_hunt(hunt_id, pokemon, counter + counters.pending_for(self.current_user, hunt_id))
+        self.count_encounter()
+
+    def count_encounter(self):
+        # Buffered in memory; the app flushes it to the db in batches.
+        App.get_running_app().counters.increment(self.current_user, self.active_hunt_id)
+        self.encounters += 1
+        self.counter_label.text = f"Encounters: {self.encounters}"
+        self.manager.mark_dirty('profile', 'history')
 
     def save_hunt(self, instance):
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        if self.current_user.startswith("guest_"):
-            c.execute(
-                "INSERT INTO guest_hunts (guest_id, pokemon, game, method, counter, success) VALUES (?, ?, ?, ?, ?, ?)",
-                (self.current_user, self.pokemon_input.text, "Unknown", "Unknown", 0, False))
-        else:
-            c.execute("INSERT INTO hunts (user_id, pokemon, game, method, counter, success) VALUES (?, ?, ?, ?, ?, ?)",
-                      (self.current_user, self.pokemon_input.text, "Unknown", "Unknown", 0, False))
-        conn.commit()
-        conn.close()
+        pokemon = self.pokemon_input.text
+        if not pokemon.strip():
+            popup = Popup(title='Error', content=Label(text='Enter a Pokémon first!'), size_hint=(0.8, 0.3))
+            popup.open()
+            return
+        run_db(core.start_hunt, get_db(), self.current_user, pokemon,
+               on_done=lambda hunt_id: self.on_hunt_saved(hunt_id, pokemon))
+
+    def on_hunt_saved(self, hunt_id, pokemon):
+        self.set_active_hunt(hunt_id, pokemon, 0)
+        self.manager.mark_dirty('profile', 'history')
         popup = Popup(title='Success', content=Label(text='Hunt saved!'), size_hint=(0.8, 0.3))
         popup.open()
 
@@ -368,24 +645,45 @@ class HuntScreen(Screen):
             popup = Popup(title='Error', content=Label(text='Enter a Pokémon first!'), size_hint=(0.8, 0.3))
             popup.open()
             return
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        if self.current_user.startswith("guest_"):
-            c.execute(
-                "UPDATE guest_hunts SET success=1, counter=counter+1 WHERE guest_id=? AND pokemon=? AND success=0",
-                (self.current_user, pokemon))
-        else:
-            c.execute("UPDATE hunts SET success=1, counter=counter+1 WHERE user_id=? AND pokemon=? AND success=0",
-                      (self.current_user, pokemon))
-        conn.commit()
-        update_living_dex(self.current_user)
-        conn.close()
+        run_db(core.mark_successful, get_db(), self.current_user, pokemon, App.get_running_app().counters,
+               on_done=self.on_marked_successful)
+        self.set_active_hunt(None, None, 0)
+
+    def on_marked_successful(self, result):
+        self.manager.mark_dirty('profile', 'history', 'living_dex')
         popup = Popup(title='Success', content=Label(text='Hunt marked as successful!'), size_hint=(0.8, 0.3))
         popup.open()
 
+    def export_hunts_prompt(self, instance):
+        filechooser.save_file(on_selection=self.export_hunts,
+                              filters=[["Hunts", "*.json", "*.ndjson", "*.csv", "*.gz"]])
+
+    def export_hunts(self, selection):
+        if not selection:
+            return
+        filepath = selection[0]
+        if not exporter.format_for(filepath):
+            filepath += ".json"
+        # flush first so encounters still in the counter buffer make it into the file
+        run_db(App.get_running_app().counters.flush)
+        run_db(exporter.export_hunts, get_db(), self.current_user, filepath,
+               on_done=lambda rows: self.on_hunts_exported(filepath, rows), on_error=self.on_export_failed)
+
+    def on_hunts_exported(self, filepath, rows):
+        popup = Popup(title='Success', content=Label(text=f"Exported {rows} hunts to\n{filepath}"),
+                      size_hint=(0.8, 0.3))
+        popup.open()
+
+    def on_export_failed(self, error):
+        popup = Popup(title='Error', content=Label(text=f'Export failed: {str(error)}'), size_hint=(0.8, 0.3))
+        popup.open()
+
     def go_to_history(self, instance):
         self.manager.current = 'history'
 
+    def go_to_leaderboard(self, instance):
+        self.manager.current = 'leaderboard'
+
     def go_to_profile(self, instance):
         self.manager.current = 'profile'
 
@@ -396,65 +694,340 @@ class HuntScreen(Screen):
         self.manager.current = 'hunt'
 
 
-class HuntHistoryScreen(Screen):
+class HuntRow(BoxLayout):
+    # One recycled row of the history list; RecycleView sets these from the row's data dict.
+    screen = ObjectProperty(None, allownone=True)
+    hunt_id = NumericProperty(0)
+    pokemon = StringProperty("")
+    counter = NumericProperty(0)
+    success = BooleanProperty(False)
+    selected = BooleanProperty(False)
+    text = StringProperty("")
+
+    def __init__(self, **kwargs):
+        super().__init__(orientation='horizontal', size_hint_y=None, height=40, **kwargs)
+        self.check = CheckBox(active=self.selected, size_hint_x=0.1)
+        self.check.bind(on_release=lambda check: self.screen.set_selected(self.hunt_id, check.active))
+        self.add_widget(self.check)
+        self.label = Label(text=self.text)
+        self.add_widget(self.label)
+        rate_btn = Button(text="Rate", size_hint_x=0.15)
+        rate_btn.bind(on_press=lambda instance: self.screen.show_activity(self.hunt_id, self.pokemon))
+        self.add_widget(rate_btn)
+        self.share_btn = Button(text="Share", size_hint_x=0.2)
+        self.share_btn.bind(on_press=lambda instance: self.screen.share_hunt(self.pokemon, self.counter))
+        self.add_widget(self.share_btn)
+        delete_btn = Button(text="Delete", size_hint_x=0.2)
+        delete_btn.bind(on_press=lambda instance: self.screen.delete_hunt(self.hunt_id))
+        self.add_widget(delete_btn)
+        self.bind(text=self.label.setter('text'), success=self.on_success_changed,
+                  selected=self.check.setter('active'))
+        self.on_success_changed(self, self.success)
+
+    def on_success_changed(self, instance, success):
+        self.share_btn.disabled = not success
+        self.share_btn.opacity = 1 if success else 0
+
+
+class HuntHistoryScreen(DataScreen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.current_user = App.get_running_app().current_user or "Unknown"
+        self.rv = None
+        self.search_event = None
+        self.rows = {}  # hunt_id -> its dict in rv.data
+        self.selected = set()
+        self.reset_filters()
+
+    def reset_filters(self):
+        self.filters = {}
+        self.status_index = 0
+        self.sort_index = 0
+
+    def update_user(self):
+        super().update_user()
+        self.reset_filters()
+
+    def refresh(self):
         self.refresh_history()
 
+    @profiling.timed("screen.refresh_history")
     def refresh_history(self):
-        layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
-        self.user_label = Label(text=f"Hunt History (User: {self.current_user})", font_size=20)
+        # the layout is built once; a refresh puts the filters back into it and reloads the list
+        if self.rv is None:
+            self.build_layout()
+        self.user_label.text = f"Hunt History (User: {self.current_user})"
+        if core.is_guest(self.current_user) and self.warning.parent is None:
+            self.layout.add_widget(self.warning, index=len(self.layout.children) - 1)
+        elif not core.is_guest(self.current_user) and self.warning.parent is not None:
+            self.layout.remove_widget(self.warning)
+        filters = self.filters
+        self.search_input.text = filters.get('text') or ""
+        self.game_spinner.text = filters.get('game') or ANY_GAME
+        self.method_spinner.text = filters.get('method') or ANY_METHOD
+        self.min_input.text = "" if filters.get('min_counter') is None else str(filters['min_counter'])
+        self.max_input.text = "" if filters.get('max_counter') is None else str(filters['max_counter'])
+        self.status_btn.text = HISTORY_STATUSES[self.status_index][1]
+        self.sort_btn.text = HISTORY_SORTS[self.sort_index][1]
+        self.restart_history()
+
+    def build_layout(self):
+        self.layout = layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
+        self.user_label = Label(font_size=20, size_hint_y=0.08)
         layout.add_widget(self.user_label)
-        if self.current_user.startswith("guest_"):
-            warning = Label(text="Guest Mode: Hunts are session-only. Export to save them!", color=(1, 0, 0, 1),
-                            font_size=16)
-            layout.add_widget(warning)
-        scroll = ScrollView()
-        grid = GridLayout(cols=1, spacing=10, size_hint_y=None)
-        grid.bind(minimum_height=grid.setter('height'))
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        if self.current_user.startswith("guest_"):
-            c.execute("SELECT id, pokemon, game, method, counter, success FROM guest_hunts WHERE guest_id=?",
-                      (self.current_user,))
-        else:
-            c.execute("SELECT id, pokemon, game, method, counter, success FROM hunts WHERE user_id=?",
-                      (self.current_user,))
-        hunts = c.fetchall()
-        conn.close()
-        for hunt in hunts:
-            hunt_id, pokemon, game, method, counter, success = hunt
-            hunt_text = f"{pokemon} | Game: {game} | Method: {method} | Attempts: {counter} | Success: {'Yes' if success else 'No'}"
-            hunt_box = BoxLayout(orientation='horizontal', size_hint_y=None, height=40)
-            hunt_box.add_widget(Label(text=hunt_text))
-            if success:
-                share_btn = Button(text="Share", size_hint_x=0.2)
-                share_btn.bind(on_press=lambda instance, p=pokemon, c=counter: self.share_hunt(p, c))
-                hunt_box.add_widget(share_btn)
-            delete_btn = Button(text="Delete", size_hint_x=0.2)
-            delete_btn.bind(on_press=lambda instance, hid=hunt_id: self.delete_hunt(hid))
-            hunt_box.add_widget(delete_btn)
-            grid.add_widget(hunt_box)
-        scroll.add_widget(grid)
-        layout.add_widget(scroll)
-        back_btn = Button(text="Back", size_hint=(1, 0.1))
+        self.warning = Label(text="Guest Mode: Hunts are session-only. Export to save them!", color=(1, 0, 0, 1),
+                             font_size=16, size_hint_y=0.06)
+        # Search and filters; every change reloads the list from its first page, filtered and sorted in SQL.
+        self.search_input = TextInput(hint_text="Search species, game or method", multiline=False, size_hint_y=0.08)
+        layout.add_widget(self.search_input)
+        filter_box = BoxLayout(orientation='horizontal', spacing=5, size_hint_y=0.08)
+        self.game_spinner = Spinner(text=ANY_GAME, values=[ANY_GAME] + [name for name, _ in GAMES])
+        self.method_spinner = Spinner(text=ANY_METHOD, values=[ANY_METHOD] + METHODS)
+        filter_box.add_widget(self.game_spinner)
+        filter_box.add_widget(self.method_spinner)
+        self.status_btn = Button()
+        self.status_btn.bind(on_press=self.next_status)
+        filter_box.add_widget(self.status_btn)
+        layout.add_widget(filter_box)
+        range_box = BoxLayout(orientation='horizontal', spacing=5, size_hint_y=0.08)
+        self.min_input = TextInput(hint_text="Min encounters", input_filter='int', multiline=False)
+        range_box.add_widget(self.min_input)
+        self.max_input = TextInput(hint_text="Max encounters", input_filter='int', multiline=False)
+        range_box.add_widget(self.max_input)
+        self.sort_btn = Button()
+        self.sort_btn.bind(on_press=self.next_sort)
+        range_box.add_widget(self.sort_btn)
+        layout.add_widget(range_box)
+        # Bulk actions on the ticked hunts; each is one transaction and one reload of the list.
+        selection_box = BoxLayout(orientation='horizontal', spacing=5, size_hint_y=0.08)
+        select_all_btn = Button(text="Select all")
+        select_all_btn.bind(on_press=self.toggle_select_all)
+        selection_box.add_widget(select_all_btn)
+        self.selected_label = Label()
+        selection_box.add_widget(self.selected_label)
+        self.bulk_buttons = []
+        for text, callback in (("Delete", self.confirm_delete_selected), ("Mark caught", self.mark_selected_caught),
+                               ("Edit", self.edit_selected_prompt)):
+            btn = Button(text=text)
+            btn.bind(on_press=callback)
+            selection_box.add_widget(btn)
+            self.bulk_buttons.append(btn)
+        layout.add_widget(selection_box)
+        for widget in (self.search_input, self.game_spinner, self.method_spinner, self.min_input, self.max_input):
+            widget.bind(text=self.schedule_search)
+        # Only the visible rows get widgets; pages are fetched from the db as the list scrolls.
+        self.rv = RecycleView(viewclass=HuntRow)
+        rows = RecycleBoxLayout(orientation='vertical', spacing=10, size_hint_y=None,
+                                default_size=(None, 40), default_size_hint=(1, None))
+        rows.bind(minimum_height=rows.setter('height'))
+        self.rv.add_widget(rows)
+        self.rv.bind(scroll_y=self.on_history_scroll)
+        layout.add_widget(self.rv)
+        back_btn = Button(text="Back", size_hint=(1, 0.08))
         back_btn.bind(on_press=self.go_back)
         layout.add_widget(back_btn)
-        self.clear_widgets()
         self.add_widget(layout)
 
-    def delete_hunt(self, hunt_id):
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        if self.current_user.startswith("guest_"):
-            c.execute("DELETE FROM guest_hunts WHERE id=?", (hunt_id,))
+    def search_filters(self):
+        return {
+            'text': self.search_input.text.strip() or None,
+            'game': self.game_spinner.text if self.game_spinner.text != ANY_GAME else None,
+            'method': self.method_spinner.text if self.method_spinner.text != ANY_METHOD else None,
+            'success': HISTORY_STATUSES[self.status_index][0],
+            'min_counter': int(self.min_input.text) if self.min_input.text else None,
+            'max_counter': int(self.max_input.text) if self.max_input.text else None,
+            'sort': HISTORY_SORTS[self.sort_index][0],
+        }
+
+    def schedule_search(self, *args):
+        if self.search_event is not None:
+            self.search_event.cancel()
+        self.search_event = Clock.schedule_once(self.search_if_changed, SEARCH_DELAY_SECONDS)
+
+    def search_if_changed(self, dt):
+        self.search_event = None
+        if self.search_filters() != self.filters:
+            self.restart_history()
+
+    def next_status(self, instance):
+        self.status_index = (self.status_index + 1) % len(HISTORY_STATUSES)
+        self.status_btn.text = HISTORY_STATUSES[self.status_index][1]
+        self.restart_history()
+
+    def next_sort(self, instance):
+        self.sort_index = (self.sort_index + 1) % len(HISTORY_SORTS)
+        self.sort_btn.text = HISTORY_SORTS[self.sort_index][1]
+        self.restart_history()
+
+    def restart_history(self):
+        self.filters = self.search_filters()
+        self.rows = {}
+        self.selected.clear()
+        self.update_selection()
+        self.rv.data = []
+        self.rv.scroll_y = 1
+        self.after = None
+        self.history_exhausted = False
+        self.page_request = None
+        self.load_next_page()
+
+    def load_next_page(self):
+        if self.history_exhausted or self.page_request is not None:
+            return
+        # a page for an older search or user is dropped when it arrives
+        request = self.page_request = object()
+        run_db(core.search_history, get_db(), self.current_user, self.filters, self.after, HISTORY_PAGE_SIZE,
+               on_done=lambda page: self.on_page_loaded(request, *page))
+
+    @profiling.timed("screen.on_page_loaded")
+    def on_page_loaded(self, request, hunts, page_odds):
+        if request is not self.page_request:
+            return
+        self.page_request = None
+        self.history_exhausted = len(hunts) < HISTORY_PAGE_SIZE
+        if hunts:
+            self.after = (hunts[-1][4], hunts[-1][0])
+            rows = [self.hunt_row(hunt, page_odds['odds'][i], page_odds['found_by_now'][i],
+                                  page_odds['expected_remaining'][i]) for i, hunt in enumerate(hunts)]
+            self.rows.update((row['hunt_id'], row) for row in rows)
+            self.rv.data.extend(rows)
+
+    def hunt_row(self, hunt, encounter_odds, found_by_now, expected_remaining):
+        hunt_id, pokemon, game, method, counter, success = hunt
+        hunt_text = f"{pokemon} | Game: {game} | Method: {method} | Attempts: {counter} | Success: {'Yes' if success else 'No'}"
+        if success:
+            hunt_text += f" | Found at {found_by_now:.0%} of the odds"
+        elif encounter_odds > 0:
+            hunt_text += (f" | Odds: 1/{round(1 / encounter_odds)}, {found_by_now:.0%} by now, "
+                          f"~{expected_remaining:.0f} to go")
+        return {'screen': self, 'hunt_id': hunt_id, 'pokemon': pokemon, 'counter': counter,
+                'success': bool(success), 'selected': hunt_id in self.selected, 'text': hunt_text}
+
+    def on_history_scroll(self, rv, scroll_y):
+        if scroll_y <= 0.1:  # scroll_y is 0 at the bottom
+            self.load_next_page()
+
+    # Selection and bulk actions
+
+    def set_selected(self, hunt_id, selected):
+        if selected:
+            self.selected.add(hunt_id)
         else:
-            c.execute("DELETE FROM hunts WHERE id=?", (hunt_id,))
-        conn.commit()
-        conn.close()
-        self.refresh_history()
-        popup = Popup(title='Success', content=Label(text='Hunt deleted!'), size_hint=(0.8, 0.3))
+            self.selected.discard(hunt_id)
+        if hunt_id in self.rows:
+            self.rows[hunt_id]['selected'] = selected  # recycled rows read it back from the data
+        self.update_selection()
+
+    def toggle_select_all(self, instance):
+        # ticks every loaded row, up to the batch limit; with everything ticked it clears instead
+        select = len(self.selected) < min(len(self.rows), core.MAX_BATCH)
+        self.selected = set(list(self.rows)[:core.MAX_BATCH]) if select else set()
+        for hunt_id, row in self.rows.items():
+            row['selected'] = hunt_id in self.selected
+        self.rv.refresh_from_data()
+        self.update_selection()
+
+    def update_selection(self):
+        if self.rv is None:
+            return
+        self.selected_label.text = f"{len(self.selected)} selected"
+        for btn in self.bulk_buttons:
+            btn.disabled = not self.selected
+
+    def confirm_delete_selected(self, instance):
+        hunt_ids = sorted(self.selected)
+        confirm_layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
+        confirm_layout.add_widget(Label(text=f"Delete {len(hunt_ids)} hunts?"))
+        btn_box = BoxLayout(orientation='horizontal', spacing=10)
+        yes_btn = Button(text="Yes")
+        btn_box.add_widget(yes_btn)
+        no_btn = Button(text="No")
+        btn_box.add_widget(no_btn)
+        confirm_layout.add_widget(btn_box)
+        popup = Popup(title="Confirm Deletion", content=confirm_layout, size_hint=(0.8, 0.3))
+
+        def delete(instance):
+            popup.dismiss()
+            self.delete_hunts(hunt_ids)
+        yes_btn.bind(on_press=delete)
+        no_btn.bind(on_press=popup.dismiss)
+        popup.open()
+
+    def delete_hunt(self, hunt_id):
+        self.delete_hunts([hunt_id])
+
+    def delete_hunts(self, hunt_ids):
+        run_db(core.delete_hunts, get_db(), self.current_user, hunt_ids,
+               on_done=lambda deleted: self.on_hunts_deleted(set(hunt_ids), deleted), on_error=self.on_bulk_failed)
+
+    def on_hunts_deleted(self, hunt_ids, deleted):
+        # the loaded rows stay where they are and the keyset cursor stays valid, so the list is only filtered
+        self.rv.data = [row for row in self.rv.data if row['hunt_id'] not in hunt_ids]
+        for hunt_id in hunt_ids:
+            self.rows.pop(hunt_id, None)
+        self.selected -= hunt_ids
+        self.update_selection()
+        self.manager.mark_dirty('profile', 'living_dex')
+        text = 'Hunt deleted!' if deleted == 1 else f'{deleted} hunts deleted!'
+        popup = Popup(title='Success', content=Label(text=text), size_hint=(0.8, 0.3))
+        popup.open()
+
+    def mark_selected_caught(self, instance):
+        run_db(core.mark_hunts_successful, get_db(), self.current_user, sorted(self.selected),
+               App.get_running_app().counters,
+               on_done=lambda updated: self.on_bulk_done(f"{updated} hunts marked as caught!"),
+               on_error=self.on_bulk_failed)
+
+    def edit_selected_prompt(self, instance):
+        hunt_ids = sorted(self.selected)
+        edit_layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
+        edit_layout.add_widget(Label(text=f"Move {len(hunt_ids)} hunts to"))
+        game_spinner = Spinner(text=KEEP_GAME, values=[KEEP_GAME] + [name for name, _ in GAMES])
+        edit_layout.add_widget(game_spinner)
+        method_spinner = Spinner(text=KEEP_METHOD, values=[KEEP_METHOD] + METHODS)
+        edit_layout.add_widget(method_spinner)
+        apply_btn = Button(text="Apply")
+        edit_layout.add_widget(apply_btn)
+        popup = Popup(title="Edit Hunts", content=edit_layout, size_hint=(0.8, 0.5))
+
+        def apply(instance):
+            popup.dismiss()
+            game = game_spinner.text if game_spinner.text != KEEP_GAME else None
+            method = method_spinner.text if method_spinner.text != KEEP_METHOD else None
+            if game or method:
+                self.edit_hunts(hunt_ids, game, method)
+        apply_btn.bind(on_press=apply)
+        popup.open()
+
+    def edit_hunts(self, hunt_ids, game=None, method=None):
+        run_db(core.edit_hunts, get_db(), self.current_user, hunt_ids, game, method,
+               on_done=lambda updated: self.on_bulk_done(f"{updated} hunts updated!"), on_error=self.on_bulk_failed)
+
+    def on_bulk_done(self, message):
+        # the changed hunts may have moved in the sort order or out of the filter, so the list starts over once
+        self.manager.mark_dirty('profile', 'living_dex')
+        self.restart_history()
+        popup = Popup(title='Success', content=Label(text=message), size_hint=(0.8, 0.3))
+        popup.open()
+
+    def on_bulk_failed(self, error):
+        popup = Popup(title='Error', content=Label(text=str(error)), size_hint=(0.8, 0.3))
+        popup.open()
+
+    def show_activity(self, hunt_id, pokemon):
+        # flushed first so the chart includes the encounters still in the counter buffer
+        run_db(App.get_running_app().counters.flush)
+        run_db(core.hunt_activity, get_db(), self.current_user, hunt_id,
+               on_done=lambda activity: self.on_activity_loaded(pokemon, activity), on_error=self.on_bulk_failed)
+
+    @profiling.timed("screen.on_activity_loaded")
+    def on_activity_loaded(self, pokemon, activity):
+        layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
+        layout.add_widget(Label(text=activity_text(activity)))
+        if activity['hours']:
+            layout.add_widget(Label(text=f"Encounters per hour, last {len(activity['hours'])} hours of activity",
+                                    size_hint_y=0.15))
+            layout.add_widget(BarChart(values=activity['hours']))
+        popup = Popup(title=f"{pokemon} Encounter Rate", content=layout, size_hint=(0.9, 0.7))
         popup.open()
 
     def share_hunt(self, pokemon, counter):
@@ -465,21 +1038,57 @@ class HuntHistoryScreen(Screen):
     def go_back(self, instance):
         self.manager.current = 'hunt'
 
-    def update_user(self):  # Added to fix the AttributeError
-        self.current_user = App.get_running_app().current_user or "Unknown"
-        self.refresh_history()
 
+class DexCard(Button):
+    # Recycled Living Dex card; RecycleView sets these from the species' entry dict.
+    screen = ObjectProperty(None, allownone=True)
+    pokemon = StringProperty("")
+    game = StringProperty("")
+    caught = BooleanProperty(False)
+    selected = BooleanProperty(False)
 
-class LivingDexScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.current_user = App.get_running_app().current_user or "Unknown"
-        self.sort_by = "name"
-        self.refresh_dex()
+        card_layout = BoxLayout(orientation='vertical')
+        self.name_label = Label(font_size=16)
+        card_layout.add_widget(self.name_label)
+        self.game_label = Label(font_size=12)
+        card_layout.add_widget(self.game_label)
+        self.add_widget(card_layout)
+        self.bind(pos=card_layout.setter('pos'), size=card_layout.setter('size'),
+                  pokemon=self.update_card, game=self.update_card, caught=self.update_card,
+                  selected=self.update_card)
+        self.update_card()
+
+    def update_card(self, *args):
+        self.name_label.text = self.pokemon
+        self.game_label.text = f"Game: {self.game}" if self.caught else "Not Caught"
+        if self.selected:
+            self.background_color = (0, 0.5, 1, 1)
+        else:
+            self.background_color = (0, 1, 0, 1) if self.caught else (0.2, 0.2, 0.2, 1)
 
-    def refresh_dex(self):
+    def on_press(self):
+        if self.caught:
+            self.screen.card_pressed(self.pokemon)
+
+
+class LivingDexScreen(DataScreen):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sort_by = "name"
+        self.selecting = False
+        self.selected = set()
+        # One entry per species for the screen's lifetime; refreshes patch them in place.
+        self.entries = {pokemon: {'screen': self, 'pokemon': pokemon, 'game': "", 'caught': False, 'selected': False}
+                        for pokemon in GEN1_POKEMON}
+        self.name_order = sorted(GEN1_POKEMON)
+        self.build_layout()
+
+    def build_layout(self):
         layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
-        layout.add_widget(Label(text=f"Shiny Living Dex (User: {self.current_user})", font_size=20))
+        self.title_label = Label(text=f"Shiny Living Dex (User: {self.current_user})", font_size=20)
+        layout.add_widget(self.title_label)
 
         sort_box = BoxLayout(orientation='horizontal', size_hint_y=0.1)
         name_btn = Button(text="Sort by Name")
@@ -490,63 +1099,143 @@ class LivingDexScreen(Screen):
         sort_box.add_widget(game_btn)
         layout.add_widget(sort_box)
 
-        scroll = ScrollView()
-        self.grid = GridLayout(cols=3, spacing=10, size_hint_y=None)
+        # Select mode: tapping caught cards ticks them, and the ticked ones are removed in one transaction.
+        select_box = BoxLayout(orientation='horizontal', size_hint_y=0.1)
+        self.select_btn = Button(text="Select")
+        self.select_btn.bind(on_press=self.toggle_selecting)
+        select_box.add_widget(self.select_btn)
+        self.remove_btn = Button(text="Remove selected", disabled=True)
+        self.remove_btn.bind(on_press=self.confirm_remove_selected)
+        select_box.add_widget(self.remove_btn)
+        layout.add_widget(select_box)
+
+        self.rv = RecycleView(viewclass=DexCard)
+        self.grid = RecycleGridLayout(cols=3, spacing=10, size_hint_y=None,
+                                      default_size=(None, 100), default_size_hint=(1, None))
         self.grid.bind(minimum_height=self.grid.setter('height'))
-
-        update_living_dex(self.current_user)
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        table = "guest_hunts" if self.current_user.startswith("guest_") else "hunts"
-        c.execute(f"SELECT pokemon, game, method, counter FROM {table} WHERE user_id=? AND success=1",
-                  (self.current_user,))
-        caught_pokemon = {row[0]: {"game": row[1], "method": row[2], "counter": row[3]} for row in c.fetchall()}
-        conn.close()
-
-        pokemon_list = GEN1_POKEMON.copy()
-        if self.sort_by == "name":
-            pokemon_list.sort()
-        elif self.sort_by == "game":
-            pokemon_list = sorted(pokemon_list, key=lambda p: caught_pokemon.get(p, {"game": "ZZZ"})["game"])
-
-        for pokemon in pokemon_list:
-            card = Button(size_hint_y=None, height=100,
-                          background_color=(0.2, 0.2, 0.2, 1) if pokemon not in caught_pokemon else (0, 1, 0, 1))
-            card_layout = BoxLayout(orientation='vertical')
-            card_layout.add_widget(Label(text=pokemon, font_size=16))
-            if pokemon in caught_pokemon:
-                card_layout.add_widget(Label(text=f"Game: {caught_pokemon[pokemon]['game']}", font_size=12))
-                card.bind(on_press=lambda instance, p=pokemon: self.show_details(p))
-            else:
-                card_layout.add_widget(Label(text="Not Caught", font_size=12))
-            card.add_widget(card_layout)
-            self.grid.add_widget(card)
-
-        scroll.add_widget(self.grid)
-        layout.add_widget(scroll)
+        self.rv.add_widget(self.grid)
+        layout.add_widget(self.rv)
 
         share_btn = Button(text="Share Dex", size_hint=(1, 0.1))
         share_btn.bind(on_press=self.share_dex)
         layout.add_widget(share_btn)
 
+        project_btn = Button(text="Project Completion", size_hint=(1, 0.1))
+        project_btn.bind(on_press=self.project_completion)
+        layout.add_widget(project_btn)
+
         back_btn = Button(text="Back", size_hint=(1, 0.1))
         back_btn.bind(on_press=self.go_back)
         layout.add_widget(back_btn)
-        self.clear_widgets()
         self.add_widget(layout)
 
+    def refresh(self):
+        self.title_label.text = f"Shiny Living Dex (User: {self.current_user})"
+        self.set_selecting(False)
+        self.refresh_dex()
+
+    @profiling.timed("screen.refresh_dex")
+    def refresh_dex(self):
+        user = self.current_user
+        run_db(get_db().living_dex, user, on_done=lambda rows: self.on_dex_loaded(user, rows))
+
+    @profiling.timed("screen.on_dex_loaded")
+    def on_dex_loaded(self, user, rows):
+        if user != self.current_user:
+            return
+        caught = dict(rows)
+        changes = {}
+        for pokemon, entry in self.entries.items():
+            game = caught.get(pokemon, "")
+            if entry['caught'] != (pokemon in caught) or entry['game'] != game:
+                changes[pokemon] = (pokemon in caught, game)
+        self.apply_changes(changes)
+
+    def apply_changes(self, changes):
+        for pokemon, (caught, game) in changes.items():
+            self.entries[pokemon]['caught'] = caught
+            self.entries[pokemon]['game'] = game
+            if not caught and pokemon in self.selected:
+                self.selected.discard(pokemon)
+                self.entries[pokemon]['selected'] = False
+        self.update_remove_button()
+        if changes or not self.rv.data:
+            self.apply_sort()
+
+    def apply_sort(self):
+        if self.sort_by == "game":
+            order = sorted(GEN1_POKEMON, key=lambda p: self.entries[p]['game'] if self.entries[p]['caught'] else "ZZZ")
+        else:
+            order = self.name_order
+        self.rv.data = [self.entries[pokemon] for pokemon in order]
+
     def set_sort(self, sort_type):
         self.sort_by = sort_type
-        self.refresh_dex()
+        self.apply_sort()
+
+    def card_pressed(self, pokemon):
+        if not self.selecting:
+            self.show_details(pokemon)
+            return
+        selected = pokemon not in self.selected
+        if selected:
+            self.selected.add(pokemon)
+        else:
+            self.selected.discard(pokemon)
+        self.entries[pokemon]['selected'] = selected
+        self.rv.refresh_from_data()
+        self.update_remove_button()
+
+    def toggle_selecting(self, instance):
+        self.set_selecting(not self.selecting)
+
+    def set_selecting(self, selecting):
+        self.selecting = selecting
+        self.select_btn.text = "Done" if selecting else "Select"
+        if not selecting and self.selected:
+            for pokemon in self.selected:
+                self.entries[pokemon]['selected'] = False
+            self.selected.clear()
+            self.rv.refresh_from_data()
+        self.update_remove_button()
+
+    def update_remove_button(self):
+        self.remove_btn.text = f"Remove selected ({len(self.selected)})" if self.selected else "Remove selected"
+        self.remove_btn.disabled = not self.selected
+
+    def confirm_remove_selected(self, instance):
+        species = sorted(self.selected)
+        confirm_layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
+        confirm_layout.add_widget(Label(text=f"Remove {len(species)} Pokémon from your Living Dex?"))
+        btn_box = BoxLayout(orientation='horizontal', spacing=10)
+        yes_btn = Button(text="Yes")
+        yes_btn.bind(on_press=lambda x: self.remove_from_dex(species))
+        btn_box.add_widget(yes_btn)
+        no_btn = Button(text="No")
+        no_btn.bind(on_press=lambda x: self.dismiss_popup())
+        btn_box.add_widget(no_btn)
+        confirm_layout.add_widget(btn_box)
+        self.confirm_popup = Popup(title="Confirm Removal", content=confirm_layout, size_hint=(0.8, 0.3))
+        self.confirm_popup.open()
+
+    def remove_from_dex(self, species):
+        self.confirm_popup.dismiss()
+        run_db(core.remove_from_dex, get_db(), self.current_user, species,
+               on_done=lambda removed: self.on_removed_many_from_dex(species, removed))
+
+    def on_removed_many_from_dex(self, species, removed):
+        self.set_selecting(False)
+        self.apply_changes({pokemon: (False, "") for pokemon in species})
+        self.manager.mark_dirty('profile')
+        popup = Popup(title='Success', content=Label(text=f"{removed} Pokémon removed from Living Dex!"),
+                      size_hint=(0.8, 0.3))
+        popup.open()
 
     def show_details(self, pokemon):
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        table = "guest_hunts" if self.current_user.startswith("guest_") else "hunts"
-        c.execute(f"SELECT game, method, counter FROM {table} WHERE user_id=? AND pokemon=? AND success=1 LIMIT 1",
-                  (self.current_user, pokemon))
-        details = c.fetchone()
-        conn.close()
+        run_db(get_db().caught_details, self.current_user, pokemon,
+               on_done=lambda details: self.on_details_loaded(pokemon, details))
+
+    def on_details_loaded(self, pokemon, details):
         if details:
             game, method, counter = details
             details_text = f"Pokemon: {pokemon}\nGame: {game}\nMethod: {method}\nAttempts: {counter}"
@@ -573,25 +1262,30 @@ class LivingDexScreen(Screen):
         self.confirm_popup.open()
 
     def delete_from_dex(self, pokemon):
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        c.execute("DELETE FROM living_dex WHERE user_id=? AND pokemon=?", (self.current_user, pokemon))
-        conn.commit()
-        conn.close()
+        run_db(get_db().delete_from_dex, self.current_user, pokemon,
+               on_done=lambda result: self.on_removed_from_dex(pokemon))
         self.confirm_popup.dismiss()
-        self.refresh_dex()
+        self.apply_changes({pokemon: (False, "")})
+
+    def on_removed_from_dex(self, pokemon):
         popup = Popup(title='Success', content=Label(text=f"{pokemon} removed from Living Dex!"), size_hint=(0.8, 0.3))
         popup.open()
 
     def dismiss_popup(self):
         self.confirm_popup.dismiss()
 
+    def project_completion(self, instance):
+        missing = sum(not entry['caught'] for entry in self.entries.values())
+        if not missing:
+            popup = Popup(title='Info', content=Label(text='Your Living Dex is complete!'), size_hint=(0.8, 0.3))
+            popup.open()
+            return
+        self.project(f"Completing {missing} Pokémon", missing)
+
     def share_dex(self, instance):
-        conn = sqlite3.connect("shinyquest.db")
-        c = conn.cursor()
-        c.execute("SELECT pokemon, game FROM living_dex WHERE user_id=?", (self.current_user,))
-        dex_list = c.fetchall()
-        conn.close()
+        run_db(get_db().living_dex, self.current_user, on_done=self.show_share_dex)
+
+    def show_share_dex(self, dex_list):
         if not dex_list:
             popup = Popup(title='Info', content=Label(text='Your Living Dex is empty!'), size_hint=(0.8, 0.3))
             popup.open()
@@ -603,9 +1297,78 @@ class LivingDexScreen(Screen):
     def go_back(self, instance):
         self.manager.current = 'hunt'
 
-    def update_user(self):
-        self.current_user = App.get_running_app().current_user or "Unknown"
-        self.refresh_dex()
+
+class LeaderboardScreen(DataScreen):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        layout = BoxLayout(orientation='vertical', padding=20, spacing=10)
+        layout.add_widget(Label(text="Leaderboards", font_size=20))
+        picker = BoxLayout(orientation='horizontal', spacing=5)
+        self.board_spinner = Spinner(text=LEADERBOARD_BOARDS[0][1], values=[label for _, label in LEADERBOARD_BOARDS])
+        picker.add_widget(self.board_spinner)
+        self.key_spinner = Spinner(text="", values=[], opacity=0, disabled=True)
+        picker.add_widget(self.key_spinner)
+        layout.add_widget(picker)
+        self.board_spinner.bind(text=self.on_board_picked)
+        self.key_spinner.bind(text=lambda *args: self.refresh())
+        self.rank_labels = [Label(text="", font_size=16) for _ in range(LEADERBOARD_SIZE)]
+        for rank_label in self.rank_labels:
+            layout.add_widget(rank_label)
+        self.me_label = Label(text="", font_size=18)
+        layout.add_widget(self.me_label)
+        back_btn = Button(text="Back")
+        back_btn.bind(on_press=self.go_back)
+        layout.add_widget(back_btn)
+        self.add_widget(layout)
+
+    def on_leave(self, *args):
+        self.dirty = True  # other trainers' totals change too
+
+    def board(self):
+        return next(name for name, label in LEADERBOARD_BOARDS if label == self.board_spinner.text)
+
+    def on_board_picked(self, spinner, text):
+        board = self.board()
+        values = [name for name, _ in GAMES] if board == "game" else METHODS if board == "method" else []
+        self.key_spinner.values = values
+        self.key_spinner.opacity = 1 if values else 0
+        self.key_spinner.disabled = not values
+        if values and self.key_spinner.text not in values:
+            self.key_spinner.text = values[0]  # refreshes through the key binding
+        else:
+            self.refresh()
+
+    def refresh(self):
+        self.refresh_leaderboard()
+
+    @profiling.timed("screen.refresh_leaderboard")
+    def refresh_leaderboard(self):
+        board, user = self.board(), self.current_user
+        key = self.key_spinner.text if not self.key_spinner.disabled else None
+        run_db(core.leaderboard, get_db(), user, board, key, LEADERBOARD_SIZE,
+               on_done=lambda result: self.show_leaderboard(user, board, key, result))
+
+    @profiling.timed("screen.show_leaderboard")
+    def show_leaderboard(self, user, board, key, result):
+        if (user, board) != (self.current_user, self.board()) or (key and key != self.key_spinner.text):
+            return  # another board or user was picked while this was loading
+        unit = "encounters" if board == "avg_attempts" else "species" if board == "species" else "shinies"
+        for i, rank_label in enumerate(self.rank_labels):
+            if i < len(result['top']):
+                rank, name, score = result['top'][i]
+                rank_label.text = f"#{rank}  {name}  {score} {unit}"
+            else:
+                rank_label.text = ""
+        if result['me']:
+            rank, score, users = result['me']
+            self.me_label.text = f"You: #{rank} of {users} ({score} {unit})"
+        elif board == "avg_attempts":
+            self.me_label.text = f"You: ranked after {LEADERBOARD_MIN_SUCCESSES} shinies"
+        else:
+            self.me_label.text = "You: not ranked yet"
+
+    def go_back(self, instance):
+        self.manager.current = 'hunt'
 
 
 class CreditsScreen(Screen):
@@ -639,21 +1402,78 @@ class CreditsScreen(Screen):
         self.manager.current = 'main'
 
 
+SCREENS = {
+    'main': MainMenuScreen,
+    'login': LoginScreen,
+    'register': RegisterScreen,
+    'hunt': HuntScreen,
+    'profile': ProfileScreen,
+    'history': HuntHistoryScreen,
+    'living_dex': LivingDexScreen,
+    'leaderboard': LeaderboardScreen,
+    'credits': CreditsScreen,
+}
+
+
 class ShinyQuestApp(App):
     current_user = None
 
     def build(self):
+        STARTUP['build'] = time.perf_counter()
         init_db()
-        sm = ScreenManager()
-        sm.add_widget(MainMenuScreen(name='main'))
-        sm.add_widget(LoginScreen(name='login'))
-        sm.add_widget(RegisterScreen(name='register'))
-        sm.add_widget(HuntScreen(name='hunt'))
-        sm.add_widget(ProfileScreen(name='profile'))
-        sm.add_widget(HuntHistoryScreen(name='history'))
-        sm.add_widget(LivingDexScreen(name='living_dex'))
-        sm.add_widget(CreditsScreen(name='credits'))  # Add new screen
+        self.db_worker = DBWorker()
+        self.sim_worker = DBWorker(name="sim-worker")
+        self.backup_worker = DBWorker(name="backup-worker")
+        self.counters = CounterBuffer(get_db())
+        Clock.schedule_interval(lambda dt: run_db(self.counters.flush), COUNTER_FLUSH_SECONDS)
+        Clock.schedule_interval(lambda dt: run_db(get_db().expire_guest_sessions, GUEST_TTL_SECONDS, self.current_user),
+                                GUEST_SWEEP_SECONDS)
+        sm = LazyScreenManager(SCREENS)
+        sm.get_screen('main')  # the only screen built up front
+        STARTUP['built'] = time.perf_counter()
         return sm
 
+    def on_start(self):
+        EventLoop.window.bind(on_flip=self.on_first_frame)
+        run_db(get_db().purge_legacy_guests)  # guest rows older versions left in the file
+        run_on(self.backup_worker, backup.backup_if_due, get_db().path)
+        if profiling.ENABLED:
+            Clock.schedule_interval(profiling.record_frame, 0)
+
+    def on_first_frame(self, window):
+        window.unbind(on_flip=self.on_first_frame)
+        STARTUP['first_frame'] = time.perf_counter()
+        self.startup_report = {
+            'import_ms': (STARTUP['imported'] - STARTUP['start']) * 1000,
+            'build_ms': (STARTUP['built'] - STARTUP['build']) * 1000,
+            'first_frame_ms': (STARTUP['first_frame'] - STARTUP['start']) * 1000,
+        }
+        Logger.info("ShinyQuest: startup import {import_ms:.0f} ms, build {build_ms:.0f} ms, "
+                    "first frame {first_frame_ms:.0f} ms".format(**self.startup_report))
+        if self.startup_report['first_frame_ms'] > STARTUP_BUDGET_MS:
+            Logger.warning(f"ShinyQuest: cold start over the {STARTUP_BUDGET_MS} ms budget")
+
+    def set_user(self, username):
+        if self.current_user and self.current_user != username and core.is_guest(self.current_user):
+            run_db(self.counters.flush)
+            run_db(get_db().end_guest_session, self.current_user)  # guest hunts are session-only
+        self.current_user = username
+        for screen in self.root.screens:
+            if isinstance(screen, DataScreen):
+                screen.update_user()
+
+    def on_pause(self):
+        run_db(self.counters.flush)
+        return True
+
+    def on_stop(self):
+        self.db_worker.submit(self.counters.flush)
+        self.db_worker.stop()
+        self.sim_worker.stop(timeout=0)  # daemon thread; an unfinished simulation is simply dropped
+        self.backup_worker.stop(timeout=0)  # likewise a backup: only its .part file is left behind
+        close_db()
+        profiling.dump_report()
+
+
 if __name__ == '__main__':
     ShinyQuestApp().run()
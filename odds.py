@@ -0,0 +1,150 @@
+import numpy as np
+
+from pokedex import GAMES, name_key
+
+# Methods the engine knows; anything else is hunted at base odds.
+RANDOM, MASUDA, RADAR, CHAIN_FISHING, FRIEND_SAFARI, SOS, CATCH_COMBO, DYNAMAX, OUTBREAK, SANDWICH = range(10)
+METHOD_CODES = {
+    name_key("Masuda Method"): MASUDA,
+    name_key("Poké Radar"): RADAR,
+    name_key("Chain Fishing"): CHAIN_FISHING,
+    name_key("Friend Safari"): FRIEND_SAFARI,
+    name_key("SOS Battle"): SOS,
+    name_key("Catch Combo"): CATCH_COMBO,
+    name_key("Dynamax Adventure"): DYNAMAX,
+    name_key("Mass Outbreak"): OUTBREAK,
+    name_key("Sandwich"): SANDWICH,
+}
+METHOD_COUNT = 10
+
+GENERATIONS = 10  # index 0 is unused; unknown games are treated as the latest generation
+LATEST_GENERATION = GENERATIONS - 1
+GAME_GENERATIONS = {name_key(game): generation for game, generation in GAMES}
+
+# Chain bonuses stop growing by this chain length; the per-encounter odds are constant after it.
+MAX_CHAIN = 64
+
+
+def base_odds(generation):
+    """Per-roll shiny chance: none in Gen 1, 1/8192 in Gens 2-5, 1/4096 from Gen 6 on."""
+    generation = np.asarray(generation)
+    return np.select([generation <= 1, generation <= 5], [0.0, 1 / 8192], 1 / 4096)
+
+
+def shiny_rolls(method, generation, charm, chain):
+    """Shiny rolls per encounter; method, generation, charm and chain broadcast against each other.
+
+    chain is the chain length (or outbreak clear count) at this encounter.
+    """
+    method, generation, charm, chain = np.broadcast_arrays(method, generation, charm, chain)
+    rolls = 1 + np.where(charm & (generation >= 5), 2, 0)
+    rolls = rolls + np.where(method == MASUDA, np.select([generation == 4, generation >= 5], [4, 5], 0), 0)
+    rolls = rolls + np.where((method == RADAR) & (chain >= 40), 40, 0)
+    rolls = rolls + np.where(method == CHAIN_FISHING, 2 * np.minimum(chain, 20), 0)
+    rolls = rolls + np.where(method == FRIEND_SAFARI, 4, 0)
+    chain_tiers = [chain >= 31, chain >= 21, chain >= 11]
+    rolls = rolls + np.where(method == SOS, np.select(chain_tiers, [12, 8, 4], 0), 0)
+    rolls = rolls + np.where(method == CATCH_COMBO, np.select(chain_tiers, [11, 7, 3], 0), 0)
+    outbreak = np.where(generation >= 9, np.select([chain >= 60, chain >= 30], [2, 1], 0), 25)
+    rolls = rolls + np.where(method == OUTBREAK, outbreak, 0)
+    rolls = rolls + np.where(method == SANDWICH, 3, 0)
+    return rolls
+
+
+def encounter_odds(method, generation, charm, chain):
+    """Chance that one encounter is shiny."""
+    rolls = shiny_rolls(method, generation, charm, chain)
+    odds = -np.expm1(rolls * np.log1p(-base_odds(generation)))  # 1 - (1 - base) ** rolls
+    # Dynamax Adventures roll once per den at fixed odds
+    dynamax = np.where(np.asarray(charm), 1 / 100, 1 / 300)
+    return np.where((np.asarray(method) == DYNAMAX) & (np.asarray(generation) == 8), dynamax, odds)
+
+
+def _build_tables():
+    """Per (method, generation, charm): log P(no shiny in the first n encounters) and the expected
+    number of further encounters after n, for n = 0..MAX_CHAIN, assuming an unbroken chain."""
+    method = np.arange(METHOD_COUNT).reshape(-1, 1, 1, 1)
+    generation = np.arange(GENERATIONS).reshape(1, -1, 1, 1)
+    charm = np.array([False, True]).reshape(1, 1, -1, 1)
+    encounter = np.arange(1, MAX_CHAIN + 1).reshape(1, 1, 1, -1)
+    odds = encounter_odds(method, generation, charm, encounter)
+    log_miss = np.log1p(-odds)
+    log_survival = np.concatenate([np.zeros(odds.shape[:3] + (1,)), np.cumsum(log_miss, axis=-1)], axis=-1)
+    survival = np.exp(log_survival)
+    final_odds = odds[..., -1]
+    with np.errstate(divide="ignore"):
+        # sum of survival from n on: the chain part, then a geometric tail at the final odds
+        tail = survival[..., -1] / final_odds
+        remaining = np.cumsum(survival[..., ::-1], axis=-1)[..., ::-1] - survival[..., -1:] + tail[..., None]
+        expected = remaining / survival
+    return odds, log_survival, expected, final_odds
+
+
+_tables = None
+
+
+def _lookup_tables():
+    global _tables
+    if _tables is None:
+        _tables = _build_tables()
+    return _tables
+
+
+def survival_curve(game, method, charm=False):
+    """Cumulative hazard -log P(no shiny in the first n encounters) for n = 0..MAX_CHAIN, and the
+    per-encounter odds from then on."""
+    _, log_survival, _, final_odds = _lookup_tables()
+    method = METHOD_CODES.get(name_key(method), RANDOM)
+    generation = GAME_GENERATIONS.get(name_key(game), LATEST_GENERATION)
+    return -log_survival[method, generation, int(charm)], float(final_odds[method, generation, int(charm)])
+
+
+def codes(names, mapping, default):
+    """Map a sequence of names onto integer codes by name_key, one dict lookup per distinct name."""
+    unique, inverse = np.unique(np.asarray(names, dtype=str), return_inverse=True)
+    return np.array([mapping.get(name_key(name), default) for name in unique], dtype=np.int64)[inverse]
+
+
+def hunt_odds(games, methods, counters, charm=False):
+    """Odds for many hunts at once.
+
+    games and methods are names (as stored), counters the encounters so far. Chain methods are
+    assumed to have an unbroken chain as long as the counter. Returns arrays of the odds on the
+    next encounter, the probability of having found the shiny within the counter so far, and the
+    expected number of encounters still to go (inf where no shiny is possible).
+    """
+    odds_table, log_survival, expected, final_odds = _lookup_tables()
+    method = codes(methods, METHOD_CODES, RANDOM)
+    generation = codes(games, GAME_GENERATIONS, LATEST_GENERATION)
+    charm = np.broadcast_to(np.asarray(charm, dtype=np.int64), method.shape)
+    counters = np.asarray(counters, dtype=np.int64)
+    capped = np.minimum(counters, MAX_CHAIN)
+    beyond = counters - capped
+    final = final_odds[method, generation, charm]
+    next_odds = np.where(capped < MAX_CHAIN, odds_table[method, generation, charm, np.minimum(capped, MAX_CHAIN - 1)],
+                         final)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        survival = np.exp(log_survival[method, generation, charm, capped] + beyond * np.log1p(-final))
+        remaining = np.where(beyond > 0, 1 / final, expected[method, generation, charm, capped])
+    return {
+        'odds': next_odds,
+        'found_by_now': 1 - survival,
+        'expected_remaining': np.where(final > 0, remaining, np.inf),
+    }
+
+
+def summarize(hunts, charm=False):
+    """Profile numbers from (game, method, counter, success) rows of all of a user's hunts."""
+    if not hunts:
+        return {'active_hunts': 0, 'active_found_by_now': 0.0, 'luck': None}
+    games, methods, counters, successes = zip(*hunts)
+    result = hunt_odds(games, methods, counters, charm)
+    success = np.asarray(successes, dtype=bool)
+    found_by_now = result['found_by_now']
+    # for a finished hunt this is how much of the odds it used: ~50% on average, lower is luckier
+    luck = float(np.mean(found_by_now[success])) if success.any() else None
+    return {
+        'active_hunts': int((~success).sum()),
+        'active_found_by_now': float(np.mean(found_by_now[~success])) if (~success).any() else 0.0,
+        'luck': luck,
+    }
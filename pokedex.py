@@ -0,0 +1,160 @@
+import os
+import struct
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+# National dex order; a species' position + 1 is its dex number.
+GEN1_POKEMON = [
+    "Bulbasaur", "Ivysaur", "Venusaur", "Charmander", "Charmeleon", "Charizard",
+    "Squirtle", "Wartortle", "Blastoise", "Caterpie", "Metapod", "Butterfree",
+    "Weedle", "Kakuna", "Beedrill", "Pidgey", "Pidgeotto", "Pidgeot",
+    "Rattata", "Raticate", "Spearow", "Fearow", "Ekans", "Arbok",
+    "Pikachu", "Raichu", "Sandshrew", "Sandslash", "Nidoran♀", "Nidorina",
+    "Nidoqueen", "Nidoran♂", "Nidorino", "Nidoking", "Clefairy", "Clefable",
+    "Vulpix", "Ninetales", "Jigglypuff", "Wigglytuff", "Zubat", "Golbat",
+    "Oddish", "Gloom", "Vileplume", "Paras", "Parasect", "Venonat", "Venomoth",
+    "Diglett", "Dugtrio", "Meowth", "Persian", "Psyduck", "Golduck",
+    "Mankey", "Primeape", "Growlithe", "Arcanine", "Poliwag", "Poliwhirl",
+    "Poliwrath", "Abra", "Kadabra", "Alakazam", "Machop", "Machoke", "Machamp",
+    "Bellsprout", "Weepinbell", "Victreebel", "Tentacool", "Tentacruel",
+    "Geodude", "Graveler", "Golem", "Ponyta", "Rapidash", "Slowpoke", "Slowbro",
+    "Magnemite", "Magneton", "Farfetch'd", "Doduo", "Dodrio", "Seel", "Dewgong",
+    "Grimer", "Muk", "Shellder", "Cloyster", "Gastly", "Haunter", "Gengar",
+    "Onix", "Drowzee", "Hypno", "Krabby", "Kingler", "Voltorb", "Electrode",
+    "Exeggcute", "Exeggutor", "Cubone", "Marowak", "Hitmonlee", "Hitmonchan",
+    "Lickitung", "Koffing", "Weezing", "Rhyhorn", "Rhydon", "Chansey",
+    "Tangela", "Kangaskhan", "Horsea", "Seadra", "Goldeen", "Seaking",
+    "Staryu", "Starmie", "Mr. Mime", "Scyther", "Jynx", "Electabuzz",
+    "Magmar", "Pinsir", "Tauros", "Magikarp", "Gyarados", "Lapras", "Ditto",
+    "Eevee", "Vaporeon", "Jolteon", "Flareon", "Porygon", "Omanyte", "Omastar",
+    "Kabuto", "Kabutops", "Aerodactyl", "Snorlax", "Articuno", "Zapdos",
+    "Moltres", "Dratini", "Dragonair", "Dragonite", "Mewtwo", "Mew"
+]
+
+# symbols that tell species apart and would otherwise be stripped
+_KEY_REPLACEMENTS = {"♀": "f", "♂": "m"}
+
+
+def name_key(name):
+    """Lookup key for a species, game or method name.
+
+    Case, accents, spacing and punctuation are ignored, so "pikachu", "Pikachu " and "PIKACHU"
+    are one species and "Mr. Mime" matches "mr mime".
+    """
+    name = "".join(_KEY_REPLACEMENTS.get(ch, ch) for ch in name.strip())
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    key = "".join(ch for ch in decomposed if ch.isalnum())
+    return key or name.casefold()
+
+
+# (game, generation) for the mainline games
+GAMES = [
+    ("Red", 1), ("Blue", 1), ("Yellow", 1),
+    ("Gold", 2), ("Silver", 2), ("Crystal", 2),
+    ("Ruby", 3), ("Sapphire", 3), ("Emerald", 3), ("FireRed", 3), ("LeafGreen", 3),
+    ("Diamond", 4), ("Pearl", 4), ("Platinum", 4), ("HeartGold", 4), ("SoulSilver", 4),
+    ("Black", 5), ("White", 5), ("Black 2", 5), ("White 2", 5),
+    ("X", 6), ("Y", 6), ("Omega Ruby", 6), ("Alpha Sapphire", 6),
+    ("Sun", 7), ("Moon", 7), ("Ultra Sun", 7), ("Ultra Moon", 7),
+    ("Let's Go Pikachu", 7), ("Let's Go Eevee", 7),
+    ("Sword", 8), ("Shield", 8), ("Brilliant Diamond", 8), ("Shining Pearl", 8), ("Legends: Arceus", 8),
+    ("Scarlet", 9), ("Violet", 9),
+]
+
+METHODS = [
+    "Random Encounter", "Soft Reset", "Masuda Method", "Poké Radar", "Chain Fishing", "Friend Safari",
+    "DexNav", "SOS Battle", "Catch Combo", "Dynamax Adventure", "Mass Outbreak", "Sandwich",
+]
+
+
+SPECIES_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "species.idx")
+# magic, format version, species count, bytes of names, bytes of keys; then the two blobs and the targets
+_INDEX_HEADER = struct.Struct("<4sHHII")
+_INDEX_MAGIC = b"SQSI"
+_INDEX_VERSION = 1
+
+
+class SpeciesIndex:
+    """Sorted name keys with bisect prefix search, for the species autocomplete.
+
+    keys is sorted and targets[i] is the position in names of the species keys[i] belongs to.
+    """
+
+    def __init__(self, names, keys, targets):
+        self.names = names
+        self.keys = keys
+        self.targets = targets
+
+    @classmethod
+    def build(cls, names):
+        entries = sorted((name_key(name), position) for position, name in enumerate(names))
+        return cls(list(names), [key for key, _ in entries], array("H", (position for _, position in entries)))
+
+    @classmethod
+    def load(cls, path=SPECIES_INDEX_PATH):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, count, names_size, keys_size = _INDEX_HEADER.unpack_from(data)
+        if magic != _INDEX_MAGIC or version != _INDEX_VERSION:
+            raise ValueError(f"{path} is not a species index this app can read")
+        offset = _INDEX_HEADER.size
+        names = data[offset:offset + names_size].decode("utf-8").split("\0")
+        offset += names_size
+        keys = data[offset:offset + keys_size].decode("utf-8").split("\0")
+        targets = array("H")
+        targets.frombytes(data[offset + keys_size:])
+        if not len(names) == len(keys) == len(targets) == count:
+            raise ValueError(f"{path} is truncated")
+        return cls(names, keys, targets)
+
+    def save(self, path=SPECIES_INDEX_PATH):
+        names = "\0".join(self.names).encode("utf-8")
+        keys = "\0".join(self.keys).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, _INDEX_VERSION, len(self.names), len(names), len(keys)))
+            f.write(names)
+            f.write(keys)
+            f.write(self.targets.tobytes())
+
+    def suggest(self, text, limit=5):
+        """Up to limit species whose name starts with text, ignoring case, accents and punctuation."""
+        if not text.strip():
+            return []
+        prefix = name_key(text)
+        suggestions = []
+        i = bisect_left(self.keys, prefix)
+        while i < len(self.keys) and len(suggestions) < limit and self.keys[i].startswith(prefix):
+            suggestions.append(self.names[self.targets[i]])
+            i += 1
+        return suggestions
+
+
+_species_index = None
+
+
+def species_index():
+    """The species index, read from the packed file once; built from GEN1_POKEMON if the file is missing."""
+    global _species_index
+    if _species_index is None:
+        try:
+            _species_index = SpeciesIndex.load()
+        except (OSError, ValueError):
+            _species_index = SpeciesIndex.build(GEN1_POKEMON)
+    return _species_index
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the packed species index the autocomplete loads")
+    parser.add_argument("path", nargs="?", default=SPECIES_INDEX_PATH)
+    args = parser.parse_args(argv)
+    SpeciesIndex.build(GEN1_POKEMON).save(args.path)
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""Opt-in timing of SQL statements, screen refreshes and frames.
+
+    SHINYQUEST_PROFILE=1 python main.py
+    python profiling.py shinyquest-profile.json   # print a saved hot-path report
+
+Off unless SHINYQUEST_PROFILE is set: the connection is a plain sqlite3.Connection, timed() hands
+back the undecorated function and no frame callback is scheduled, so a normal run pays nothing.
+When on, every sample goes to a rotating log and is aggregated for report() / dump_report().
+"""
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+ENABLED = bool(os.environ.get("SHINYQUEST_PROFILE"))
+LOG_PATH = "shinyquest-profile.log"
+REPORT_PATH = "shinyquest-profile.json"
+LOG_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+SLOW_QUERY_MS = 20  # statements slower than this get their query plan logged
+SLOW_FRAME_MS = 1000 / 30
+SAMPLES = 10000  # durations kept per key for the percentiles; count and total cover every call
+SQL_KEY_CHARS = 200
+PLANNED_STATEMENTS = {"SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH"}
+
+log = logging.getLogger("shinyquest.profile")
+_lock = threading.Lock()
+_stats = {}  # key -> {'count', 'total_ms', 'rows', 'samples'}
+_plans = {}  # sql -> EXPLAIN QUERY PLAN lines, captured once per statement
+
+
+def _setup_log():
+    if log.handlers:
+        return
+    handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(threadName)s %(message)s"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+
+def record(key, ms, rows=None, call=True):
+    """Add one sample to key; call=False adds time and rows to the last call (a fetch) instead."""
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            entry = _stats[key] = {'count': 0, 'total_ms': 0.0, 'rows': 0, 'samples': deque(maxlen=SAMPLES)}
+        entry['total_ms'] += ms
+        entry['rows'] += rows or 0
+        if call:
+            entry['count'] += 1
+            entry['samples'].append(ms)
+    if call:
+        log.info("%.3f ms%s %s", ms, f" rows={rows}" if rows is not None else "", key)
+
+
+def _percentile(ordered, p):
+    return ordered[int(p / 100 * (len(ordered) - 1))]
+
+
+def report():
+    """Hot paths, slowest total first: count, total, p50/p95/p99 ms and rows touched per key.
+
+    Percentiles are per call (for SQL: the execute); total and rows include the fetches after it.
+    """
+    with _lock:
+        stats = [(key, dict(entry, samples=sorted(entry['samples']))) for key, entry in _stats.items()]
+    rows = []
+    for key, entry in stats:
+        ordered = entry['samples']
+        rows.append({
+            'key': key,
+            'count': entry['count'],
+            'total_ms': entry['total_ms'],
+            'p50_ms': _percentile(ordered, 50),
+            'p95_ms': _percentile(ordered, 95),
+            'p99_ms': _percentile(ordered, 99),
+            'rows': entry['rows'],
+            'plan': _plans.get(key[4:]) if key.startswith("sql ") else None,
+        })
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows
+
+
+def format_report(rows, limit=30):
+    lines = [f"{'count':>7} {'total ms':>10} {'p50':>8} {'p95':>8} {'p99':>8} {'rows':>8}  key"]
+    for row in rows[:limit]:
+        lines.append(f"{row['count']:7} {row['total_ms']:10.1f} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f} "
+                     f"{row['p99_ms']:8.2f} {row['rows']:8}  {row['key']}")
+    return "\n".join(lines)
+
+
+def dump_report(path=REPORT_PATH):
+    """Write report() to path as JSON and the top of it to the log; a no-op when profiling is off."""
+    if not ENABLED:
+        return None
+    rows = report()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    log.info("hot paths:\n%s", format_report(rows))
+    return rows
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _plans.clear()
+
+
+# SQL
+
+def _sql_key(sql):
+    return "sql " + " ".join(sql.split())[:SQL_KEY_CHARS]
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Adds the time spent fetching, and the rows fetched, to the statement that produced them."""
+    key = None
+
+    def _fetched(self, started, rows):
+        if self.key is not None:
+            record(self.key, (time.perf_counter() - started) * 1000, rows, call=False)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that times every execute() and executemany()."""
+
+    def execute(self, sql, parameters=()):
+        return self._timed(sql, parameters, TimedCursor.execute, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        return self._timed(sql, seq_of_parameters, TimedCursor.executemany,
+                           seq_of_parameters[0] if seq_of_parameters else None)
+
+    def _timed(self, sql, parameters, run, plan_parameters):
+        cursor = self.cursor(TimedCursor)
+        started = time.perf_counter()
+        run(cursor, sql, parameters)
+        ms = (time.perf_counter() - started) * 1000
+        key = _sql_key(sql)
+        cursor.key = key
+        record(key, ms, cursor.rowcount if cursor.rowcount >= 0 else None)
+        if ms > SLOW_QUERY_MS:
+            self._capture_plan(sql, plan_parameters, ms)
+        return cursor
+
+    def _capture_plan(self, sql, parameters, ms):
+        key = _sql_key(sql)[4:]
+        if key in _plans or sql.split(None, 1)[0].upper() not in PLANNED_STATEMENTS:
+            return
+        try:
+            plan = [row[3] for row in super().execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ()).fetchall()]
+            plan = plan or ["(no plan steps)"]
+        except sqlite3.Error as e:
+            plan = [f"(no plan: {e})"]
+        _plans[key] = plan
+        log.warning("slow query %.1f ms: %s\n    %s", ms, key, "\n    ".join(plan))
+
+
+def connection_factory():
+    """What Database passes to sqlite3.connect(factory=...)."""
+    return TimedConnection if ENABLED else sqlite3.Connection
+
+
+# Screens and frames
+
+def timed(name):
+    """Decorator recording each call's duration under name; returns the function untouched when off."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, (time.perf_counter() - started) * 1000)
+        return wrapper
+    return decorate
+
+
+def record_frame(dt):
+    """Clock callback run every frame; dt is the time since the previous one."""
+    ms = dt * 1000
+    record("frame", ms)
+    if ms > SLOW_FRAME_MS:
+        log.warning("slow frame %.1f ms", ms)
+
+
+if ENABLED:
+    _setup_log()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print a saved ShinyQuest profile report")
+    parser.add_argument("report", nargs="?", default=REPORT_PATH)
+    parser.add_argument("--limit", type=int, default=30)
+    args = parser.parse_args(argv)
+    with open(args.report, encoding="utf-8") as f:
+        rows = json.load(f)
+    print(format_report(rows, args.limit))
+    for row in rows[:args.limit]:
+        if row.get('plan'):
+            print(f"\n{row['key']}\n    " + "\n    ".join(row['plan']))
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main())
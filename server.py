@@ -0,0 +1,332 @@
+"""Asyncio HTTP/JSON service over core, for serving many users from one db.
+
+    python server.py --db shinyquest.db --port 8080 --pool 4 --concurrency 64
+
+Every endpoint except /register and /login needs "Authorization: Bearer <token>" from /login.
+
+    POST /register        {"username", "email", "password"}
+    POST /login           {"username", "password"}                 -> {"token"}
+    POST /hunts           {"pokemon", "game", "method"}            -> {"id"}
+    GET  /hunts?after=<id>&limit=<n>                               -> {"hunts": [...]} with odds
+    POST /hunts/fetch     {"ids": [hunt_id, ...]}                  -> {"hunts": [...]}
+    POST /hunts/search    {"filters": {...}, "after", "limit"}     -> {"hunts": [...], "after"}
+    POST /hunts/success   {"pokemon"}
+    POST /hunts/delete    {"ids"}                                  -> {"deleted"}
+    POST /hunts/caught    {"ids"}                                  -> {"updated"}
+    POST /hunts/edit      {"ids", "game", "method"}                -> {"updated"}
+    GET  /hunts/activity?id=<hunt id>                              -> {"hours", "last_hour", "sessions", "per_hour"}
+    POST /counters        {"increments": [[hunt_id, amount], ...]} -> {"updated"}
+    GET  /dex                                                      -> {"caught", "missing", "complete"}
+    POST /dex/delete      {"pokemon": [name, ...]}                 -> {"deleted"}
+    GET  /stats                                                    -> {"user", "stats", "luck"}
+    GET  /leaderboard?board=<name>&key=<game or method>&limit=<n>  -> {"top": [...], "me"}
+    POST /sync            a sync.sync() round                      -> changes from other devices
+
+Handlers run core on a thread pool the size of the connection pool, so each thread holds one
+connection at a time. A semaphore bounds the requests in flight; past max_pending waiting requests
+the server answers 503 instead of queueing without limit. Sessions live in memory.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import queue
+import secrets
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import core
+import sync
+from database import DB_PATH, Database
+
+POOL_SIZE = 4
+MAX_CONCURRENCY = 64  # requests being handled at once
+MAX_PENDING = 1024  # requests waiting for a slot before the server sheds load with 503
+MAX_BODY = 1024 * 1024
+MAX_HEADER_LINES = 100
+PAGE_LIMIT = 500
+
+log = logging.getLogger("shinyquest.server")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class DatabasePool:
+    """A fixed set of Database connections handed out one per call."""
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE):
+        self.size = size
+        self.free = queue.SimpleQueue()
+        for _ in range(size):
+            self.free.put(Database(path))
+
+    @contextmanager
+    def connection(self):
+        db = self.free.get()
+        try:
+            yield db
+        finally:
+            self.free.put(db)
+
+    def close(self):
+        for _ in range(self.size):
+            self.free.get().close()
+
+
+def _number(value):
+    value = float(value)
+    return value if math.isfinite(value) else None  # JSON has no infinity
+
+
+def hunt_json(hunt, hunt_odds=None, i=0):
+    hunt_id, pokemon, game, method, counter, success = hunt
+    item = {'id': hunt_id, 'pokemon': pokemon, 'game': game, 'method': method, 'counter': counter,
+            'success': bool(success)}
+    if hunt_odds is not None:
+        item.update({name: _number(values[i]) for name, values in hunt_odds.items()})
+    return item
+
+
+class Server:
+    def __init__(self, pool, concurrency=MAX_CONCURRENCY, max_pending=MAX_PENDING):
+        self.pool = pool
+        self.executor = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix="db")
+        self.slots = asyncio.Semaphore(concurrency)
+        self.max_pending = max_pending
+        self.pending = 0
+        self.sessions = {}  # token -> username
+        self.routes = {
+            ("POST", "/register"): self.register,
+            ("POST", "/login"): self.login,
+            ("POST", "/hunts"): self.start_hunt,
+            ("GET", "/hunts"): self.hunts_page,
+            ("POST", "/hunts/fetch"): self.fetch_hunts,
+            ("POST", "/hunts/search"): self.search_hunts,
+            ("POST", "/hunts/success"): self.mark_successful,
+            ("POST", "/hunts/delete"): self.delete_hunts,
+            ("POST", "/hunts/caught"): self.mark_hunts_successful,
+            ("POST", "/hunts/edit"): self.edit_hunts,
+            ("GET", "/hunts/activity"): self.hunt_activity,
+            ("POST", "/counters"): self.add_encounters,
+            ("GET", "/dex"): self.dex,
+            ("POST", "/dex/delete"): self.remove_from_dex,
+            ("GET", "/stats"): self.stats,
+            ("GET", "/leaderboard"): self.leaderboard,
+            ("POST", "/sync"): self.sync,
+        }
+
+    async def call(self, fn, *args):
+        """fn(db, *args) on a pool thread with a pooled connection."""
+        def run():
+            with self.pool.connection() as db:
+                return fn(db, *args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, run)
+
+    def user(self, headers):
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        username = self.sessions.get(token) if scheme.lower() == "bearer" else None
+        if username is None:
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "log in first")
+        return username
+
+    # Endpoints: (headers, query, body) -> JSON-able result
+
+    async def register(self, headers, query, body):
+        await self.call(core.register, str(body.get("username", "")), str(body.get("email", "")),
+                        str(body.get("password", "")))
+        return {}
+
+    async def login(self, headers, query, body):
+        username = str(body.get("username", ""))
+        if not await self.call(core.login, username, str(body.get("password", ""))):
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "invalid credentials")
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = username
+        return {'token': token}
+
+    async def start_hunt(self, headers, query, body):
+        hunt_id = await self.call(core.start_hunt, self.user(headers), str(body.get("pokemon", "")),
+                                  str(body.get("game") or "Unknown"), str(body.get("method") or "Unknown"))
+        return {'id': hunt_id}
+
+    async def hunts_page(self, headers, query, body):
+        after = int(query.get("after", 0))
+        limit = min(int(query.get("limit", 50)), PAGE_LIMIT)
+        hunts, hunt_odds = await self.call(core.history_page, self.user(headers), after, limit)
+        return {'hunts': [hunt_json(hunt, hunt_odds, i) for i, hunt in enumerate(hunts)]}
+
+    async def fetch_hunts(self, headers, query, body):
+        hunts = await self.call(core.fetch_hunts, self.user(headers), body.get("ids", []))
+        return {'hunts': [hunt_json(hunt) for hunt in hunts]}
+
+    async def search_hunts(self, headers, query, body):
+        limit = min(int(body.get("limit", 50)), PAGE_LIMIT)
+        hunts, hunt_odds = await self.call(core.search_history, self.user(headers), body.get("filters"),
+                                           body.get("after"), limit)
+        # the cursor for the next page: (counter, id) of the last hunt
+        return {'hunts': [hunt_json(hunt, hunt_odds, i) for i, hunt in enumerate(hunts)],
+                'after': [hunts[-1][4], hunts[-1][0]] if hunts else None}
+
+    async def mark_successful(self, headers, query, body):
+        await self.call(core.mark_successful, self.user(headers), str(body.get("pokemon", "")))
+        return {}
+
+    async def delete_hunts(self, headers, query, body):
+        return {'deleted': await self.call(core.delete_hunts, self.user(headers), body.get("ids", []))}
+
+    async def mark_hunts_successful(self, headers, query, body):
+        return {'updated': await self.call(core.mark_hunts_successful, self.user(headers), body.get("ids", []))}
+
+    async def edit_hunts(self, headers, query, body):
+        updated = await self.call(core.edit_hunts, self.user(headers), body.get("ids", []),
+                                  str(body.get("game") or ""), str(body.get("method") or ""))
+        return {'updated': updated}
+
+    async def hunt_activity(self, headers, query, body):
+        return await self.call(core.hunt_activity, self.user(headers), int(query.get("id", 0)))
+
+    async def add_encounters(self, headers, query, body):
+        updated = await self.call(core.add_encounters, self.user(headers), body.get("increments", []))
+        return {'updated': updated}
+
+    async def dex(self, headers, query, body):
+        return await self.call(core.dex_snapshot, self.user(headers))
+
+    async def remove_from_dex(self, headers, query, body):
+        return {'deleted': await self.call(core.remove_from_dex, self.user(headers), body.get("pokemon", []))}
+
+    async def stats(self, headers, query, body):
+        user_info, stats, luck = await self.call(core.profile, self.user(headers))
+        return {'user': user_info and {'username': user_info[0], 'bio': user_info[2]}, 'stats': stats, 'luck': luck}
+
+    async def leaderboard(self, headers, query, body):
+        board = await self.call(core.leaderboard, self.user(headers), query.get("board", ""), query.get("key"),
+                                int(query.get("limit", 10)))
+        me = board['me'] and dict(zip(("rank", "score", "users"), board['me']))
+        return {'top': [{'rank': rank, 'user': user, 'score': score} for rank, user, score in board['top']], 'me': me}
+
+    async def sync(self, headers, query, body):
+        return await self.call(sync.handle_sync, body, self.user(headers))
+
+    # HTTP
+
+    async def dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no route for {method} {url.path}")
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            data = json.loads(body) if body else {}
+        except json.JSONDecodeError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {e.msg}") from None
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "expected a JSON object")
+        if self.pending >= self.max_pending:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "server busy")
+        self.pending += 1
+        try:
+            async with self.slots:
+                return await handler(headers, query, data)
+        except (ValueError, TypeError) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e)) from None
+        except sqlite3.IntegrityError:
+            raise HTTPError(HTTPStatus.CONFLICT, "already exists") from None
+        finally:
+            self.pending -= 1
+
+    async def handle(self, reader, writer):
+        """One client connection; requests are answered in order while the client keeps it alive."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    return
+                headers = {}
+                for _ in range(MAX_HEADER_LINES):
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    await self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': "body too large"}, False)
+                    return
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1")
+                try:
+                    status, result = HTTPStatus.OK, await self.dispatch(method.upper(), target, headers, body)
+                except HTTPError as e:
+                    status, result = e.status, {'error': str(e)}
+                except Exception:
+                    log.exception("%s %s failed", method, target)
+                    status, result = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "internal error"}
+                await self.respond(writer, status, result, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # the client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, result, keep_alive):
+        payload = json.dumps(result).encode()
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                     f"\r\n".encode("latin-1") + payload)
+        await writer.drain()
+
+    def close(self):
+        self.executor.shutdown()
+        self.pool.close()
+
+
+async def serve(path, host, port, pool_size, concurrency, max_pending=MAX_PENDING):
+    migration = Database(path)
+    migration.migrate()
+    migration.close()
+    server = Server(DatabasePool(path, pool_size), concurrency, max_pending)
+    listener = await asyncio.start_server(server.handle, host, port)
+    host, port = listener.sockets[0].getsockname()[:2]
+    print(f"listening on http://{host}:{port}", flush=True)  # loadtest.py reads this line
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ShinyQuest HTTP service")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="0 picks a free port")
+    parser.add_argument("--pool", type=int, default=POOL_SIZE, help="db connections")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="requests handled at once")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, args.pool, args.concurrency, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
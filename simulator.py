@@ -0,0 +1,127 @@
+import os
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import odds
+
+PERCENTILES = (10, 50, 90, 99)
+CHUNK_TRIALS = 5000
+POOL_DRAWS = 2_000_000  # species x trials above which the chunks go to a process pool
+CACHE_SIZE = 32
+
+# Rough encounters per hour by method, for turning encounters into hours when the plan gives none.
+ENCOUNTERS_PER_HOUR = {
+    odds.RANDOM: 120,
+    odds.MASUDA: 40,  # eggs
+    odds.RADAR: 100,
+    odds.CHAIN_FISHING: 180,
+    odds.FRIEND_SAFARI: 150,
+    odds.SOS: 180,
+    odds.CATCH_COMBO: 240,
+    odds.DYNAMAX: 12,  # dens
+    odds.OUTBREAK: 200,
+    odds.SANDWICH: 300,
+}
+
+# species: how many shinies the plan needs; 1 for a single hunt, the uncaught species for a dex plan.
+Plan = namedtuple("Plan", "species game method charm encounters_per_hour trials seed",
+                  defaults=(False, None, 100_000, 0))
+
+_cache = OrderedDict()  # Plan -> finished result, least recently used first
+
+
+def encounters_per_hour(plan):
+    if plan.encounters_per_hour:
+        return plan.encounters_per_hour
+    return ENCOUNTERS_PER_HOUR.get(odds.METHOD_CODES.get(odds.name_key(plan.method), odds.RANDOM), 120)
+
+
+def draw_encounters(rng, hazard, final_odds, size):
+    """Encounters until the shiny for size hunts, by inverting the survival curve of odds.survival_curve.
+
+    A hunt runs past n encounters while an Exp(1) draw exceeds the cumulative hazard at n, so the
+    shiny comes at the first n whose hazard reaches the draw; past the curve the odds are constant.
+    """
+    draws = rng.standard_exponential(size)
+    encounters = np.searchsorted(hazard, draws, side="left").astype(np.float64)
+    beyond = draws > hazard[-1]
+    encounters[beyond] = len(hazard) - 1 + np.ceil((draws[beyond] - hazard[-1]) / -np.log1p(-final_odds))
+    return encounters
+
+
+def simulate_chunk(plan, seed, trials):
+    """Total encounters of trials independent runs of the plan."""
+    hazard, final_odds = odds.survival_curve(plan.game, plan.method, plan.charm)
+    rng = np.random.default_rng(seed)
+    totals = np.zeros(trials)
+    # one species at a time keeps memory at one row of trials
+    for _ in range(plan.species):
+        totals += draw_encounters(rng, hazard, final_odds, trials)
+    return totals
+
+
+def summarize(plan, totals):
+    per_hour = encounters_per_hour(plan)
+    encounters = np.percentile(totals, PERCENTILES)
+    return {
+        'trials': len(totals),
+        'mean': float(totals.mean()),
+        'encounters': dict(zip(PERCENTILES, encounters.tolist())),
+        'hours': dict(zip(PERCENTILES, (encounters / per_hour).tolist())),
+        'encounters_per_hour': per_hour,
+    }
+
+
+def _process_pool(workers):
+    try:
+        return ProcessPoolExecutor(workers)
+    except (ImportError, NotImplementedError, OSError):
+        return None  # no multiprocessing here (Android has no sem_open); run the chunks in-process
+
+
+def simulate(plan, progress=None, workers=None):
+    """Percentiles of the encounters and hours the plan takes, from plan.trials seeded runs.
+
+    The runs are split into CHUNK_TRIALS chunks with seeds spawned from plan.seed, so the result
+    depends only on the plan, not on the worker count. Large plans fan the chunks out over a
+    process pool. progress(estimate) gets a summary over the chunks finished so far after each one.
+    Finished results are cached by plan.
+    """
+    if plan in _cache:
+        _cache.move_to_end(plan)
+        if progress:
+            progress(_cache[plan])
+        return _cache[plan]
+    if plan.species < 1:
+        raise ValueError("the plan needs at least one species")
+    if odds.survival_curve(plan.game, plan.method, plan.charm)[1] == 0:
+        raise ValueError(f"{plan.game} has no shiny Pokémon")
+    sizes = [min(CHUNK_TRIALS, plan.trials - start) for start in range(0, plan.trials, CHUNK_TRIALS)]
+    seeds = np.random.SeedSequence(plan.seed).spawn(len(sizes))
+    chunks = [None] * len(sizes)
+
+    def chunk_done(index, totals):
+        chunks[index] = totals
+        if progress:
+            progress(summarize(plan, np.concatenate([chunk for chunk in chunks if chunk is not None])))
+
+    workers = workers or os.cpu_count() or 1
+    pool = None
+    if workers > 1 and len(sizes) > 1 and plan.species * plan.trials > POOL_DRAWS:
+        pool = _process_pool(min(workers, len(sizes)))
+    if pool:
+        with pool:
+            futures = {pool.submit(simulate_chunk, plan, seed, size): index
+                       for index, (seed, size) in enumerate(zip(seeds, sizes))}
+            for future in as_completed(futures):
+                chunk_done(futures[future], future.result())
+    else:
+        for index, (seed, size) in enumerate(zip(seeds, sizes)):
+            chunk_done(index, simulate_chunk(plan, seed, size))
+    result = summarize(plan, np.concatenate(chunks))
+    _cache[plan] = result
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
@@ -0,0 +1,262 @@
+"""Delta sync of hunts and living_dex between a device's db and a server's.
+
+    python sync.py demo --hunts 20000 --changes 100   # two devices and a stand-in server in temp dbs
+
+Both sides run the same schema. Triggers (database._migration_sync_log) log every change in the
+changes table, one row per (entity, key, origin device) moved to the end on each new change, so
+a sync sends the rows changed since the last one however long the history is:
+
+    device -> server  {'user_id', 'device', 'cursor', 'limit', 'changes': rows this device changed}
+    server -> device  {'changes': rows other devices changed after cursor, 'cursor', 'more'}
+
+Merging: a hunt's counter is a grow-only counter, each device's share kept in hunt_counts and
+merged by taking the larger count per device, so encounters counted on two devices while offline
+add up instead of one overwriting the other. success only ever goes from 0 to 1; species, game
+and method take the value last received by the server; a deleted hunt stays deleted. Dex rows
+removed with "Delete from Dex" are removed everywhere.
+"""
+import json
+import time
+import urllib.request
+
+from database import Database, _lookup_id
+
+MAX_CHANGES = 2000  # changed rows per request each way; bigger syncs take several rounds
+
+
+def device_id(c):
+    return _meta(c, "device")
+
+
+def _meta(c, key, default=None):
+    row = c.execute("SELECT value FROM sync_meta WHERE key=?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_meta(c, key, value):
+    c.execute("INSERT OR REPLACE INTO sync_meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def _set_writer(c, device):
+    c.execute("UPDATE sync_meta SET value=? WHERE key='writer'", (device,))
+
+
+def changes_since(c, user_id, after_seq, limit=MAX_CHANGES, origin=None, exclude_origin=None):
+    """(records, last seq) for up to limit of user_id's changes after after_seq, oldest first.
+
+    origin keeps only one device's changes, exclude_origin drops one device's.
+    """
+    where, params = "", [user_id, after_seq]
+    if origin is not None:
+        where, params = " AND origin=?", params + [origin]
+    elif exclude_origin is not None:
+        where, params = " AND origin<>?", params + [exclude_origin]
+    rows = c.execute(f"SELECT seq, entity, key, origin FROM changes WHERE user_id=? AND seq>?{where} "
+                     f"ORDER BY seq LIMIT ?", params + [limit]).fetchall()
+    records = [(_hunt_record if entity == "hunt" else _dex_record)(c, user_id, key, origin)
+               for _, entity, key, origin in rows]
+    return records, rows[-1][0] if rows else after_seq
+
+
+def _hunt_record(c, user_id, uuid, origin):
+    record = {'entity': "hunt", 'key': uuid, 'origin': origin}
+    row = c.execute("SELECT s.name, g.name, m.name, h.success FROM hunts h CROSS JOIN species s ON s.id=h.species_id "
+                    "CROSS JOIN games g ON g.id=h.game_id CROSS JOIN methods m ON m.id=h.method_id "
+                    "WHERE h.uuid=? AND h.user_id=?", (uuid, user_id)).fetchone()
+    if row is None:
+        record['deleted'] = True
+        return record
+    record['pokemon'], record['game'], record['method'], success = row
+    record['success'] = bool(success)
+    record['counts'] = dict(c.execute("SELECT device, count FROM hunt_counts WHERE hunt_uuid=?", (uuid,)))
+    return record
+
+
+def _dex_record(c, user_id, species_key, origin):
+    row = c.execute("SELECT s.name, g.name FROM species s LEFT JOIN living_dex d ON d.user_id=? AND d.species_id=s.id "
+                    "LEFT JOIN games g ON g.id=d.game_id WHERE s.key=?", (user_id, species_key)).fetchone()
+    return {'entity': "dex", 'key': species_key, 'origin': origin, 'pokemon': row[0], 'game': row[1]}
+
+
+def apply_changes(c, user_id, records):
+    """Merge records from another device into user_id's rows; call inside a transaction."""
+    local = device_id(c)
+    try:
+        for record in records:
+            if record['entity'] == "hunt":
+                _apply_hunt(c, user_id, record)
+            else:
+                _apply_dex(c, user_id, record)
+    finally:
+        _set_writer(c, local)
+
+
+def _apply_hunt(c, user_id, record):
+    uuid, origin = record['key'], record['origin']
+    row = c.execute("SELECT id, species_id, game_id, method_id, success FROM hunts WHERE uuid=? AND user_id=?",
+                    (uuid, user_id)).fetchone()
+    _set_writer(c, origin)
+    if record.get('deleted'):
+        if row is not None:
+            c.execute("DELETE FROM hunts WHERE id=?", (row[0],))
+        else:  # remember the tombstone so a late update cannot bring the hunt back
+            c.execute("INSERT OR REPLACE INTO changes (user_id, entity, key, origin) VALUES (?, 'hunt', ?, ?)",
+                      (user_id, uuid, origin))
+        return
+    ids = (_lookup_id(c, "species", record['pokemon']), _lookup_id(c, "games", record['game']),
+           _lookup_id(c, "methods", record['method']))
+    if row is None:
+        if c.execute("SELECT 1 FROM changes WHERE entity='hunt' AND key=? LIMIT 1", (uuid,)).fetchone():
+            return  # deleted here
+        hunt_id = c.execute("INSERT INTO hunts (user_id, species_id, game_id, method_id, counter, success, uuid) "
+                            "VALUES (?, ?, ?, ?, 0, 0, ?)", (user_id,) + ids + (uuid,)).lastrowid
+        success = False
+    else:
+        hunt_id, success = row[0], row[4]
+        if tuple(row[1:4]) != ids:
+            c.execute("UPDATE hunts SET species_id=?, game_id=?, method_id=? WHERE id=?", ids + (hunt_id,))
+    known = dict(c.execute("SELECT device, count FROM hunt_counts WHERE hunt_uuid=?", (uuid,)))
+    for device, count in record['counts'].items():
+        if count > known.get(device, 0):
+            # the trigger credits the increase to the writer, so each device's share stays its own
+            _set_writer(c, device)
+            c.execute("UPDATE hunts SET counter=counter+? WHERE id=?", (count - known.get(device, 0), hunt_id))
+    if record['success'] and not success:
+        _set_writer(c, origin)
+        c.execute("UPDATE hunts SET success=1 WHERE id=?", (hunt_id,))
+
+
+def _apply_dex(c, user_id, record):
+    _set_writer(c, record['origin'])
+    species_id = _lookup_id(c, "species", record['pokemon'])
+    if record['game'] is None:
+        c.execute("DELETE FROM living_dex WHERE user_id=? AND species_id=?", (user_id, species_id))
+    else:
+        c.execute("INSERT INTO living_dex (user_id, species_id, game_id) VALUES (?, ?, ?) ON CONFLICT (user_id, species_id) "
+                  "DO UPDATE SET game_id=excluded.game_id WHERE game_id<>excluded.game_id",
+                  (user_id, species_id, _lookup_id(c, "games", record['game'])))
+
+
+def handle_sync(db, request, user_id):
+    """The server half of a round: apply the device's changes, answer with everyone else's."""
+    device, changes = request.get('device'), request.get('changes')
+    if not isinstance(device, str) or not isinstance(changes, list):
+        raise ValueError("a sync request needs device and changes")
+    limit = min(int(request.get('limit', MAX_CHANGES)), MAX_CHANGES)
+    with db.transaction() as c:
+        try:
+            apply_changes(c, user_id, changes)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"malformed change: {e!r}") from None
+        records, cursor = changes_since(c, user_id, int(request.get('cursor', 0)), limit, exclude_origin=device)
+    return {'changes': records, 'cursor': cursor, 'more': len(records) >= limit}
+
+
+class SyncServer:
+    """Local stand-in for server.py's /sync: one server db, called in-process through JSON bytes."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def transport(self, payload):
+        request = json.loads(payload)
+        return json.dumps(handle_sync(self.db, request, request['user_id'])).encode()
+
+
+def http_transport(url, token):
+    """A send() for sync() that posts to server.py's /sync."""
+    def send(payload):
+        request = urllib.request.Request(url.rstrip("/") + "/sync", data=payload, method="POST",
+                                         headers={'Authorization': f"Bearer {token}",
+                                                  'Content-Type': "application/json"})
+        with urllib.request.urlopen(request) as response:
+            return response.read()
+    return send
+
+
+def sync(db, user_id, send, limit=MAX_CHANGES):
+    """Push user_id's local changes and pull everyone else's through send(request bytes) -> reply bytes.
+
+    Returns what moved: rows each way, bytes each way, rounds and seconds.
+    """
+    started = time.perf_counter()
+    result = {'pushed': 0, 'pulled': 0, 'bytes_sent': 0, 'bytes_received': 0, 'rounds': 0}
+    pushed_key, pulled_key = f"pushed:{user_id}", f"pulled:{user_id}"
+    while True:
+        with db.lock:
+            device = device_id(db.conn)
+            cursor = _meta(db.conn, pulled_key, 0)
+            records, last_seq = changes_since(db.conn, user_id, _meta(db.conn, pushed_key, 0), limit, origin=device)
+        payload = json.dumps({'user_id': user_id, 'device': device, 'cursor': cursor, 'limit': limit,
+                              'changes': records}).encode()
+        reply_bytes = send(payload)
+        reply = json.loads(reply_bytes)
+        with db.transaction() as c:
+            apply_changes(c, user_id, reply['changes'])
+            _set_meta(c, pushed_key, last_seq)
+            _set_meta(c, pulled_key, reply['cursor'])
+        result['rounds'] += 1
+        result['pushed'] += len(records)
+        result['pulled'] += len(reply['changes'])
+        result['bytes_sent'] += len(payload)
+        result['bytes_received'] += len(reply_bytes)
+        if len(records) < limit and not reply['more']:
+            break
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def main(argv=None):
+    import argparse
+    import os
+    import random
+    import tempfile
+
+    import core
+    from pokedex import GAMES, GEN1_POKEMON, METHODS
+
+    parser = argparse.ArgumentParser(description="ShinyQuest delta sync")
+    commands = parser.add_subparsers(dest="command", required=True)
+    demo = commands.add_parser("demo", help="two devices and a stand-in server: full sync, then small deltas")
+    demo.add_argument("--hunts", type=int, default=20000)
+    demo.add_argument("--changes", type=int, default=100, help="counter updates per device between syncs")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as workdir:
+        server_db, phone, tablet = [Database(os.path.join(workdir, f"{name}.db"))
+                                    for name in ("server", "phone", "tablet")]
+        for db in (server_db, phone, tablet):
+            db.migrate()
+        server = SyncServer(server_db)
+        user = "ash"
+        phone.insert_hunts(user, [(rng.choice(GEN1_POKEMON), rng.choice(GAMES)[0], rng.choice(METHODS),
+                                   rng.randrange(5000), rng.random() < 0.3) for _ in range(args.hunts)])
+
+        def report(label, result):
+            print(f"{label:34} pushed {result['pushed']:6} pulled {result['pulled']:6}  "
+                  f"sent {result['bytes_sent']:9} B  received {result['bytes_received']:9} B  "
+                  f"{result['rounds']} rounds  {result['seconds'] * 1000:8.1f} ms")
+
+        report("phone, first sync", sync(phone, user, server.transport))
+        report("tablet, first sync", sync(tablet, user, server.transport))
+        # both devices count encounters on the same hunts while offline
+        hunts = [row[0] for row in phone.fetchall("SELECT uuid FROM hunts WHERE user_id=? AND success=0", (user,))]
+        for db in (phone, tablet):
+            for uuid in rng.sample(hunts, args.changes):
+                core.add_encounters(db, user, [(db.fetchone("SELECT id FROM hunts WHERE uuid=?", (uuid,))[0], 10)])
+        report(f"phone, {args.changes} changed hunts", sync(phone, user, server.transport))
+        report(f"tablet, {args.changes} changed hunts", sync(tablet, user, server.transport))
+        report("phone, catch up", sync(phone, user, server.transport))
+        totals = [db.fetchone("SELECT COUNT(*), SUM(counter), SUM(success) FROM hunts WHERE user_id=?", (user,))
+                  for db in (server_db, phone, tablet)]
+        print("server / phone / tablet (hunts, encounters, shinies):", *totals)
+        for db in (server_db, phone, tablet):
+            db.close()
+        return 0 if totals[0] == totals[1] == totals[2] else 1
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main())
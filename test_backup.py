@@ -0,0 +1,83 @@
+import datetime
+import gzip
+import os
+import sqlite3
+import threading
+
+import pytest
+
+import backup
+import core
+import database
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = database.Database(str(tmp_path / "shinyquest.db"))
+    db.migrate()
+    core.start_hunt(db, "ash", "Pikachu")
+    yield db
+    db.close()
+
+
+def test_concurrent_backups_never_share_a_temp_file(db, tmp_path):
+    directory = str(tmp_path / "backups")
+    results, errors = [], []
+
+    def run(compress):
+        try:
+            for _ in range(5):
+                results.append(backup.create_backup(db.path, directory, compress, keep=100))
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=run, args=(compress,)) for compress in (True, False, True, False)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len({result['path'] for result in results}) == len(results) == 20
+    assert all(os.path.exists(result['path']) for result in results)
+    assert not [name for name in os.listdir(directory) if name.endswith(".part") or ".part." in name]
+    for result in results:
+        if result['path'].endswith(".gz"):
+            with gzip.open(result['path']) as f, open(str(tmp_path / "unpacked.db"), "wb") as out:
+                out.write(f.read())
+            path = str(tmp_path / "unpacked.db")
+        else:
+            path = result['path']
+        copy = sqlite3.connect(path)
+        assert copy.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+        assert copy.execute("SELECT COUNT(*) FROM hunts").fetchone() == (1,)
+        copy.close()
+
+
+def test_backups_in_the_same_millisecond_keep_their_own_names(db, tmp_path, monkeypatch):
+    class FrozenClock(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2026, 1, 1, 12, 0, 0)
+    monkeypatch.setattr(backup.datetime, "datetime", FrozenClock)
+    directory = str(tmp_path / "backups")
+    first = backup.create_backup(db.path, directory)
+    second = backup.create_backup(db.path, directory)
+    assert first['path'] != second['path']
+    assert backup.backups(directory) == sorted([first['path'], second['path']], reverse=True)
+
+
+def test_failed_backup_leaves_no_temp_file(db, tmp_path):
+    directory = str(tmp_path / "backups")
+
+    def progress(copied, total):
+        raise RuntimeError("stop")
+    with pytest.raises(RuntimeError):
+        backup.create_backup(db.path, directory, progress=progress, pages=1)
+    assert os.listdir(directory) == []
+
+
+def test_restore_rejects_a_file_that_is_not_a_backup(db, tmp_path):
+    junk = tmp_path / "junk.db"
+    junk.write_bytes(b"not a database" * 100)
+    with pytest.raises(ValueError):
+        backup.restore_backup(db, str(junk))
+    assert db.fetchone("SELECT COUNT(*) FROM hunts") == (1,)
@@ -0,0 +1,28 @@
+import pytest
+
+import core
+import database
+
+
+@pytest.fixture
+def db():
+    db = database.Database(":memory:")
+    db.migrate()
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize("value, caught", [(True, True), ("true", True), ("1", True), (1, True),
+                                           (False, False), ("false", False), ("0", False), (0, False)])
+def test_success_filter_parses_request_values(db, value, caught):
+    core.start_hunt(db, "ash", "Pikachu")
+    core.mark_successful(db, "ash", "Pikachu")
+    core.start_hunt(db, "ash", "Eevee")
+    hunts, _ = core.search_history(db, "ash", {'success': value})
+    assert [hunt[1] for hunt in hunts] == ["Pikachu" if caught else "Eevee"]
+
+
+@pytest.mark.parametrize("value", ["yes", "", "2", 2, [], {}])
+def test_success_filter_rejects_anything_else(db, value):
+    with pytest.raises(ValueError):
+        core.search_history(db, "ash", {'success': value})
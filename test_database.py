@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db():
+    db = database.Database(":memory:")
+    db.migrate()
+    yield db
+    db.close()
+
+
+def play(db, user_id):
+    """A Pikachu caught on its 41st encounter and an open Eevee hunt at 7."""
+    db.insert_hunt(user_id, "Pikachu", "Red", "Masuda", 40)
+    db.mark_successful(user_id, "Pikachu")
+    db.insert_hunt(user_id, "Eevee", "Red", "Masuda", 7)
+
+
+def test_guest_stats_match_account_stats(db):
+    guest = "guest_0123456789abcdef"
+    play(db, guest)
+    play(db, "ash")
+    stats = db.user_stats(guest)
+    assert stats['hunts'] == 2 and stats['successes'] == 1 and stats['longest_hunt'] == 41
+    assert stats == db.user_stats("ash")
+
+
+def test_repair_dex_ignores_legacy_guest_rows_and_repairs_live_guests(db):
+    legacy, guest = "guest_legacy", "guest_0123456789abcdef"
+    db.conn.execute("INSERT INTO main.guest_hunts (guest_id, species_id, game_id, method_id, success) "
+                    "VALUES (?, 1, 1, 1, 1)", (legacy,))
+    play(db, guest)
+    play(db, "ash")
+    db.conn.execute("DELETE FROM guest.living_dex")
+    db.conn.execute("DELETE FROM main.living_dex")
+    db.repair_living_dex()
+    assert db.fetchall("SELECT user_id FROM main.living_dex") == [("ash",)]
+    assert db.living_dex(guest) == db.living_dex("ash") == [("Pikachu", "Red")]
+    db.conn.execute("DELETE FROM guest.living_dex")
+    db.repair_living_dex(guest)
+    assert db.living_dex(guest) == [("Pikachu", "Red")]
+
+
+def test_purge_leaves_the_full_vacuum_to_the_maintenance_command(tmp_path):
+    path = str(tmp_path / "old.db")
+    sqlite3.connect(path).execute("CREATE TABLE t (x)").connection.close()  # from before auto_vacuum=INCREMENTAL
+    db = database.Database(path)
+    db.migrate()
+    db.conn.executemany("INSERT INTO main.guest_hunts (guest_id, species_id, game_id, method_id, success) "
+                        "VALUES (?, 1, 1, 1, 0)", [(f"guest_{i}",) for i in range(50)])
+    assert db.purge_legacy_guests(batch=20) == 50
+    assert db.fetchone("PRAGMA main.auto_vacuum") == (0,)
+    db.vacuum()
+    assert db.fetchone("PRAGMA main.auto_vacuum") == (2,)
+    db.close()
+
+
+def test_edit_keeps_the_dex_game_while_another_caught_hunt_backs_it(db):
+    first, second = (db.insert_hunt("ash", "Pikachu", "Red", "Masuda", 40, True) for _ in range(2))
+    assert db.living_dex("ash") == [("Pikachu", "Red")]
+    db.edit_hunts("ash", [first], game="Blue")
+    assert db.living_dex("ash") == [("Pikachu", "Red")]
+    db.edit_hunts("ash", [second], game="Blue")
+    assert db.living_dex("ash") == [("Pikachu", "Blue")]
@@ -0,0 +1,45 @@
+import io
+
+import pytest
+
+import importer
+
+GOOD = '{"pokemon": "Pikachu", "counter": 10}'
+BAD = ['{"pokemon": "Eevee" "counter": 3}', '{"pokemon": "Mew", "note": "a, ] } \\" [", "counter": }',
+       '{"pokemon": "Ditto", "counter": 5,}', 'nul', '{"pokemon": "Zubat"} garbage']
+
+
+class TinyReads(io.StringIO):
+    """Reads a few characters at a time, so elements straddle every buffer edge."""
+
+    def read(self, size=-1):
+        return super().read(7)
+
+
+def parse(text):
+    return [record if isinstance(record, dict) else "bad" for record in importer.iter_json_array(TinyReads(text))]
+
+
+@pytest.mark.parametrize("bad", BAD)
+def test_malformed_array_element_is_rejected_and_parsing_carries_on(bad):
+    records = parse(f"[{GOOD},\n {bad} ,{GOOD}]")
+    assert records[0] == records[-1] == {"pokemon": "Pikachu", "counter": 10}
+    assert "bad" in records[1:-1]
+
+
+def test_malformed_last_element():
+    assert parse(f"[{GOOD}, {BAD[0]}]") == [{"pokemon": "Pikachu", "counter": 10}, "bad"]
+
+
+def test_truncated_array_still_fails():
+    with pytest.raises(ValueError):
+        parse(f'[{GOOD}, {{"pokemon": "Mew", "counter": ')
+
+
+def test_json_and_ndjson_reject_the_same_rows(tmp_path):
+    rows = [GOOD, BAD[0], GOOD, BAD[2], GOOD]
+    (tmp_path / "hunts.json").write_text("[" + ",\n".join(rows) + "]")
+    (tmp_path / "hunts.ndjson").write_text("\n".join(rows) + "\n")
+    array = [isinstance(r, dict) for r in importer.iter_json_array(open(tmp_path / "hunts.json"))]
+    lines = [isinstance(r, dict) for r in importer.iter_ndjson(open(tmp_path / "hunts.ndjson"))]
+    assert array == lines == [True, False, True, False, True]
@@ -0,0 +1,27 @@
+"""Every hot query keeps using an index on a freshly migrated db; the pytest side of `database.py check-plans`."""
+import pytest
+
+import database
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    db = database.Database(str(tmp_path_factory.mktemp("plans") / "shinyquest.db"))
+    db.migrate()
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize("sql", database.HOT_QUERIES)
+def test_hot_query_uses_index(db, sql):
+    plan = db.query_plan(sql)
+    assert not [step for step in plan if step.startswith("SCAN")], plan
+    assert any(step.startswith("SEARCH") for step in plan), plan
+
+
+def test_table_scans_is_empty(db):
+    assert db.table_scans() == {}
+
+
+def test_check_plans_cli():
+    assert database.main(["check-plans"]) == 0
@@ -0,0 +1,41 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class DBWorker:
+    """Runs database calls on one background thread, strictly in submission order.
+
+    Everything that touches the db goes through submit(), so a slow query, a commit fsync or a
+    long import never blocks the thread that draws the UI.
+    """
+
+    def __init__(self, name="db-worker"):
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.queue.put((future, fn, args, kwargs))
+        return future
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def stop(self, timeout=None):
+        """Finish everything already queued, then end the thread."""
+        self.queue.put(None)
+        self.thread.join(timeout)